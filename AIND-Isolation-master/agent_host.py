@@ -0,0 +1,354 @@
+"""Play Isolation games with every agent running in its own process.
+
+`Board.play()` calls get_move() in the harness process, so an agent that
+hangs or crashes stops the whole tournament, and every agent shares the
+harness's interpreter (and its garbage collector) with the clock that times
+it.  This module runs agents out of process instead:
+
+- `AgentProcess` starts a worker process (this file run with --worker),
+  sends it the pickled agent once (the worker answers with an empty message
+  when it is ready), and then asks it for one move at a time.
+  The deadline is enforced by the host: if no reply arrives within the time
+  allowed the move is lost on time and the worker is killed (a fresh copy of
+  the agent is started for the next move that needs one).
+- `AgentPool` keeps several worker processes for one agent, so that many
+  games can ask the same agent for moves at once.
+- `play_game()` is an asyncio version of `Board.play()`, and `play_games()`
+  plays many games concurrently from one harness process, multiplexing all
+  of them over the pools with asyncio.
+
+Messages are framed by a 4-byte little-endian length.  A move request is
+REQUEST (the milliseconds left for the move, the board size and the cell
+index of each player, -1 before they have moved) followed by a bitmap of
+the blocked cells, one bit per cell index (row + column * height); the reply
+is REPLY (the row and column of the move, (-1, -1) for no move).  A 7x7
+position fits in 27 bytes.  The number of moves played (and so the player
+to move) is the number of blocked cells.
+"""
+import asyncio
+import os
+import pickle
+import struct
+import sys
+import timeit
+
+from isolation import Board
+
+TRANSPORT_MARGIN = 1.  # milliseconds of each move kept back for the messages
+WORKERS = 1  # default number of worker processes per agent in play_games()
+
+_FRAME = struct.Struct("<I")
+_REQUEST = struct.Struct("<dHHii")
+_REPLY = struct.Struct("<hh")
+
+# Placeholders for the players of the boards the host and workers rebuild
+_PLAYER_1 = "<player 1>"
+_PLAYER_2 = "<player 2>"
+_OPPONENT = "<opponent>"
+
+
+def encode_board(game, time_left):
+    """Return the REQUEST message asking for a move in the position game
+    with time_left milliseconds to spend.
+    """
+    width, height = game.width, game.height
+    bitmap = bytearray((width * height + 7) // 8)
+    blank = set(game.get_blank_spaces())
+    for idx in range(width * height):
+        if (idx % height, idx // height) not in blank:
+            bitmap[idx >> 3] |= 1 << (idx & 7)
+    #Player 1 is to move after an even number of moves
+    players = [game.active_player, game.inactive_player]
+    if game.move_count % 2:
+        players.reverse()
+    positions = []
+    for player in players:
+        location = game.get_player_location(player)
+        positions.append(-1 if location is None else location[0] + location[1] * height)
+    return _REQUEST.pack(time_left, width, height, *positions) + bytes(bitmap)
+
+
+def decode_board(message, player_1, player_2, board_class=Board):
+    """Rebuild the position of a REQUEST message.
+
+    The blocked cells are replayed as moves (apply_move() does not check
+    that moves are knight moves) in an order that leaves each player on its
+    cell, so the board, including its Zobrist hash, is the same position the
+    host sent.
+
+    Returns
+    -------
+    (float, `isolation.Board`)
+        The milliseconds left for the move and the board.
+    """
+    time_left, width, height, p1_pos, p2_pos = _REQUEST.unpack_from(message)
+    bitmap = message[_REQUEST.size:]
+    blocked = [idx for idx in range(width * height) if bitmap[idx >> 3] >> (idx & 7) & 1]
+    count = len(blocked)
+    #Player 1 plays the even plies and player 2 the odd ones; each player's
+    #last ply puts them on their cell
+    plies = [None] * count
+    if p1_pos >= 0:
+        plies[(count - 1) // 2 * 2] = p1_pos
+    if p2_pos >= 0:
+        plies[(count - 2) // 2 * 2 + 1] = p2_pos
+    others = iter(idx for idx in blocked if idx != p1_pos and idx != p2_pos)
+    game = board_class(player_1, player_2, width, height)
+    for idx in plies:
+        if idx is None:
+            idx = next(others)
+        game.apply_move((idx % height, idx // height))
+    return time_left, game
+
+
+async def _read_frame(reader):
+    size, = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return await reader.readexactly(size)
+
+
+def _frame(payload):
+    return _FRAME.pack(len(payload)) + payload
+
+
+class AgentProcess:
+    """One agent running in a worker process.
+
+    Parameters
+    ----------
+    player : object
+        The agent (any picklable object with a get_move() method).
+    """
+
+    def __init__(self, player):
+        self._agent = pickle.dumps(player)
+        self._process = None
+        self.restarts = 0
+
+    async def start(self):
+        """Start the worker (if it is not running), send it the agent and wait
+        until it is ready, so starting it is not charged to any move.
+
+        On Windows the event loop must be a `asyncio.ProactorEventLoop` (see
+        `new_event_loop()`).
+        """
+        if self._process is not None:
+            return
+        if sys.platform == "win32" and not isinstance(asyncio.get_event_loop(),
+                                                      asyncio.ProactorEventLoop):
+            raise RuntimeError("Agent processes need a ProactorEventLoop on Windows; "
+                               "run the games on agent_host.new_event_loop()")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+        self._process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--worker",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, env=env)
+        self._process.stdin.write(_frame(self._agent))
+        await self._process.stdin.drain()
+        await _read_frame(self._process.stdout)
+
+    async def get_move(self, game, allowed):
+        """Ask the agent for its move in game within allowed milliseconds.
+
+        Returns
+        -------
+        ((int, int) or None, float, str or None)
+            The move (None if there is none), the milliseconds the host waited
+            for it, and None, or "timeout" if the agent did not answer in time
+            (the worker is killed) or "crash" if the worker died.
+        """
+        await self.start()
+        process = self._process
+        started = timeit.default_timer()
+        try:
+            process.stdin.write(_frame(encode_board(game, allowed - TRANSPORT_MARGIN)))
+            await process.stdin.drain()
+            reply = await asyncio.wait_for(_read_frame(process.stdout),
+                                           max(allowed, 0.) / 1000.)
+        except asyncio.TimeoutError:
+            await self.kill()
+            return None, 1000 * (timeit.default_timer() - started), "timeout"
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.kill()
+            return None, 1000 * (timeit.default_timer() - started), "crash"
+        elapsed = 1000 * (timeit.default_timer() - started)
+        row, col = _REPLY.unpack(reply)
+        return (row, col), elapsed, None
+
+    async def kill(self):
+        """Stop the worker; the next request starts a fresh copy of the agent. """
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        self.restarts += 1
+
+    async def close(self):
+        """Ask the worker to exit (by closing its input) and wait for it. """
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), 5.)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+
+class AgentPool:
+    """Worker processes for one agent, lent out one move at a time.
+
+    Parameters
+    ----------
+    player : object
+        The agent.
+
+    size : int (optional)
+        The number of worker processes, i.e., of moves the agent can be
+        thinking about at once.
+    """
+
+    def __init__(self, player, size=WORKERS):
+        self.processes = [AgentProcess(player) for _ in range(size)]
+        self._idle = asyncio.Queue()
+        for process in self.processes:
+            self._idle.put_nowait(process)
+
+    async def get_move(self, game, allowed):
+        """Ask an idle worker for a move; see `AgentProcess.get_move()`. The
+        time spent waiting for a worker is not charged to the move.
+        """
+        process = await self._idle.get()
+        try:
+            return await process.get_move(game, allowed)
+        finally:
+            self._idle.put_nowait(process)
+
+    async def start(self):
+        await asyncio.gather(*(process.start() for process in self.processes))
+
+    async def close(self):
+        await asyncio.gather(*(process.close() for process in self.processes))
+
+
+async def play_game(pool_1, pool_2, width=7, height=7, opening=(), time_limit=150,
+                    record_times=False):
+    """Play one game between the agents of two `AgentPool`s, following the
+    rules of `Board.play()`.
+
+    Returns
+    -------
+    (int, list<[int, int]>, str)
+        The winner (0 for player 1, 1 for player 2), the move history (as
+        for `Board.play()`, after the opening) and how the game ended:
+        "illegal move", "forfeit", "timeout" or "crash".
+    """
+    game = Board(_PLAYER_1, _PLAYER_2, width, height)
+    for move in opening:
+        game.apply_move(move)
+    pools = {_PLAYER_1: pool_1, _PLAYER_2: pool_2}
+    history = []
+    while True:
+        slot = game.move_count % 2
+        legal_moves = game.get_legal_moves()
+        move, elapsed, failure = await pools[game.active_player].get_move(game, time_limit)
+        if failure is None and elapsed > time_limit:
+            failure = "timeout"
+        if failure is not None:
+            return 1 - slot, history, failure
+        if move not in legal_moves:
+            return 1 - slot, history, "forfeit" if legal_moves else "illegal move"
+        history.append([move[0], move[1], elapsed] if record_times else list(move))
+        game.apply_move(move)
+
+
+async def play_games(player_1, player_2, openings, width=7, height=7, time_limit=150,
+                     workers=WORKERS, record_times=False):
+    """Play one game from each opening between two agents, all at once.
+
+    Every agent runs in workers worker processes; the games take turns on
+    them, so at most workers moves of each agent are searched at the same
+    time (more workers than CPUs makes the agents compete for time).
+
+    Returns
+    -------
+    list<(int, list, str)>
+        The result of each game, as returned by `play_game()`.
+    """
+    pool_1 = AgentPool(player_1, workers)
+    pool_2 = AgentPool(player_2, workers)
+    try:
+        await asyncio.gather(pool_1.start(), pool_2.start())
+        return await asyncio.gather(*(
+            play_game(pool_1, pool_2, width, height, opening, time_limit, record_times)
+            for opening in openings))
+    finally:
+        await asyncio.gather(pool_1.close(), pool_2.close())
+
+
+def new_event_loop():
+    """Return a new event loop that can run the worker processes.
+
+    Before Python 3.8 the default event loop on Windows cannot start
+    subprocesses, so a `asyncio.ProactorEventLoop` is used there.
+    """
+    if sys.platform == "win32":
+        return asyncio.ProactorEventLoop()
+    return asyncio.new_event_loop()
+
+
+def run_games(player_1, player_2, openings, **kwargs):
+    """Run `play_games()` to completion from synchronous code, on an event
+    loop from `new_event_loop()`.
+    """
+    loop = new_event_loop()
+    #The current loop is the one that watches the workers for exits on Unix
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(play_games(player_1, player_2, openings, **kwargs))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def _worker():
+    """Serve move requests for one agent over stdin/stdout until stdin closes. """
+    #Keep the protocol on private copies of stdin and stdout, so an agent that
+    #prints (or reads input) cannot corrupt it
+    requests = os.fdopen(os.dup(0), "rb")
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    def read_frame():
+        header = requests.read(_FRAME.size)
+        if len(header) < _FRAME.size:
+            return None
+        size, = _FRAME.unpack(header)
+        return requests.read(size)
+
+    player = pickle.loads(read_frame())
+    replies.write(_frame(b""))
+    replies.flush()
+    while True:
+        message = read_frame()
+        if message is None:
+            break
+        received = timeit.default_timer()
+        #The agent is the player to move
+        if sum(bin(byte).count("1") for byte in message[_REQUEST.size:]) % 2:
+            time_left, game = decode_board(message, _OPPONENT, player)
+        else:
+            time_left, game = decode_board(message, player, _OPPONENT)
+        move = player.get_move(game, lambda: time_left - 1000 * (timeit.default_timer() - received))
+        if move is None:
+            move = (-1, -1)
+        replies.write(_frame(_REPLY.pack(*move)))
+        replies.flush()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--worker"]:
+        _worker()
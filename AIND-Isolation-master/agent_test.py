@@ -3,11 +3,39 @@ tests to run and debug your minimax and alphabeta agents locally.  The test
 cases used by the project assistant are not public.
 """
 
+import json
+import multiprocessing
+import os
+import pickle
+import random
+import tempfile
+import timeit
 import unittest
 
+import numpy as np
+
+import agent_host
 import isolation
 import game_agent
+import competition_agent
+import parallel_search
+import sample_players
+import self_play
+import sprt
+import batch_agent
+import benchmark
+import game_log
+import tournament
+
+from endgame import EndgameSolver
+from move_ordering import MoveOrderer
+from opening_book import OpeningBook, build_book
+from score_cache import MemoizedScore
+from search_stats import StatsRecorder
+from shared_transposition import SharedTranspositionTable
+from transposition import EXACT, TranspositionTable
 
+from concurrent.futures import ProcessPoolExecutor
 from importlib import reload
 
 
@@ -83,8 +111,975 @@ class IsolationTest(unittest.TestCase):
         AlphaBetaPlayer= game_agent.AlphaBetaPlayer()
         best_move = AlphaBetaPlayer.get_move(self.game,self.timeLimit)
         print ('Best move for Player 1 is',best_move)
-    
-            
+
+
+class BitBoardTest(unittest.TestCase):
+    """Check that isolation.BitBoard follows the same rules as isolation.Board"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def test_random_games_match_board(self):
+        rng = random.Random(0)
+        for width, height in [(7, 7), (5, 8)]:
+            for _ in range(20):
+                board = isolation.Board(self.player1, self.player2, width, height)
+                bitboard = isolation.BitBoard(self.player1, self.player2, width, height)
+                while True:
+                    moves = sorted(board.get_legal_moves())
+                    self.assertEqual(moves, sorted(bitboard.get_legal_moves()))
+                    self.assertEqual(board.count_legal_moves(), len(moves))
+                    self.assertEqual(bitboard.count_legal_moves(), len(moves))
+                    self.assertEqual(board.get_blank_spaces(), bitboard.get_blank_spaces())
+                    self.assertEqual(board.to_string(), bitboard.to_string())
+                    for player in (self.player1, self.player2):
+                        self.assertEqual(board.get_player_location(player),
+                                         bitboard.get_player_location(player))
+                        self.assertEqual(board.utility(player), bitboard.utility(player))
+                        self.assertEqual(board.is_winner(player), bitboard.is_winner(player))
+                        self.assertEqual(board.is_loser(player), bitboard.is_loser(player))
+                    if not moves:
+                        break
+                    move = rng.choice(moves)
+                    self.assertTrue(bitboard.move_is_legal(move))
+                    board.apply_move(move)
+                    bitboard = bitboard.forecast_move(move)
+
+    def test_knight_neighbour_tables(self):
+        for width, height in [(7, 7), (5, 8)]:
+            cell_index, neighbours = isolation.isolation.knight_neighbours(width, height)
+            self.assertIs(neighbours, isolation.Board("a", "b", width, height)._neighbours)
+            for (r, c), idx in cell_index.items():
+                expected = {(r + dr, c + dc) for dr, dc in
+                            [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+                            if 0 <= r + dr < height and 0 <= c + dc < width}
+                self.assertEqual({move for move, _ in neighbours[idx]}, expected)
+                self.assertTrue(all(cell_index[move] == n for move, n in neighbours[idx]))
+
+    def test_alphabeta_runs_on_bitboard(self):
+        player1 = game_agent.AlphaBetaPlayer()
+        player2 = game_agent.AlphaBetaPlayer()
+        game = isolation.BitBoard(player1, player2)
+        game.apply_move((3, 3))
+        game.apply_move((0, 5))
+        deadline = timeit.default_timer() + 0.1
+        move = player1.get_move(game, lambda: 1000 * (deadline - timeit.default_timer()))
+        self.assertIn(move, game.get_legal_moves())
+
+
+class SparseBoardTest(unittest.TestCase):
+    """Check that isolation.SparseBoard follows the same rules as isolation.Board"""
+
+    def test_random_games_match_board(self):
+        rng = random.Random(5)
+        for size in (7, 15):
+            for _ in range(10):
+                board = isolation.Board("Player1", "Player2", size, size)
+                sparse = isolation.SparseBoard("Player1", "Player2", size, size)
+                while True:
+                    moves = sorted(board.get_legal_moves())
+                    self.assertEqual(moves, sorted(sparse.get_legal_moves()))
+                    self.assertEqual(sparse.count_legal_moves(), len(moves))
+                    self.assertEqual(board.get_blank_spaces(), sorted(sparse.get_blank_spaces(),
+                                                                      key=lambda m: (m[1], m[0])))
+                    self.assertEqual(board.count_open_cells(), sparse.count_open_cells())
+                    self.assertEqual(board.hash(), sparse.hash())
+                    self.assertEqual(board.to_string(), sparse.to_string())
+                    self.assertEqual(board.utility("Player1"), sparse.utility("Player1"))
+                    if not moves:
+                        break
+                    move = rng.choice(moves)
+                    self.assertTrue(sparse.move_is_legal(move))
+                    board.apply_move(move)
+                    if rng.random() < 0.5:
+                        sparse = sparse.forecast_move(move)
+                    else:
+                        sparse.apply_move(move)
+
+    def test_undo_restores_free_list_order(self):
+        rng = random.Random(6)
+        game = isolation.SparseBoard("Player1", "Player2", 15, 15)
+        blanks = []
+        while game.get_legal_moves():
+            blanks.append(game.get_blank_spaces())
+            game.apply_move(rng.choice(game.get_legal_moves()))
+        while blanks:
+            game.undo_move()
+            self.assertEqual(blanks.pop(), game.get_blank_spaces())
+
+    def test_move_is_legal_accepts_history_entries(self):
+        #play() records moves as [row, col] lists
+        for board_class in (isolation.Board, isolation.BitBoard, isolation.SparseBoard):
+            game = board_class("Player1", "Player2")
+            game.apply_move((0, 0))
+            self.assertTrue(game.move_is_legal([2, 1]))
+            self.assertFalse(game.move_is_legal([0, 0]))
+            self.assertFalse(game.move_is_legal([7, 0]))
+
+    def test_indexed_board_needs_storage(self):
+        with self.assertRaises(TypeError):
+            isolation.indexed.IndexedBoard("Player1", "Player2")
+
+
+class MakeUnmakeTest(unittest.TestCase):
+    """Check apply_move()/undo_move() and the in-place alpha-beta search"""
+
+    def setUp(self):
+        self.player1 = "Player1"
+        self.player2 = "Player2"
+
+    def test_undo_restores_state(self):
+        rng = random.Random(1)
+        for board_class in (isolation.Board, isolation.BitBoard):
+            game = board_class(self.player1, self.player2)
+            states = []
+            while game.get_legal_moves():
+                states.append((game.to_string(), game.hash(), game.move_count,
+                               game.active_player))
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            while states:
+                game.undo_move()
+                self.assertEqual(states.pop(), (game.to_string(), game.hash(),
+                                                game.move_count, game.active_player))
+
+    def test_tracked_features_follow_moves(self):
+        rng = random.Random(4)
+        game = isolation.Board(self.player1, self.player2, track_features=True)
+        plain = isolation.Board(self.player1, self.player2)
+        for _ in range(20):
+            while game.get_legal_moves():
+                move = rng.choice(sorted(game.get_legal_moves()))
+                game.apply_move(move)
+                plain.apply_move(move)
+                if rng.random() < 0.3:
+                    game.undo_move()
+                    plain.undo_move()
+                game = game.copy()
+                for player in (self.player1, self.player2):
+                    self.assertEqual(game.count_legal_moves(player),
+                                     len(plain.get_legal_moves(player)))
+                self.assertEqual(game.count_open_cells(), len(plain.get_blank_spaces()))
+                for cell in plain.get_blank_spaces():
+                    self.assertEqual(game.count_open_neighbours(cell),
+                                     plain.count_open_neighbours(cell))
+            game = isolation.Board(self.player1, self.player2, track_features=True)
+            plain = isolation.Board(self.player1, self.player2)
+
+    def test_in_place_search_matches_copy_search(self):
+        for in_place in (False, True):
+            player1 = game_agent.AlphaBetaPlayer(in_place=in_place)
+            player2 = game_agent.AlphaBetaPlayer()
+            player1.time_left = lambda: 1000.
+            game = isolation.Board(player1, player2)
+            game.apply_move((2, 3))
+            game.apply_move((4, 4))
+            before = game.to_string()
+            random.seed(2)
+            moves = [player1.alphabeta(game, depth) for depth in range(1, 5)]
+            self.assertEqual(before, game.to_string())
+            if in_place:
+                self.assertEqual(expected, moves)
+            expected = moves
+
+
+class TranspositionTest(unittest.TestCase):
+    """Check Zobrist hashing and the alpha-beta transposition table"""
+
+    def test_hash_is_incremental_and_order_independent(self):
+        games = [board_class("Player1", "Player2") for board_class in
+                 (isolation.Board, isolation.BitBoard) for _ in range(2)]
+        for game, moves in zip(games, [[(0, 0), (4, 5), (1, 2), (6, 6), (3, 3)],
+                                       [(1, 2), (4, 5), (0, 0), (6, 6), (3, 3)]] * 2):
+            for move in moves:
+                game.apply_move(move)
+        # both orders block the same cells and leave the players on (3, 3) and (6, 6)
+        self.assertEqual(len(set(game.hash() for game in games)), 1)
+        self.assertNotEqual(games[0].hash(), games[0].forecast_move((2, 1)).hash())
+
+    def test_agent_constants_match_table(self):
+        #game_agent.py repeats them so it can be submitted on its own
+        import transposition
+        for name in ("EXACT", "LOWER_BOUND", "UPPER_BOUND", "SIDE_SALT"):
+            self.assertEqual(getattr(game_agent, name), getattr(transposition, name))
+
+    def test_table_preserves_search_value(self):
+        rng = random.Random(3)
+        for _ in range(5):
+            player1 = game_agent.AlphaBetaPlayer(
+                score_fn=game_agent.custom_score_3,
+                transposition_table=TranspositionTable(size=1024))
+            player2 = game_agent.AlphaBetaPlayer()
+            game = isolation.BitBoard(player1, player2)
+            for _ in range(6):
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if not game.get_legal_moves():
+                continue
+            player1.time_left = lambda: 1000.
+            player1.deadline = game_agent.Deadline(player1.time_left, player1.TIMER_THRESHOLD)
+            for depth in range(1, 5):
+                player1.alphabeta(game, depth)
+            expected = player1.max_value(game, 5, float("-inf"), float("inf"))
+            player1.transposition_table = None
+            self.assertEqual(expected, player1.max_value(game, 5, float("-inf"), float("inf")))
+
+    def test_shared_table_is_seen_by_copies_and_rejects_torn_entries(self):
+        table = SharedTranspositionTable(size=1024)
+        try:
+            player1 = game_agent.AlphaBetaPlayer(score_fn=game_agent.custom_score_3,
+                                                 transposition_table=table)
+            game = isolation.BitBoard(player1, "Player2")
+            game.apply_move((3, 3))
+            game.apply_move((0, 5))
+            player1.time_left = lambda: 1000.
+            player1.deadline = game_agent.Deadline(player1.time_left, player1.TIMER_THRESHOLD)
+            expected = player1.max_value(game, 4, float("-inf"), float("inf"))
+            key = game.hash()
+            entry = table.probe(key)
+            self.assertEqual(entry[1:4], (4, EXACT, expected))
+
+            #A copy in another process attaches to the same memory
+            copy = pickle.loads(pickle.dumps(table))
+            self.assertEqual(copy.probe(key), entry)
+            copy.entries[key & (table.size - 1)]["score"] += 1.
+            self.assertIsNone(table.probe(key))
+            copy.close()
+
+            #An entry of key 0 with every field 0 is still told from an empty slot
+            table.clear()
+            table.store(0, 0, EXACT, 0., (0, 0))
+            self.assertEqual(table.probe(0), (0, 0, EXACT, 0., (0, 0), 0))
+            self.assertEqual(len(table), 1)
+        finally:
+            table.close()
+
+
+class MoveOrderingTest(unittest.TestCase):
+    """Check the move ordering heuristics and cutoff statistics"""
+
+    def test_ordering_preserves_search_value(self):
+        rng = random.Random(4)
+        for _ in range(5):
+            ordered = game_agent.AlphaBetaPlayer(move_ordering=MoveOrderer(mobility=True))
+            opponent = game_agent.AlphaBetaPlayer()
+            game = isolation.BitBoard(ordered, opponent)
+            for _ in range(6):
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if not game.get_legal_moves():
+                continue
+            ordered.time_left = lambda: 1000.
+            ordered.deadline = game_agent.Deadline(ordered.time_left, ordered.TIMER_THRESHOLD)
+            ordered.move_ordering.new_search()
+            for depth in range(1, 5):
+                ordered.alphabeta(game, depth)
+            ordered.move_ordering.new_iteration(5)
+            value = ordered.max_value(game, 5, float("-inf"), float("inf"))
+            ordered.move_ordering = None
+            self.assertEqual(value, ordered.max_value(game, 5, float("-inf"), float("inf")))
+
+    def test_pv_and_killer_moves_first(self):
+        orderer = MoveOrderer()
+        game = isolation.BitBoard("Player1", "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 0))
+        orderer.new_search()
+        orderer.new_iteration(2)
+        orderer.cutoff((4, 5), 1, False)
+        orderer.best_move(game, 2, (5, 4))
+        orderer.new_iteration(3)
+        moves = game.get_legal_moves()
+        orderer.order(game, moves, 3, True, "Player1")
+        self.assertEqual(moves[0], (5, 4))
+        moves = game.get_legal_moves()
+        orderer.order(game, moves, 2, False, "Player1")
+        self.assertEqual(moves[0], (4, 5))
+
+    def test_get_move_reports_cutoff_stats(self):
+        player1 = game_agent.AlphaBetaPlayer(move_ordering=MoveOrderer())
+        game = isolation.Board(player1, game_agent.AlphaBetaPlayer())
+        game.apply_move((3, 3))
+        game.apply_move((0, 5))
+        deadline = timeit.default_timer() + 0.1
+        player1.get_move(game, lambda: 1000 * (deadline - timeit.default_timer()))
+        stats = player1.cutoff_stats
+        self.assertGreater(stats.nodes, 0)
+        self.assertGreater(len(stats.iteration_nodes), 1)
+        self.assertLessEqual(stats.first_move_cutoffs, stats.cutoffs)
+        self.assertGreater(stats.branching_factor, 1)
+
+
+class TimeControlTest(unittest.TestCase):
+    """Check the clocks, time bank and move times used by Board.play()"""
+
+    class TimedPlayer:
+        """Spend a fixed number of milliseconds on every move, then play the
+        first legal move"""
+
+        def __init__(self, millis):
+            self.millis = millis
+
+        def get_move(self, game, time_left):
+            start = time_left()
+            while start - time_left() < self.millis:
+                pass
+            legal_moves = game.get_legal_moves()
+            return legal_moves[0] if legal_moves else (-1, -1)
+
+    def test_record_times(self):
+        for clock in sorted(isolation.TimeControl.CLOCKS):
+            game = isolation.Board(self.TimedPlayer(2), self.TimedPlayer(2))
+            _, history, termination = game.play(
+                time_control=isolation.TimeControl(10, clock), record_times=True)
+            self.assertEqual(termination, "illegal move")
+            for row, col, millis in history:
+                self.assertTrue(2 <= millis <= 10)
+
+    def test_time_bank_runs_out(self):
+        # player 1 spends 20ms of a 55ms bank (+5ms per move) on every move,
+        # so its fourth move overruns the 10ms left
+        player1, player2 = self.TimedPlayer(20), self.TimedPlayer(1)
+        game = isolation.Board(player1, player2)
+        winner, history, termination = game.play(
+            time_control=isolation.TimeControl(bank=55, increment=5))
+        self.assertEqual((winner, termination), (player2, "timeout"))
+        self.assertEqual(len(history), 6)
+
+
+class BatchScoringTest(unittest.TestCase):
+    """Check the batch heuristics in batch_agent.py against the scalar ones"""
+
+    def test_batch_scores_match_scalar_scores(self):
+        rng = random.Random(0)
+        player1, player2 = "Player1", "Player2"
+        for board_class in (isolation.Board, isolation.BitBoard):
+            boards = []
+            for _ in range(50):
+                game = board_class(player1, player2)
+                for _ in range(rng.randint(0, 30)):
+                    moves = game.get_legal_moves()
+                    if not moves:
+                        break
+                    game.apply_move(rng.choice(moves))
+                boards.append(game)
+            for score_fn, batch_score_fn in batch_agent.BATCH_SCORES.items():
+                for player in (player1, player2):
+                    expected = [score_fn(game, player) for game in boards]
+                    actual = batch_score_fn(boards, player)
+                    for a, b in zip(expected, actual):
+                        self.assertTrue(a == b or abs(a - b) <= 1e-9 * abs(a),
+                                        msg="{}: {} != {}".format(score_fn.__name__, a, b))
+
+    def test_batch_player_returns_legal_move(self):
+        player1 = batch_agent.BatchAlphaBetaPlayer(score_fn=sample_players.improved_score)
+        player2 = game_agent.AlphaBetaPlayer()
+        game = isolation.BitBoard(player1, player2)
+        game.apply_move((3, 3))
+        game.apply_move((0, 5))
+        deadline = timeit.default_timer() + 0.1
+        move = player1.get_move(game, lambda: 1000 * (deadline - timeit.default_timer()))
+        self.assertIn(move, game.get_legal_moves())
+
+
+class SymmetryTest(unittest.TestCase):
+    """Check the board symmetries and canonical hashes"""
+
+    def test_images_share_canonical_hash(self):
+        rng = random.Random(0)
+        for width, height, count in [(7, 7, 8), (5, 8, 4)]:
+            symmetries = isolation.symmetries(width, height)
+            self.assertEqual(len(symmetries), count)
+            for _ in range(20):
+                moves = []
+                game = isolation.Board("Player1", "Player2", width, height)
+                for _ in range(rng.randint(0, 12)):
+                    legal_moves = game.get_legal_moves()
+                    if not legal_moves:
+                        break
+                    moves.append(rng.choice(legal_moves))
+                    game.apply_move(moves[-1])
+                key, symmetry = isolation.canonical_hash(game)
+                self.assertLessEqual(key, game.hash())
+                for image_symmetry in symmetries:
+                    image = isolation.BitBoard("Player1", "Player2", width, height)
+                    for move in moves:
+                        image.apply_move(image_symmetry.map_move(move))
+                    self.assertEqual(isolation.canonical_hash(image)[0], key)
+                    self.assertLessEqual(key, image.hash())
+                    self.assertEqual(sorted(image.get_legal_moves()),
+                                     sorted(image_symmetry.map_move(m) for m in game.get_legal_moves()))
+                for move in game.get_legal_moves():
+                    self.assertEqual(symmetry.unmap_move(symmetry.map_move(move)), move)
+
+
+class OpeningBookTest(unittest.TestCase):
+    """Check building, saving and playing from opening books"""
+
+    def test_build_save_and_lookup(self):
+        book = build_book(plies=2, search_time=20, width=5, height=5, first_ply=0)
+        #the empty board plus the 6 first moves that are distinct up to symmetry
+        self.assertEqual(len(book), 7)
+
+        path = os.path.join(tempfile.mkdtemp(), "book.bin")
+        book.save(path)
+        loaded = OpeningBook.load(path)
+        self.assertEqual((loaded.width, loaded.height, loaded.plies, loaded.entries),
+                         (book.width, book.height, book.plies, book.entries))
+
+        game = isolation.Board("Player1", "Player2", 5, 5)
+        self.assertIn(loaded.lookup(game), game.get_legal_moves())
+        for move in game.get_legal_moves():
+            child = game.forecast_move(move)
+            self.assertIn(loaded.lookup(child), child.get_legal_moves())
+            self.assertIsNone(loaded.lookup(child.forecast_move(loaded.lookup(child))))
+        self.assertIsNone(loaded.lookup(isolation.Board("Player1", "Player2")))
+
+    def test_book_covers_plies_after_random_opening(self):
+        book = build_book(plies=3, search_time=15, width=5, height=5)
+        data = json.loads(json.dumps(book.to_json()))
+        player = competition_agent.CustomPlayer(data)
+        rng = random.Random(7)
+        for _ in range(10):
+            game = isolation.Board("Player1", "Player2", 5, 5)
+            self.assertIsNone(book.lookup(game))
+            for _ in range(2):
+                game.apply_move(rng.choice(game.get_legal_moves()))
+            if game.get_legal_moves():
+                move = book.lookup(game)
+                self.assertIn(move, game.get_legal_moves())
+                self.assertEqual(player.book_move(game), move)
+                self.assertIsNone(book.lookup(game.forecast_move(move)))
+
+    def test_rejects_boards_too_large_for_entries(self):
+        OpeningBook(16, 16)
+        with self.assertRaises(ValueError):
+            OpeningBook(16, 17)
+
+    def test_player_plays_book_move(self):
+        book = OpeningBook(7, 7)
+        game = isolation.Board("Player1", "Player2")
+        book.add(game, (0, 0))
+        player = game_agent.AlphaBetaPlayer(opening_book=book)
+        game = isolation.Board(player, "Player2")
+        #the corner opening is stored once for all four corners
+        self.assertIn(player.get_move(game, lambda: 0.), [(0, 0), (6, 0), (0, 6), (6, 6)])
+
+
+class EndgameTest(unittest.TestCase):
+    """Check partition detection and the exact endgame solver"""
+
+    def longest_path(self, location, cells):
+        #Brute force longest knight's path through a set of cells
+        best = 0
+        for dr, dc in [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]:
+            move = (location[0] + dr, location[1] + dc)
+            if move in cells:
+                best = max(best, 1 + self.longest_path(move, cells - {move}))
+        return best
+
+    def partitioned_openings(self, count):
+        #Move sequences of random 6x6 games up to the first partitioned position
+        #(legal moves are sorted, as Board shuffles them with the global random)
+        rng = random.Random(0)
+        openings = []
+        while len(openings) < count:
+            game = isolation.Board("Player1", "Player2", 6, 6)
+            bitboard = isolation.BitBoard("Player1", "Player2", 6, 6)
+            moves = []
+            while game.get_legal_moves():
+                self.assertEqual(game.is_partitioned(), bitboard.is_partitioned())
+                for player in ("Player1", "Player2"):
+                    self.assertEqual(sorted(game.get_region(player)),
+                                     sorted(bitboard.get_region(player)))
+                if game.is_partitioned():
+                    #Keep the positions small enough for the solver's default max_cells
+                    if all(len(game.get_region(player)) <= EndgameSolver().max_cells
+                           for player in ("Player1", "Player2")):
+                        openings.append(moves)
+                    break
+                moves.append(rng.choice(sorted(game.get_legal_moves())))
+                game.apply_move(moves[-1])
+                bitboard.apply_move(moves[-1])
+        return openings
+
+    def test_solver_predicts_winner(self):
+        solver = EndgameSolver()
+        for moves in self.partitioned_openings(10):
+            game = isolation.BitBoard("Player1", "Player2", 6, 6)
+            for move in moves:
+                game.apply_move(move)
+            for player in ("Player1", "Player2"):
+                length, move = solver.longest_path(game, player)
+                self.assertEqual(length, self.longest_path(
+                    game.get_player_location(player), set(game.get_region(player))))
+            predicted_winner = game.active_player if solver.solve(game)[1] else game.inactive_player
+            while game.get_legal_moves():
+                game.apply_move(solver.solve(game)[0])
+            self.assertTrue(game.is_winner(predicted_winner))
+
+    def test_endgame_mode_plays_solver_move(self):
+        solver = EndgameSolver()
+        player1, player2 = game_agent.AlphaBetaPlayer(endgame_solver=solver), "Player2"
+        moves = self.partitioned_openings(1)[0]
+        if len(moves) % 2:
+            game = isolation.Board(player2, player1, 6, 6)
+        else:
+            game = isolation.Board(player1, player2, 6, 6)
+        for move in moves:
+            game.apply_move(move)
+        length, move = solver.longest_path(game, player1)
+        self.assertEqual(player1.get_move(game, lambda: 1000.), move)
+        self.assertEqual(player1.cutoff_stats.nodes, 0)
+
+class CustomPlayerTest(unittest.TestCase):
+    """Check the self-contained competition agent in competition_agent.py"""
+
+    def test_plays_book_then_searches(self):
+        game = isolation.Board("Player1", "Player2")
+        data = json.loads(json.dumps({"width": 7, "height": 7, "plies": 1,
+                                      "moves": {competition_agent.book_key(game): [3, 3]}}))
+        player1 = competition_agent.CustomPlayer(data)
+        game = isolation.Board(player1, sample_players.RandomPlayer())
+        self.assertEqual(player1.get_move(game, lambda: 0.), (3, 3))
+        game.apply_move((3, 3))
+        game.apply_move((0, 5))
+        self.assertIsNone(player1.book_move(game))
+        deadline = timeit.default_timer() + 0.05
+        time_left = lambda: 1000 * (deadline - timeit.default_timer())
+        self.assertIn(player1.get_move(game, time_left), game.get_legal_moves())
+        self.assertGreater(time_left(), 0)
+        winner, history, termination = game.play(time_limit=30)
+        self.assertNotEqual(termination, "timeout")
+
+    def test_knight_masks_match_bitboard(self):
+        for width, height in [(7, 7), (5, 8)]:
+            self.assertEqual(competition_agent.knight_masks(width, height),
+                             isolation.bitboard.knight_masks(width, height))
+
+
+class MCTSTest(unittest.TestCase):
+    """Check the Monte Carlo tree search agent in competition_agent.py"""
+
+    def test_plays_legal_moves_within_time(self):
+        player1 = competition_agent.MCTSPlayer(seed=0)
+        player2 = sample_players.RandomPlayer()
+        game = isolation.Board(player1, player2, 5, 5)
+        winner, history, termination = game.play(time_limit=30)
+        self.assertNotEqual(termination, "timeout")
+        self.assertGreater(player1.iterations, 0)
+
+    def test_tree_is_reused_after_reply(self):
+        player1, player2 = competition_agent.MCTSPlayer(seed=0), "Player2"
+        game = isolation.Board(player1, player2)
+        deadline = timeit.default_timer() + 0.05
+        move = player1.get_move(game, lambda: 1000 * (deadline - timeit.default_timer()))
+        self.assertIn(move, game.get_legal_moves())
+        game.apply_move(move)
+        subtree = player1._tree
+        reply = max(subtree.children, key=lambda child: child.visits)
+        game.apply_move((reply.cell % game.height, reply.cell // game.height))
+        self.assertIs(player1._reroot(player1._position_key(*player1._root_state(game))), reply)
+
+
+class DeadlineTest(unittest.TestCase):
+    """Check that searches read the clock rarely but stop in time"""
+
+    def test_reads_clock_rarely_and_stops_before_margin(self):
+        calls = []
+        end = timeit.default_timer() + 0.05
+
+        def time_left():
+            calls.append(1)
+            return 1000 * (end - timeit.default_timer())
+
+        polls = []
+
+        class CountingDeadline(game_agent.Deadline):
+            __slots__ = ()
+
+            def poll(self):
+                polls.append(1)
+                super().poll()
+
+        deadline = CountingDeadline(time_left, 10.)
+        checks = 0
+        with self.assertRaises(game_agent.SearchTimeout):
+            while True:
+                deadline.check()
+                checks += 1
+        self.assertGreater(time_left(), 10. - 2 * game_agent.POLL_INTERVAL_MS)
+        #time_left() is only read to start the deadline and to confirm it
+        self.assertEqual(len(calls), 3)
+        self.assertGreater(checks, 20 * len(polls))
+
+    def test_follows_a_clock_that_does_not_run_down(self):
+        deadline = game_agent.Deadline(lambda: 1000., 10.)
+        deadline.expires = 0.
+        deadline.poll()
+        self.assertGreater(deadline.remaining(), 900.)
+
+    def test_player_drops_clock_after_move(self):
+        for player in (game_agent.MinimaxPlayer(search_depth=1), game_agent.AlphaBetaPlayer()):
+            game = isolation.Board(player, sample_players.RandomPlayer())
+            game.apply_move((3, 3))
+            game.apply_move((0, 0))
+            deadline = timeit.default_timer() + 0.05
+            player.get_move(game, lambda: 1000 * (deadline - timeit.default_timer()))
+            self.assertIsNone(player.deadline)
+            pickle.loads(pickle.dumps(player))
+
+
+class ParallelSearchTest(unittest.TestCase):
+    """Check the root-splitting search in parallel_search.py"""
+
+    def test_shared_alpha_keeps_best_score(self):
+        shared_alpha = multiprocessing.Array("d", parallel_search.MAX_DEPTH + 1)
+        shared_alpha[3] = float("-inf")
+        parallel_search._init_worker(shared_alpha, sample_players.improved_score, 10., 2**10)
+        serial = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score)
+        game = isolation.Board(serial, "Player2", 5, 5)
+        game.apply_move((2, 2))
+        game.apply_move((0, 1))
+        serial.time_left = lambda: 1000.
+        serial.deadline = game_agent.Deadline(serial.time_left, serial.TIMER_THRESHOLD)
+        expected = max(serial.min_value(game.forecast_move(move), 2, float("-inf"), float("inf"))
+                       for move in game.get_legal_moves())
+
+        board = parallel_search._detach(game, serial)
+        moves = game.get_legal_moves()
+        results = [parallel_search._search_root_moves(1, board.copy(), moves[i::2], 3,
+                                                      timeit.default_timer() + 10)
+                   for i in range(2)]
+        score, exact, move, _, _ = max(results, key=lambda result: result[:2])
+        self.assertEqual((score, exact), (expected, True))
+        self.assertEqual(serial.min_value(game.forecast_move(move), 2, float("-inf"), float("inf")),
+                         expected)
+        self.assertEqual(shared_alpha[3], expected)
+
+    def test_returns_legal_move_in_time(self):
+        for shared_table in (False, True):
+            with parallel_search.ParallelAlphaBetaPlayer(
+                    score_fn=sample_players.improved_score, num_workers=2,
+                    shared_table=shared_table) as player1:
+                game = isolation.Board(player1, "Player2")
+                game.apply_move((3, 3))
+                game.apply_move((0, 5))
+                deadline = timeit.default_timer() + 0.2
+                time_left = lambda: 1000 * (deadline - timeit.default_timer())
+                move = player1.get_move(game, time_left)
+                self.assertGreater(time_left(), 0)
+                self.assertIn(move, game.get_legal_moves())
+                self.assertGreater(player1.depth_reached, 0)
+                if shared_table:
+                    self.assertGreater(len(player1._table), 0)
+            self.assertIsNone(player1._pool)
+
+
+class SearchStatsTest(unittest.TestCase):
+    """Check the search statistics reported to stats callbacks"""
+
+    def test_alphabeta_reports_every_move(self):
+        recorder = StatsRecorder()
+        player1 = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score,
+                                             stats_callback=recorder)
+        game = isolation.Board(player1, "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 5))
+        deadline = timeit.default_timer() + 0.1
+        player1.get_move(game, lambda: 1000 * (deadline - timeit.default_timer()))
+        self.assertEqual(len(recorder.records), 1)
+        stats = recorder.records[0]
+        self.assertGreater(stats.depth_completed, 1)
+        self.assertEqual(len(stats.iteration_times), stats.depth_completed)
+        self.assertGreater(stats.leaf_evaluations, 0)
+        self.assertGreaterEqual(stats.nodes, player1.cutoff_stats.children)
+        self.assertEqual(sum(stats.cutoffs), player1.cutoff_stats.cutoffs)
+        self.assertGreater(stats.timeout_margin, 0)
+        self.assertIs(player1.score, sample_players.improved_score)
+        self.assertIsNone(player1.stats)
+
+    def test_minimax_reports_depth(self):
+        recorder = StatsRecorder()
+        player1 = game_agent.MinimaxPlayer(search_depth=2, stats_callback=recorder)
+        game = isolation.Board(player1, "Player2")
+        game.apply_move((3, 3))
+        game.apply_move((0, 5))
+        player1.get_move(game, lambda: 1000.)
+        self.assertEqual(recorder.records[0].depth_completed, 2)
+
+    def test_parallel_player_counts_worker_leaves(self):
+        recorder = StatsRecorder()
+        with parallel_search.ParallelAlphaBetaPlayer(
+                score_fn=sample_players.improved_score, num_workers=2,
+                stats_callback=recorder) as player1:
+            game = isolation.Board(player1, "Player2")
+            game.apply_move((3, 3))
+            game.apply_move((0, 5))
+            deadline = timeit.default_timer() + 0.2
+            player1.get_move(game, lambda: 1000 * (deadline - timeit.default_timer()))
+            self.assertIs(player1.score, sample_players.improved_score)
+        stats = recorder.records[0]
+        self.assertGreater(stats.depth_completed, 0)
+        self.assertGreater(stats.leaf_evaluations, 0)
+
+
+class SearchWindowTest(unittest.TestCase):
+    """Check that principal variation search and aspiration windows do not
+    change the value of a fixed-depth search"""
+
+    def search(self, depth, seed, **kwargs):
+        player1 = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score, in_place=True,
+                                             transposition_table=TranspositionTable(),
+                                             move_ordering=MoveOrderer(), **kwargs)
+        game = isolation.BitBoard(player1, "Player2")
+        rng = random.Random(seed)
+        for _ in range(6):
+            game.apply_move(rng.choice(sorted(game.get_legal_moves())))
+        deadline = timeit.default_timer() + 10
+        player1.time_left = lambda: 1000 * (deadline - timeit.default_timer())
+        for d in range(1, depth + 1):
+            player1.aspiration_search(game, d)
+        return player1.root_score
+
+    def test_same_score_as_full_window(self):
+        for seed in range(5):
+            expected = self.search(5, seed)
+            self.assertEqual(self.search(5, seed, pvs=True), expected)
+            self.assertEqual(self.search(5, seed, pvs=True, aspiration_window=0.5), expected)
+
+    def test_null_window_bounds(self):
+        self.assertEqual(game_agent.next_float(1., float("inf")), 1. + 2. ** -52)
+        self.assertEqual(game_agent.next_float(-2., float("inf")), -2. + 2. ** -52)
+        self.assertEqual(game_agent.next_float(0., float("-inf")), -5e-324)
+        self.assertEqual(game_agent.next_float(float("-inf"), 0.), -1.7976931348623157e308)
+
+
+class SelfPlayTest(unittest.TestCase):
+    """Check the self-play game files and the heuristic tuner"""
+
+    def test_positions_match_scalar_features(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "games.bin")
+            written = self_play.generate_games(path, num_games=3, time_limit=30)
+            width, height, games = self_play.read_games(path)
+        self.assertEqual(len(games), written)
+        self.assertGreater(written, 0)
+        x, y = self_play.game_positions(games[:1], width, height)
+
+        moves, winner = games[0]
+        game = isolation.Board("Player1", "Player2", width, height)
+        for ply, cell in enumerate(moves[:-1]):
+            game.apply_move((int(cell) % height, int(cell) // height))
+            if ply >= 1:
+                features = self_play.scalar_features(game, game.active_player)
+                self.assertTrue(np.allclose([features[name] for name in self_play.FEATURES],
+                                            x[ply - 1]))
+                self.assertEqual(y[ply - 1], float(game.move_count % 2 == winner))
+
+    def test_fit_recovers_weights(self):
+        rng = np.random.RandomState(0)
+        x = rng.normal(size=(20000, 2))
+        p = 1. / (1. + np.exp(-(0.5 + x @ [2., -1.])))
+        y = (rng.uniform(size=len(p)) < p).astype(float)
+        weights, bias = self_play.fit_logistic(x, y, l2=0.)
+        self.assertTrue(np.allclose(weights, [2., -1.], atol=0.1))
+        self.assertAlmostEqual(bias, 0.5, delta=0.1)
+
+
+class GameLogTest(unittest.TestCase):
+    """Check that logged games can be filtered and replayed"""
+
+    def test_write_filter_and_replay(self):
+        random.seed(3)
+        recorder = StatsRecorder()
+        #A wide timeout margin, so a garbage collection pause cannot lose the game on time
+        player1 = game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score, timeout=40.,
+                                             stats_callback=recorder)
+        player2 = sample_players.RandomPlayer()
+        opening = [(3, 3), (0, 5)]
+        game = isolation.Board(player1, player2)
+        for move in opening:
+            game.apply_move(move)
+        winner, history, termination = game.play(time_limit=60, record_times=True)
+        record = tournament.game_record(game, opening, history, recorder.records, 0,
+                                        int(winner is player2), termination)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "games.ndjson.gz")
+            with game_log.GameLogWriter(path) as log:
+                log.write(dict({"agent": "AB", "opponent": "Random", "players": ["AB", "Random"]},
+                               **record))
+                log.write(dict(record, agent="Other", opponent="Random", players=["Other", "Random"]))
+            games = list(game_log.read_games(path, "AB", lost=winner is player2))
+            self.assertEqual(list(game_log.read_games(path, "AB", lost=winner is player1)), [])
+
+        self.assertEqual(len(games), 1)
+        logged = games[0]
+        self.assertEqual(logged.winner, "AB" if winner is player1 else "Random")
+        self.assertEqual(logged.moves, opening + [(r, c) for r, c, _ in history])
+        self.assertEqual([s is not None for s in logged.stats][2:],
+                         [ply % 2 == 0 for ply in range(len(history))])
+        self.assertEqual(logged.stats[2]["depth"], recorder.records[0].depth_completed)
+        for ply, move, board in logged.positions():
+            self.assertEqual(board.move_count, ply)
+        self.assertEqual(board.to_string(), game.to_string())
+
+    def test_replays_game_between_same_named_agents(self):
+        random.seed(4)
+        game = isolation.Board(sample_players.RandomPlayer(), sample_players.RandomPlayer())
+        winner, history, termination = game.play()
+        record = game_log.GameRecord({
+            "players": ["AB_Improved", "AB_Improved"], "width": 7, "height": 7,
+            "winner": int(winner is game._player_2), "termination": termination,
+            "moves": [r + c * game.height for r, c in history]})
+        board = record.position(len(history))
+        self.assertEqual(board.hash(), game.hash())
+        self.assertEqual(board.to_string(), game.to_string())
+        for ply, move, board in record.positions(isolation.BitBoard):
+            pass
+        self.assertEqual(board.hash(), game.hash())
+
+
+class MemoizedScoreTest(unittest.TestCase):
+    """Check the score memoization wrapper"""
+
+    def test_scores_match_and_repeats_hit(self):
+        for policy in ("clock", "lru"):
+            score_fn = MemoizedScore(sample_players.improved_score, size=64, policy=policy)
+            positions = benchmark.benchmark_positions(100)
+            for _ in range(2):
+                for game in positions[:50]:
+                    for player in ("Player1", "Player2"):
+                        self.assertEqual(score_fn(game, player),
+                                         sample_players.improved_score(game, player))
+            self.assertEqual(score_fn.misses, 200)
+            self.assertEqual(score_fn.hits, 0)
+            score_fn.clear()
+            for game in positions[:20] * 2:
+                score_fn(game, "Player1")
+            self.assertEqual((score_fn.hits, score_fn.misses), (20, 20))
+            self.assertLessEqual(len(score_fn), 64)
+            self.assertEqual(score_fn.__name__, "improved_score")
+
+    def test_memoized_player_searches_the_same_tree(self):
+        players = [game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score,
+                                              memoize_score=memoize) for memoize in (False, True)]
+        results = []
+        for player in players:
+            game = isolation.BitBoard(player, "Player2")
+            game.apply_move((3, 3))
+            game.apply_move((0, 5))
+            player.time_left = lambda: 1000.
+            results.append([player.alphabeta(game, depth) for depth in range(1, 5)])
+        self.assertEqual(results[0], results[1])
+
+        #After a move and a reply, a depth 2 search scores leaves seen at depth 4
+        score_fn = players[1].score
+        game.apply_move(results[1][-1])
+        game.apply_move(game.get_legal_moves()[0])
+        hits = score_fn.hits
+        players[1].alphabeta(game, 2)
+        self.assertGreater(score_fn.hits, hits)
+
+
+class SprtTest(unittest.TestCase):
+    """Check the early stopping statistics of the tournament"""
+
+    def test_decides_lopsided_pairings_only(self):
+        self.assertEqual(sprt.sprt_decision(8, 8), sprt.STRONGER)
+        self.assertEqual(sprt.sprt_decision(0, 8), sprt.WEAKER)
+        self.assertEqual(sprt.sprt_decision(10, 20), sprt.UNDECIDED)
+        self.assertEqual(sprt.sprt_decision(3, 4), sprt.UNDECIDED)
+
+    def test_interval_weights_opponents_equally(self):
+        rate, low, high = sprt.win_rate_interval([(8, 8), (10, 40)])
+        self.assertAlmostEqual(rate, 0.625)
+        self.assertLess(low, rate)
+        self.assertGreater(high, rate)
+        _, narrow_low, narrow_high = sprt.win_rate_interval([(80, 80), (100, 400)])
+        self.assertLess(narrow_high - narrow_low, high - low)
+
+
+class ForfeitingPlayer:
+    """Player that never makes a legal move"""
+
+    def get_move(self, game, time_left):
+        return (-1, -1)
+
+
+class TournamentTest(unittest.TestCase):
+    """Check the tally of tournament rounds"""
+
+    def test_serial_and_parallel_rounds_agree(self):
+        cpu_agent = tournament.Agent(sample_players.RandomPlayer(), "Random")
+        test_agents = [tournament.Agent(sample_players.GreedyPlayer(), "Greedy"),
+                       tournament.Agent(ForfeitingPlayer(), "Forfeit")]
+        results = []
+        for executor in (None, ProcessPoolExecutor(2)):
+            wins = {agent.player: 0 for agent in test_agents}
+            wins[cpu_agent.player] = 0
+            counts = tournament.play_round(cpu_agent, test_agents, wins, 3, random.Random(7),
+                                           executor)
+            if executor is not None:
+                executor.shutdown()
+            results.append(([wins[agent.player] for agent in test_agents], counts))
+        self.assertEqual(results[0], results[1])
+        (greedy_wins, forfeit_wins), (timeouts, forfeits) = results[0]
+        self.assertEqual(forfeit_wins, 0)
+        self.assertEqual((timeouts, forfeits), (0, 6))
+
+
+class BenchmarkTest(unittest.TestCase):
+    """Check the benchmark positions and report"""
+
+    def test_positions_are_reproducible(self):
+        boards = benchmark.benchmark_positions(10, isolation.Board)
+        bitboards = benchmark.benchmark_positions(10, isolation.BitBoard)
+        self.assertEqual([b.hash() for b in boards], [b.hash() for b in bitboards])
+        self.assertTrue(all(b.get_legal_moves() for b in boards))
+
+    def test_search_reports_node_rate(self):
+        result = benchmark.search_benchmark(
+            "alphabeta", lambda: game_agent.AlphaBetaPlayer(score_fn=sample_players.improved_score),
+            lambda player, game: player.alphabeta(game, 3), 3, "BitBoard", isolation.BitBoard)
+        self.assertGreater(result["nodes"], 0)
+        self.assertGreater(result["nodes_per_sec"], 0)
+        json.dumps(result)
+
+
+class AgentHostTest(unittest.TestCase):
+    """Check the out-of-process agent host"""
+
+    def test_board_encoding_round_trip(self):
+        random.seed(5)
+        game = isolation.Board("a", "b")
+        for _ in range(9):
+            message = agent_host.encode_board(game, 12.)
+            for board_class in (isolation.Board, isolation.BitBoard):
+                time_left, copy = agent_host.decode_board(message, "a", "b", board_class)
+                self.assertEqual(time_left, 12.)
+                self.assertEqual(copy.hash(), game.hash())
+                self.assertEqual(sorted(copy.get_legal_moves()), sorted(game.get_legal_moves()))
+            game.apply_move(random.choice(game.get_legal_moves()))
+
+    def test_concurrent_games_and_timeouts(self):
+        openings = [(), [(3, 3)]]
+        results = agent_host.run_games(sample_players.GreedyPlayer(),
+                                       sample_players.RandomPlayer(), openings, workers=2)
+        for opening, (winner, history, termination) in zip(openings, results):
+            self.assertEqual(termination, "illegal move")
+            game = isolation.Board("p1", "p2")
+            for move in list(opening) + [tuple(move) for move in history]:
+                self.assertIn(move, game.get_legal_moves())
+                game.apply_move(move)
+            self.assertTrue(game.utility(game.active_player) < 0)
+            self.assertEqual(winner, 1 - game.move_count % 2)
+
+        #The host stops an agent that ignores its clock
+        winner, history, termination = agent_host.run_games(
+            game_agent.AlphaBetaPlayer(timeout=-1000.), sample_players.RandomPlayer(), [()],
+            time_limit=50)[0]
+        self.assertEqual((winner, history, termination), (1, [], "timeout"))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,128 @@
+"""This file contains batch (NumPy) versions of the heuristics in
+game_agent.py and sample_players.py, and an alpha-beta agent that scores all
+the leaves below each node of the last ply with one batch call instead of
+one call per leaf.
+
+Every batch heuristic takes a list of boards and the player to score them
+for, and returns an array holding the value the scalar heuristic would give
+each board.
+"""
+import numpy as np
+
+from isolation.batch import board_features
+from game_agent import AlphaBetaPlayer, custom_score, custom_score_2, custom_score_3
+from sample_players import improved_score, open_move_score
+
+
+def _with_terminals(features, values):
+    """Replace the values of decided games with -inf (lost) or +inf (won). """
+    values = np.asarray(values, dtype=float)
+    values = np.where(features["won"], float("inf"), values)
+    return np.where(features["lost"], float("-inf"), values)
+
+
+def batch_custom_score(boards, player):
+    """Batch version of `game_agent.custom_score`. """
+    features = board_features(boards, player)
+    return _with_terminals(features, -10. ** features["opp_moves"])
+
+
+def batch_custom_score_2(boards, player):
+    """Batch version of `game_agent.custom_score_2`. """
+    features = board_features(boards, player)
+    return _with_terminals(features, 10. ** features["opp_distance_sq"])
+
+
+def batch_custom_score_3(boards, player):
+    """Batch version of `game_agent.custom_score_3`. """
+    f = board_features(boards, player)
+    return _with_terminals(f, 10 * f["own_moves"] - 6 * f["opp_moves"] -
+                           8 * f["own_distance"] + 2 * f["opp_distance_sq"] +
+                           f["blocking_moves"])
+
+
+def batch_improved_score(boards, player):
+    """Batch version of `sample_players.improved_score`. """
+    features = board_features(boards, player)
+    return _with_terminals(features, features["own_moves"] - features["opp_moves"])
+
+
+def batch_open_move_score(boards, player):
+    """Batch version of `sample_players.open_move_score`. """
+    features = board_features(boards, player)
+    return _with_terminals(features, features["own_moves"])
+
+
+# The batch version of each scalar heuristic
+BATCH_SCORES = {
+    custom_score: batch_custom_score,
+    custom_score_2: batch_custom_score_2,
+    custom_score_3: batch_custom_score_3,
+    improved_score: batch_improved_score,
+    open_move_score: batch_open_move_score,
+}
+
+
+class BatchAlphaBetaPlayer(AlphaBetaPlayer):
+    """Iterative deepening alpha-beta agent that evaluates the leaves of the
+    last ply in batches.
+
+    A node with one ply left to search creates all of its children and
+    scores them with a single call to the batch heuristic, trading the few
+    cutoffs possible among leaves for vectorized evaluation.  All other nodes
+    are searched exactly as by `AlphaBetaPlayer`.
+
+    Parameters
+    ----------
+    batch_score_fn : callable (optional)
+        A batch heuristic batch_score_fn(boards, player) returning an array
+        of scores. Defaults to the batch version of score_fn from
+        BATCH_SCORES.
+
+    The other parameters are those of `game_agent.AlphaBetaPlayer`.
+    """
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 batch_score_fn=None, **kwargs):
+        super().__init__(search_depth, score_fn, timeout, **kwargs)
+        if batch_score_fn is None:
+            batch_score_fn = BATCH_SCORES[score_fn]
+        self.batch_score = batch_score_fn
+
+    def min_value(self, game, depth, alpha, beta):
+        if depth != 1:
+            return super().min_value(game, depth, alpha, beta)
+        return self.frontier_value(game, depth, alpha, beta, False)
+
+    def max_value(self, game, depth, alpha, beta):
+        if depth != 1:
+            return super().max_value(game, depth, alpha, beta)
+        return self.frontier_value(game, depth, alpha, beta, True)
+
+    def frontier_value(self, game, depth, alpha, beta, maximizing):
+        """Return the min (or max) of the scores of all the children of a
+        node with one ply left to search, scored in one batch.
+        """
+        #Abandon search if timeout breached
+        self.deadline.check()
+
+        legal_moves = game.get_legal_moves()
+        if len(legal_moves) == 0:
+            return self.score(game, self)
+
+        key, value = self.tt_probe(game, depth, alpha, beta, legal_moves)
+        if value is not None:
+            return value
+        self.cutoff_stats.nodes += 1
+
+        children = [game.forecast_move(move) for move in legal_moves]
+        self.numberofnodesvisited += len(children)
+        self.cutoff_stats.children += len(children)
+        scores = self.batch_score(children, self)
+        if self.stats is not None:
+            self.stats.leaf_evaluations += len(children)
+
+        best = int(np.argmax(scores) if maximizing else np.argmin(scores))
+        value = float(scores[best])
+        self.tt_store(key, depth, value, alpha, beta, legal_moves[best])
+        return value
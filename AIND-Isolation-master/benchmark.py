@@ -0,0 +1,264 @@
+"""Measure the speed of the Isolation board and agents.
+
+The benchmark replays a fixed set of positions, generated from BENCHMARK_SEED,
+and times:
+
+- move generation (get_legal_moves) and forecast_move for each board class
+  (including `Board` with incrementally tracked features),
+- every scoring function in game_agent.py and sample_players.py,
+- the nodes searched per second by MinimaxPlayer.minimax and
+  AlphaBetaPlayer.alphabeta (plain, with the in-place search, transposition
+  table and move ordering, and with principal variation search and
+  aspiration windows added) at fixed depths,
+- how the opening move list (get_blank_spaces) and the minimax and
+  alpha-beta node rates of each board class change with the board size
+  (BOARD_SIZES).
+
+Each timing is the best of REPEAT runs.  The results are written as JSON so
+that runs can be stored and compared for regressions:
+
+    python benchmark.py                # print the JSON report
+    python benchmark.py -o bench.json  # write it to a file
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+
+from isolation import Board, BitBoard, SparseBoard
+from sample_players import null_score, open_move_score, improved_score, center_score
+from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
+                        custom_score_2, custom_score_3)
+from move_ordering import MoveOrderer
+from transposition import TranspositionTable
+
+BENCHMARK_SEED = 20170613  # seed for the benchmark positions
+NUM_POSITIONS = 200  # positions used by the board and scoring benchmarks
+NUM_SEARCH_POSITIONS = 5  # positions searched by the search benchmarks
+REPEAT = 5  # number of runs of each timing (the best run is reported)
+MINIMAX_DEPTH = 4  # depth of the minimax search benchmark
+ALPHABETA_DEPTH = 7  # depth of the alpha-beta search benchmarks
+ASPIRATION_WINDOW = 1.  # aspiration window of the PVS benchmark
+BOARD_SIZES = (7, 15, 25)  # board sizes (width = height) of the size benchmarks
+SIZE_MINIMAX_DEPTH = 3  # depth of the minimax search in the size benchmarks
+SIZE_ALPHABETA_DEPTH = 5  # depth of the alpha-beta search in the size benchmarks
+
+# Board implementations measured, by name
+BOARDS = [("Board", Board),
+          ("Board+features", functools.partial(Board, track_features=True)),
+          ("BitBoard", BitBoard),
+          ("SparseBoard", SparseBoard)]
+# Board implementations measured at every size of BOARD_SIZES
+SIZE_BOARDS = [("Board", Board), ("BitBoard", BitBoard), ("SparseBoard", SparseBoard)]
+SCORE_FUNCTIONS = [null_score, open_move_score, improved_score, center_score,
+                   custom_score, custom_score_2, custom_score_3]
+
+
+def benchmark_positions(count, board_class=Board, players=("Player1", "Player2"),
+                        width=7, height=7, seed=BENCHMARK_SEED):
+    """Return count positions of random games that are still in progress.
+
+    The positions only depend on the seed and the board size (not on the
+    board class), so every board class is measured on the same positions.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        game = board_class(players[0], players[1], width, height)
+        for _ in range(rng.randint(2, width * height // 2)):
+            moves = sorted(game.get_legal_moves())
+            if not moves:
+                break
+            game.apply_move(rng.choice(moves))
+        if game.get_legal_moves():
+            positions.append(game)
+    return positions
+
+
+def best_time(function, number=1):
+    """Return the best time in seconds of REPEAT runs of number calls. """
+    return min(timeit.repeat(function, number=number, repeat=REPEAT)) / number
+
+
+def per_call(name, seconds, calls, **extra):
+    """Build a result record for an operation timed over calls calls. """
+    record = {"name": name, "calls": calls,
+              "ns_per_call": 1e9 * seconds / calls,
+              "calls_per_sec": calls / seconds if seconds else None}
+    record.update(extra)
+    return record
+
+
+def board_benchmarks():
+    results = []
+    for board_name, board_class in BOARDS:
+        positions = benchmark_positions(NUM_POSITIONS, board_class)
+        moves = [game.get_legal_moves()[0] for game in positions]
+
+        def legal_moves():
+            for game in positions:
+                game.get_legal_moves()
+
+        def forecast():
+            for game, move in zip(positions, moves):
+                game.forecast_move(move)
+
+        random.seed(BENCHMARK_SEED)
+        results.append(per_call("get_legal_moves", best_time(legal_moves), len(positions),
+                                board=board_name))
+        results.append(per_call("forecast_move", best_time(forecast), len(positions),
+                                board=board_name))
+    return results
+
+
+def score_benchmarks():
+    results = []
+    for board_name, board_class in BOARDS:
+        positions = benchmark_positions(NUM_POSITIONS, board_class)
+        for score_fn in SCORE_FUNCTIONS:
+            def score():
+                for game in positions:
+                    score_fn(game, "Player1")
+
+            random.seed(BENCHMARK_SEED)
+            results.append(per_call(score_fn.__name__, best_time(score), len(positions),
+                                    board=board_name))
+    return results
+
+
+def search_benchmark(name, make_player, search, depth, board_name, board_class, size=7):
+    """Time a fixed-depth search from each search position.
+
+    make_player() returns a new agent and search(player, game) runs the
+    search on a size x size board; the reported rate is nodes (positions
+    created by the search) per second.
+    """
+    seconds = 0.
+    nodes = 0
+    for idx in range(NUM_SEARCH_POSITIONS):
+        times = []
+        for _ in range(REPEAT):
+            player = make_player()
+            game = benchmark_positions(1, board_class, (player, "Player2"), size, size,
+                                       seed=BENCHMARK_SEED + idx)[0]
+            if game.active_player is not player:
+                game = benchmark_positions(1, board_class, ("Player1", player), size, size,
+                                           seed=BENCHMARK_SEED + idx)[0]
+            player.time_left = lambda: float("inf")
+            random.seed(BENCHMARK_SEED)
+            #MinimaxPlayer prints a line at every leaf; keep it out of the report
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                start = timeit.default_timer()
+                search(player, game)
+                times.append(timeit.default_timer() - start)
+        seconds += min(times)
+        nodes += player.numberofnodesvisited
+    return {"name": name, "board": board_name, "size": size, "depth": depth,
+            "positions": NUM_SEARCH_POSITIONS, "nodes": nodes, "seconds": seconds,
+            "nodes_per_sec": nodes / seconds if seconds else None}
+
+
+def search_benchmarks():
+    def alphabeta_search(depth):
+        def search(player, game):
+            for d in range(1, depth + 1):
+                player.aspiration_search(game, d)
+        return search
+
+    results = []
+    for board_name, board_class in BOARDS:
+        results.append(search_benchmark(
+            "minimax", lambda: MinimaxPlayer(score_fn=improved_score),
+            lambda player, game: player.minimax(game, MINIMAX_DEPTH), MINIMAX_DEPTH,
+            board_name, board_class))
+        results.append(search_benchmark(
+            "alphabeta", lambda: AlphaBetaPlayer(score_fn=improved_score),
+            alphabeta_search(ALPHABETA_DEPTH), ALPHABETA_DEPTH, board_name, board_class))
+        results.append(search_benchmark(
+            "alphabeta_tt_ordering",
+            lambda: AlphaBetaPlayer(score_fn=improved_score, in_place=True,
+                                    transposition_table=TranspositionTable(),
+                                    move_ordering=MoveOrderer()),
+            alphabeta_search(ALPHABETA_DEPTH), ALPHABETA_DEPTH, board_name, board_class))
+        results.append(search_benchmark(
+            "alphabeta_tt_ordering_pvs_aspiration",
+            lambda: AlphaBetaPlayer(score_fn=improved_score, in_place=True,
+                                    transposition_table=TranspositionTable(),
+                                    move_ordering=MoveOrderer(), pvs=True,
+                                    aspiration_window=ASPIRATION_WINDOW),
+            alphabeta_search(ALPHABETA_DEPTH), ALPHABETA_DEPTH, board_name, board_class))
+    return results
+
+
+def size_benchmarks():
+    def alphabeta_search(player, game):
+        for d in range(1, SIZE_ALPHABETA_DEPTH + 1):
+            player.alphabeta(game, d)
+
+    results = []
+    for size in BOARD_SIZES:
+        for board_name, board_class in SIZE_BOARDS:
+            #The opening move list: every open cell of a board where one
+            #player has not been placed yet
+            positions = [board_class("Player1", "Player2", size, size) for _ in range(NUM_POSITIONS)]
+
+            def blank_spaces():
+                for game in positions:
+                    game.get_blank_spaces()
+
+            results.append(per_call("get_blank_spaces", best_time(blank_spaces), len(positions),
+                                    board=board_name, size=size))
+            results.append(search_benchmark(
+                "minimax", lambda: MinimaxPlayer(score_fn=improved_score),
+                lambda player, game: player.minimax(game, SIZE_MINIMAX_DEPTH), SIZE_MINIMAX_DEPTH,
+                board_name, board_class, size))
+            results.append(search_benchmark(
+                "alphabeta", lambda: AlphaBetaPlayer(score_fn=improved_score),
+                alphabeta_search, SIZE_ALPHABETA_DEPTH, board_name, board_class, size))
+            #forecast_move() copies the board, which costs O(width * height)
+            #for the list-based boards; the in-place search never copies
+            results.append(search_benchmark(
+                "alphabeta_in_place", lambda: AlphaBetaPlayer(score_fn=improved_score,
+                                                              in_place=True),
+                alphabeta_search, SIZE_ALPHABETA_DEPTH, board_name, board_class, size))
+    return results
+
+
+def run_benchmarks():
+    """Run every benchmark and return the report as a dict. """
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "seed": BENCHMARK_SEED,
+            "repeat": REPEAT,
+        },
+        "board": board_benchmarks(),
+        "score": score_benchmarks(),
+        "search": search_benchmarks(),
+        "size": size_benchmarks(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run_benchmarks(), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
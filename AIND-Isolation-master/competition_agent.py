@@ -3,9 +3,27 @@ you choose.  This agent will compete against other students (and past
 champions) in a tournament.
 
          COMPLETING AND SUBMITTING A COMPETITION AGENT IS OPTIONAL
+
+Only this file and data.json are submitted, so the agents here use nothing
+but the standard library and the public methods of `isolation.Board`.  The
+opening book of `CustomPlayer` is read from the data argument (the contents
+of data.json, see `book_key()`).
 """
+import gc
+import math
 import random
 
+TABLE_SIZE = 2**18  # most positions kept in the transposition table of a move
+
+# Bound types of the transposition table entries
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Per board size caches of knight_masks() and zobrist_keys()
+_KNIGHT_MASKS = {}
+_ZOBRIST_KEYS = {}
+
 
 class SearchTimeout(Exception):
     """Subclass base exception for code clarity. """
@@ -18,6 +36,10 @@ def custom_score(game, player):
 
     This should be the best heuristic function for your project submission.
 
+    The score is the negated exponential of the opponent's mobility (the
+    heuristic of `game_agent.custom_score()`), so cutting the opponent's
+    moves from 2 to 1 counts for more than from 8 to 7.
+
     Parameters
     ----------
     game : `isolation.Board`
@@ -33,7 +55,60 @@ def custom_score(game, player):
     float
         The heuristic value of the current game state to the specified player.
     """
-    raise NotImplementedError
+    if game.is_loser(player):
+        return float("-inf")
+    if game.is_winner(player):
+        return float("inf")
+    return float(-10**len(game.get_legal_moves(game.get_opponent(player))))
+
+
+def book_key(game):
+    """Return the key of the position game in an opening book.
+
+    The key lists the cell indices (row + column * height) of the player to
+    move and of their opponent (-1 before they have moved), then every
+    blocked cell in increasing order, e.g. "24,10:3,10,24".
+    """
+    height = game.height
+    cells = []
+    for player in (game.active_player, game.inactive_player):
+        location = game.get_player_location(player)
+        cells.append(-1 if location is None else location[0] + location[1] * height)
+    blank = set(game.get_blank_spaces())
+    blocked = [idx for idx in range(game.width * height)
+               if (idx % height, idx // height) not in blank]
+    return "{},{}:{}".format(cells[0], cells[1], ",".join(map(str, blocked)))
+
+
+def knight_masks(width, height):
+    """Return a tuple whose element idx is the bit mask of the cells a knight
+    can reach from cell idx of a width x height board.
+    """
+    masks = _KNIGHT_MASKS.get((width, height))
+    if masks is None:
+        steps = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+        masks = tuple(sum(1 << (r + dr + (c + dc) * height) for dr, dc in steps
+                          if 0 <= r + dr < height and 0 <= c + dc < width)
+                      for c in range(width) for r in range(height))
+        _KNIGHT_MASKS[(width, height)] = masks
+    return masks
+
+
+def zobrist_keys(width, height):
+    """Return the Zobrist keys of a board size: 64-bit keys for each blocked
+    cell, for player 1 and for player 2 standing on each cell, and the key
+    toggled when the initiative passes to player 2.
+    """
+    keys = _ZOBRIST_KEYS.get((width, height))
+    if keys is None:
+        rng = random.Random("zobrist-{}x{}".format(width, height))
+        size = width * height
+        keys = (tuple(rng.getrandbits(64) for _ in range(size)),
+                tuple(rng.getrandbits(64) for _ in range(size)),
+                tuple(rng.getrandbits(64) for _ in range(size)),
+                rng.getrandbits(64))
+        _ZOBRIST_KEYS[(width, height)] = keys
+    return keys
 
 
 class CustomPlayer:
@@ -49,10 +124,18 @@ class CustomPlayer:
         COMPETITION.  IT IS NOT REQUIRED FOR THE ISOLATION PROJECT REVIEW.
     **************************************************************************
 
+    This agent plays from an opening book while the game is in it, then
+    searches with iterative deepening alpha-beta, trying the best move of
+    the previous pass first and keeping a transposition table for the
+    duration of each move.
+
     Parameters
     ----------
-    data : string
-        The name of the search method to use in get_move().
+    data : dict (optional)
+        The opening book, as read from data.json: {"width": ..., "height":
+        ..., "plies": ..., "moves": {key: [row, col]}}, with the book move of
+        every position with fewer than plies moves played keyed by
+        `book_key()`.
 
     timeout : float (optional)
         Time remaining (in milliseconds) when search is aborted.  Note that
@@ -65,6 +148,8 @@ class CustomPlayer:
         self.score = custom_score
         self.time_left = None
         self.TIMER_THRESHOLD = timeout
+        self.book = data
+        self._table = None
 
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
@@ -93,5 +178,365 @@ class CustomPlayer:
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        # OPTIONAL: Finish this function!
-        raise NotImplementedError
+        self.time_left = time_left
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return (-1, -1)
+        book_move = self.book_move(game)
+        if book_move in legal_moves:
+            return book_move
+
+        best_move = legal_moves[0]
+        self._table = {}
+        try:
+            #Past the number of open cells every line has reached the end of
+            #the game, so a deeper pass cannot change the result
+            for depth in range(1, len(game.get_blank_spaces()) + 1):
+                best_move = self.alphabeta(game, depth, best_move)
+        except SearchTimeout:
+            pass
+        finally:
+            self._table = None
+        return best_move
+
+    def book_move(self, game):
+        """Return the book move for game, or None if it is not in the book. """
+        book = self.book
+        if (not book or game.move_count >= book["plies"] or
+                (game.width, game.height) != (book["width"], book["height"])):
+            return None
+        move = book["moves"].get(book_key(game))
+        return None if move is None else tuple(move)
+
+    def alphabeta(self, game, depth, first_move):
+        """Search the root of game to depth, starting with first_move, and
+        return the best move found.
+        """
+        legal_moves = game.get_legal_moves()
+        if first_move in legal_moves:
+            legal_moves.remove(first_move)
+            legal_moves.insert(0, first_move)
+        alpha = float("-inf")
+        best_move = legal_moves[0]
+        for move in legal_moves:
+            value = self.search(game.forecast_move(move), depth - 1, alpha, float("inf"))
+            if value > alpha:
+                alpha, best_move = value, move
+        return best_move
+
+    def search(self, game, depth, alpha, beta):
+        """Return the alpha-beta value of game (for this player) searched to
+        depth with the window (alpha, beta).
+        """
+        if self.time_left() < self.TIMER_THRESHOLD:
+            raise SearchTimeout()
+        legal_moves = game.get_legal_moves()
+        if depth <= 0 or not legal_moves:
+            return self.score(game, self)
+
+        #Answer the node from the table, or at least try its best move first
+        key = game.hash()
+        entry = self._table.get(key)
+        if entry is not None:
+            entry_depth, bound, value, move = entry
+            if entry_depth >= depth and (bound == EXACT or
+                                         (bound == LOWER_BOUND and value >= beta) or
+                                         (bound == UPPER_BOUND and value <= alpha)):
+                return value
+            if move in legal_moves:
+                legal_moves.remove(move)
+                legal_moves.insert(0, move)
+
+        maximizing = game.active_player == self
+        low, high = alpha, beta
+        best_value, best_move = None, None
+        for move in legal_moves:
+            value = self.search(game.forecast_move(move), depth - 1, low, high)
+            if best_move is None or (value > best_value if maximizing else value < best_value):
+                best_value, best_move = value, move
+            if maximizing:
+                low = max(low, value)
+            else:
+                high = min(high, value)
+            if low >= high:
+                break
+
+        if len(self._table) >= TABLE_SIZE:
+            self._table.clear()
+        if best_value <= alpha:
+            bound = UPPER_BOUND
+        elif best_value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self._table[key] = (depth, bound, best_value, best_move)
+        return best_value
+
+
+class MCTSNode:
+    """A node of the Monte Carlo search tree.
+
+    Attributes
+    ----------
+    cell : int
+        The cell index (row + column * height) of the move leading from the
+        parent to this node.
+
+    key : int
+        The Zobrist hash of the position (see `MCTSPlayer._position_key()`).
+
+    untried : list<int> or None
+        Cell indices of the moves not yet expanded into children (None until
+        the node is first selected).
+
+    children : list<`MCTSNode`>
+        The expanded children.
+
+    visits, wins : int
+        The number of playouts through this node, and how many of them were
+        won by the player who made the move leading to it.
+    """
+    __slots__ = ("cell", "key", "untried", "children", "visits", "wins")
+
+    def __init__(self, cell, key):
+        self.cell = cell
+        self.key = key
+        self.untried = None
+        self.children = []
+        self.visits = 0
+        self.wins = 0
+
+
+class MCTSPlayer:
+    """Game-playing agent that chooses a move with Monte Carlo tree search.
+
+    Each iteration descends the tree by UCT (upper confidence bound applied
+    to trees), expands one new child, finishes the game with uniformly random
+    moves and credits the result to every node on the path.  The tree walk
+    and the playouts work on a few integers (blocked cell mask, player cells)
+    with the knight move masks of `knight_masks()`, so no board objects
+    or move lists are created during a playout.
+
+    The subtree of the move played is kept, and on the next call it is
+    re-rooted at the position reached by the opponent's reply (found by its
+    hash), so the playouts already spent on that line are reused.
+
+    Parameters
+    ----------
+    exploration : float (optional)
+        The UCT exploration constant.
+
+    reuse_tree : bool (optional)
+        Keep the search tree between moves.
+
+    timeout : float (optional)
+        Time remaining (in milliseconds) when search is stopped.
+
+    seed : object (optional)
+        Seed for the random number generator used by the search.
+
+    Attributes
+    ----------
+    iterations : int
+        The number of playouts run by the most recent call to get_move().
+    """
+
+    def __init__(self, exploration=math.sqrt(2), reuse_tree=True, timeout=10., seed=None):
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.TIMER_THRESHOLD = timeout
+        self.time_left = None
+        self.rng = random.Random(seed)
+        self.iterations = 0
+        self._tree = None
+
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        #A full garbage collection pass over a large tree can take longer than
+        #the timer threshold, so the collector is paused for the whole move
+        #(nodes hold no reference to their parent, so there are no cycles to
+        #collect, and reference counting frees discarded subtrees).  Nothing
+        #is allocated between enabling it again and returning, so a pending
+        #collection runs after the move has been timed.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            move = self._search(game, time_left)
+        finally:
+            if collecting:
+                gc.enable()
+        return move
+
+    def _search(self, game, time_left):
+        """Run the search of get_move() and return the move to play. """
+        self.time_left = time_left
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return (-1, -1)
+
+        height = game.height
+        self._height = height
+        self._masks = knight_masks(game.width, height)
+        self._zobrist = zobrist_keys(game.width, height)
+        self._full = (1 << (game.width * height)) - 1
+
+        state = self._root_state(game)
+        root = self._reroot(self._position_key(*state))
+        self.iterations = 0
+        while time_left() > self.TIMER_THRESHOLD:
+            self._iterate(root, *state)
+            self.iterations += 1
+
+        if not root.children:
+            return legal_moves[0]
+        best = max(root.children, key=lambda child: child.visits)
+        self._tree = best if self.reuse_tree else None
+        return (best.cell % height, best.cell // height)
+
+    def _root_state(self, game):
+        """Return the state of game as the blocked cell mask, the cell of the
+        player to move and of their opponent (-1 if not placed yet) and the
+        slot of the player to move (0 for player 1).
+        """
+        height = self._height
+        blocked = self._full
+        for r, c in game.get_blank_spaces():
+            blocked ^= 1 << (r + c * height)
+        cells = []
+        for player in (game.active_player, game.inactive_player):
+            location = game.get_player_location(player)
+            cells.append(-1 if location is None else location[0] + location[1] * height)
+        return blocked, cells[0], cells[1], game.move_count % 2
+
+    def _reroot(self, key):
+        """Return the node of the position with hash key among the children of
+        the kept subtree, or a new root if it is not there.
+        """
+        tree, self._tree = self._tree, None
+        if tree is not None:
+            for child in tree.children:
+                if child.key == key:
+                    return child
+        return MCTSNode(None, key)
+
+    def _open_moves(self, cell, blocked):
+        """Return the bit mask of the moves from cell (-1: not placed yet). """
+        if cell < 0:
+            return self._full & ~blocked
+        return self._masks[cell] & ~blocked
+
+    def _position_key(self, blocked, own, opp, slot):
+        """Return the Zobrist hash of a position: the keys of the blocked
+        cells and of the cell of each player, and the initiative key if
+        player 2 is to move.  own is the cell of the player to move, who is
+        in slot (0 for player 1).
+        """
+        blocked_keys, p1_keys, p2_keys, initiative_key = self._zobrist
+        key = initiative_key if slot else 0
+        while blocked:
+            low = blocked & -blocked
+            key ^= blocked_keys[low.bit_length() - 1]
+            blocked ^= low
+        p1_cell, p2_cell = (opp, own) if slot else (own, opp)
+        if p1_cell >= 0:
+            key ^= p1_keys[p1_cell]
+        if p2_cell >= 0:
+            key ^= p2_keys[p2_cell]
+        return key
+
+    def _move_key(self, cell, last_cell, slot):
+        """Return the Zobrist keys toggled when the player in slot moves from
+        last_cell to cell.
+        """
+        blocked_keys, p1_keys, p2_keys, initiative_key = self._zobrist
+        player_keys = p2_keys if slot else p1_keys
+        keys = blocked_keys[cell] ^ player_keys[cell] ^ initiative_key
+        if last_cell >= 0:
+            keys ^= player_keys[last_cell]
+        return keys
+
+    def _iterate(self, root, blocked, own, opp, slot):
+        """Run one selection, expansion, playout and backpropagation pass from
+        the root state; own is the cell of the player to move.
+        """
+        exploration = self.exploration
+        path = [root]
+        node = root
+
+        #Selection: descend by UCT through fully expanded nodes
+        while True:
+            if node.untried is None:
+                moves = self._open_moves(own, blocked)
+                node.untried = []
+                while moves:
+                    low = moves & -moves
+                    node.untried.append(low.bit_length() - 1)
+                    moves ^= low
+            if node.untried or not node.children:
+                break
+            log_visits = math.log(node.visits)
+            node = max(node.children, key=lambda child: child.wins / child.visits +
+                       exploration * math.sqrt(log_visits / child.visits))
+            blocked |= 1 << node.cell
+            own, opp = opp, node.cell
+            slot ^= 1
+            path.append(node)
+
+        #Expansion: add one random untried move
+        if node.untried:
+            untried = node.untried
+            i = self.rng.randrange(len(untried))
+            untried[i], untried[-1] = untried[-1], untried[i]
+            cell = untried.pop()
+            child = MCTSNode(cell, node.key ^ self._move_key(cell, own, slot))
+            node.children.append(child)
+            blocked |= 1 << cell
+            own, opp = opp, cell
+            path.append(child)
+
+        #Playout: the player to move when the moves run out loses, so the
+        #player who moved into the last node wins after an even number of plies
+        won = self._playout(blocked, own, opp) % 2 == 0
+
+        #Backpropagation: the players who moved into successive nodes alternate
+        for node in reversed(path):
+            node.visits += 1
+            if won:
+                node.wins += 1
+            won = not won
+
+    def _playout(self, blocked, own, opp):
+        """Play uniformly random moves until the player to move has none, and
+        return the number of moves played.
+        """
+        randrange = self.rng.randrange
+        plies = 0
+        while True:
+            moves = self._open_moves(own, blocked)
+            if not moves:
+                return plies
+            for _ in range(randrange(bin(moves).count("1"))):
+                moves &= moves - 1
+            cell = (moves & -moves).bit_length() - 1
+            blocked |= 1 << cell
+            own, opp = opp, cell
+            plies += 1
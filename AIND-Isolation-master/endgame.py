@@ -0,0 +1,145 @@
+"""This file contains an exact solver for partitioned Isolation endgames.
+
+Once no open cell can be reached by both players (see
+`isolation.Board.is_partitioned()`), each player moves inside their own
+region without interference and the player to move wins exactly when they
+can make more moves than their opponent.  The number of moves a player can
+still make is the length of the longest knight's path from their cell over
+the open cells of their region, which `EndgameSolver` computes by
+exhaustive search memoized on (cell, open cells) for regions of up to
+max_cells cells.
+"""
+from isolation.bitboard import knight_masks
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class EndgameSolver:
+    """Longest-path solver for the isolated regions of a partitioned game.
+
+    Parameters
+    ----------
+    max_cells : int (optional)
+        The largest region solved exactly; the search is exponential in the
+        size of the region, so larger ones are left to the heuristic search.
+
+    cache_size : int (optional)
+        The number of (cell, open cells) results remembered between calls;
+        the cache is emptied when it grows past this size.
+
+    Attributes
+    ----------
+    hits, misses : int
+        Memoization cache hits and misses since the solver was created.
+    """
+
+    # Number of search nodes between two checks of the clock
+    CHECK_INTERVAL = 1024
+
+    def __init__(self, max_cells=25, cache_size=2**20):
+        self.max_cells = max_cells
+        self.cache_size = cache_size
+        self._memo = {}
+        self.hits = 0
+        self.misses = 0
+
+    def longest_path(self, game, player, time_left=None, threshold=0.):
+        """Return the length of the longest sequence of moves the player can
+        make in their region, and the first move of such a sequence.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The position; the player must have moved.
+
+        player : object
+            An object registered as a player in the current game.
+
+        time_left : callable (optional)
+            A function returning the number of milliseconds left to search.
+
+        threshold : float (optional)
+            Give up once time_left() falls below this value.
+
+        Returns
+        -------
+        (int, (int, int)) or None
+            The path length and first move ((-1, -1) for a player with no
+            moves), or None if the region has more than max_cells cells or
+            the time ran out.
+        """
+        location = game.get_player_location(player)
+        region = game.get_region(player)
+        if location is None or len(region) > self.max_cells:
+            return None
+
+        height = game.height
+        masks = knight_masks(game.width, height)
+        memo = self._memo.setdefault((game.width, height), {})
+        if len(memo) > self.cache_size:
+            memo.clear()
+        open_cells = 0
+        for r, c in region:
+            open_cells |= 1 << (r + c * height)
+
+        nodes = [0]
+
+        def search(idx, open_cells):
+            key = (idx, open_cells)
+            length = memo.get(key)
+            if length is not None:
+                self.hits += 1
+                return length
+            self.misses += 1
+            nodes[0] += 1
+            if time_left is not None and nodes[0] % self.CHECK_INTERVAL == 0:
+                if time_left() < threshold:
+                    raise _OutOfTime()
+            #A path can never be longer than the number of open cells left
+            bound = bin(open_cells).count("1")
+            length = 0
+            moves = masks[idx] & open_cells
+            while moves and length < bound:
+                low = moves & -moves
+                length = max(length, 1 + search(low.bit_length() - 1, open_cells ^ low))
+                moves ^= low
+            memo[key] = length
+            return length
+
+        start = location[0] + location[1] * height
+        best_length, best_move = 0, (-1, -1)
+        try:
+            moves = masks[start] & open_cells
+            while moves:
+                low = moves & -moves
+                idx = low.bit_length() - 1
+                length = 1 + search(idx, open_cells ^ low)
+                if length > best_length:
+                    best_length, best_move = length, (idx % height, idx // height)
+                moves ^= low
+        except _OutOfTime:
+            return None
+        return best_length, best_move
+
+    def solve(self, game, time_left=None, threshold=0.):
+        """Solve a partitioned position for the player to move.
+
+        Returns
+        -------
+        ((int, int), bool) or None
+            The first move of the active player's longest path and whether
+            it wins the game against any defence, or None if the position is
+            not partitioned or either region cannot be solved.
+        """
+        if not game.is_partitioned():
+            return None
+        own = self.longest_path(game, game.active_player, time_left, threshold)
+        if own is None:
+            return None
+        opp = self.longest_path(game, game.inactive_player, time_left, threshold)
+        if opp is None:
+            return None
+        #The player to move runs out of moves first unless their path is longer
+        return own[1], own[0] > opp[0]
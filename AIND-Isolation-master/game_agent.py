@@ -2,8 +2,24 @@
 test your agent's strength against a set of known agents using tournament.py
 and include the results in your report.
 """
+import functools
 import random
 import math
+import struct
+import timeit
+
+from time import perf_counter
+
+
+POLL_INTERVAL_MS = 0.5  # target milliseconds between clock reads of a search
+MAX_POLL_NODES = 4096  # most nodes searched between clock reads
+
+# The bound types and side salt of transposition.py, repeated here so that
+# this file runs without the optional modules of the project
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+SIDE_SALT = 0x9E3779B97F4A7C15
 
 
 class SearchTimeout(Exception):
@@ -11,6 +27,219 @@ class SearchTimeout(Exception):
     pass
 
 
+class Deadline:
+    """The end of the time a search may use, checked cheaply at every node.
+
+    The time_left function of a move is read once to fix an absolute
+    `time.perf_counter` deadline margin milliseconds before the move's time
+    runs out.  check() only counts nodes; every interval nodes it reads the
+    clock, raising `SearchTimeout` once the deadline has passed, and picks the
+    next interval from the node rate measured since the previous read, so
+    that the clock is read about every POLL_INTERVAL_MS (and at least twice
+    in the time that remains).  The search therefore stops within about
+    POLL_INTERVAL_MS of the deadline, leaving the margin to return the move.
+
+    Before raising, time_left() itself is asked whether the margin has been
+    reached, so a clock other than the wall clock (or a time_left that does
+    not run down at all) times the search exactly as it did before; if it
+    has not, the deadline is moved to match it.
+
+    Parameters
+    ----------
+    time_left : callable
+        A function that returns the number of milliseconds left in the move.
+
+    margin : float
+        The number of milliseconds that must be left when the search stops.
+    """
+    __slots__ = ("time_left", "margin", "expires", "interval", "countdown", "_polled")
+
+    def __init__(self, time_left, margin):
+        self.time_left = time_left
+        self.margin = margin
+        self._start()
+
+    def _start(self):
+        self._polled = perf_counter()
+        self.expires = self._polled + (self.time_left() - self.margin) / 1000.
+        self.interval = 1
+        self.countdown = 1
+
+    def remaining(self):
+        """Return the number of milliseconds until the deadline. """
+        return 1000. * (self.expires - perf_counter())
+
+    def check(self):
+        """Count a node, reading the clock if interval nodes have passed. """
+        self.countdown -= 1
+        if self.countdown <= 0:
+            self.poll()
+
+    def poll(self):
+        """Read the clock: raise `SearchTimeout` if the deadline has passed,
+        otherwise choose the number of nodes until the next read.
+        """
+        now = perf_counter()
+        if now >= self.expires:
+            if self.time_left() < self.margin:
+                raise SearchTimeout()
+            self._start()
+            return
+        elapsed = now - self._polled
+        if elapsed > 0.:
+            rate = self.interval / elapsed
+            interval = min(rate * POLL_INTERVAL_MS / 1000., rate * (self.expires - now) / 2.)
+        else:
+            interval = 2 * self.interval
+        self.interval = max(1, min(int(interval), MAX_POLL_NODES))
+        self.countdown = self.interval
+        self._polled = now
+
+
+def uses_deadline(search):
+    """Decorate the top-level search method of a player (minimax() or
+    alphabeta()) so that a search started without a `Deadline` for the
+    player's time_left, i.e., called directly rather than from get_move(),
+    gets one for the duration of the call.
+    """
+    @functools.wraps(search)
+    def wrapper(self, *args, **kwargs):
+        deadline = self.deadline
+        if deadline is not None and deadline.time_left is self.time_left:
+            return search(self, *args, **kwargs)
+        self.deadline = Deadline(self.time_left, self.TIMER_THRESHOLD)
+        try:
+            return search(self, *args, **kwargs)
+        finally:
+            self.deadline = None
+    return wrapper
+
+
+def reports_stats(get_move):
+    """Decorate the get_move() method of an agent so that it reports a
+    `search_stats.SearchStats` record to the agent's stats_callback, if it
+    has one (search_stats.py is only imported by agents that do).
+
+    While the decorated method runs the record is available to the search
+    as self.stats (None when stats are disabled) and the agent's score
+    function is wrapped to count the leaf evaluations; the node count and
+    the timeout margin are filled in afterwards.
+    """
+    @functools.wraps(get_move)
+    def wrapper(self, game, time_left):
+        callback = getattr(self, "stats_callback", None)
+        if callback is None:
+            return get_move(self, game, time_left)
+
+        from search_stats import SearchStats
+        stats = self.stats = SearchStats()
+        nodes = self.numberofnodesvisited
+        score_fn = self.score
+
+        def counting_score(game, player):
+            stats.leaf_evaluations += 1
+            return score_fn(game, player)
+
+        self.score = counting_score
+        try:
+            move = get_move(self, game, time_left)
+        finally:
+            self.score = score_fn
+            self.stats = None
+        stats.timeout_margin = time_left()
+        stats.nodes = self.numberofnodesvisited - nodes
+        callback(stats)
+        return move
+    return wrapper
+
+
+class CutoffStats:
+    """Counters describing the shape of the tree explored by one call to
+    get_move().
+
+    Attributes
+    ----------
+    nodes : int
+        The number of interior nodes whose children were searched.
+
+    children : int
+        The number of children searched below those nodes.
+
+    cutoffs : int
+        The number of nodes abandoned after a beta (or alpha) cutoff.
+
+    first_move_cutoffs : int
+        The number of cutoffs caused by the first child searched.
+
+    iteration_nodes : list<int>
+        The number of children searched by each completed iterative
+        deepening pass, in order of depth.
+
+    pvs_researches : int
+        The number of null-window searches that failed high and had to be
+        repeated with the full window (principal variation search).
+
+    aspiration_researches : int
+        The number of root searches repeated after the score fell outside
+        the aspiration window.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.children = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.iteration_nodes = []
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+
+    @property
+    def branching_factor(self):
+        """The average number of children searched per interior node. """
+        return self.children / self.nodes if self.nodes else 0.
+
+    @property
+    def first_move_cutoff_rate(self):
+        """The fraction of cutoffs produced by the first move searched (1.0
+        for perfect move ordering).
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.
+
+    @property
+    def effective_branching_factor(self):
+        """The growth in nodes from the second-deepest to the deepest
+        completed iterative deepening pass.
+        """
+        if len(self.iteration_nodes) < 2 or not self.iteration_nodes[-2]:
+            return 0.
+        return self.iteration_nodes[-1] / self.iteration_nodes[-2]
+
+    def __repr__(self):
+        return ("CutoffStats(nodes={}, children={}, cutoffs={}, first_move_cutoffs={}, "
+                "iteration_nodes={}, pvs_researches={}, aspiration_researches={})").format(
+                    self.nodes, self.children, self.cutoffs, self.first_move_cutoffs,
+                    self.iteration_nodes, self.pvs_researches, self.aspiration_researches)
+
+
+_DOUBLE = struct.Struct("<d")
+_INT64 = struct.Struct("<q")
+
+
+def next_float(x, toward):
+    """Return the float next to x in the direction of toward; the same as
+    math.nextafter(x, toward), which needs Python 3.9.  Used for the bounds
+    of null-window searches.
+    """
+    if x == toward or x != x or toward != toward:
+        return toward
+    if x == 0.:
+        return math.copysign(5e-324, toward)
+    #Adjacent floats of the same sign have adjacent bit patterns
+    bits = _INT64.unpack(_DOUBLE.pack(x))[0]
+    bits += 1 if (x > 0.) == (toward > x) else -1
+    return _DOUBLE.unpack(_INT64.pack(bits))[0]
+
+
 def custom_score(game, player):
     """Calculate the heuristic value of a game state from the point of view
     of the given player.
@@ -281,8 +510,32 @@ class MinimaxPlayer(IsolationPlayer):
     """Game-playing agent that chooses a move using depth-limited minimax
     search. You must finish and test this player to make sure it properly uses
     minimax to return a good move before the search time limit expires.
+
+    Parameters
+    ----------
+    stats_callback : callable (optional)
+        Called with a `search_stats.SearchStats` record describing each call
+        to get_move(); see search_stats.py.
+
+    memoize_score : bool (optional)
+        If True score_fn is wrapped in a `score_cache.MemoizedScore`, so a
+        position scored before (e.g., by the search for an earlier move) is
+        looked up instead of being scored again.
     """
 
+    # The Deadline of the search in progress
+    deadline = None
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., stats_callback=None,
+                 memoize_score=False):
+        super().__init__(search_depth, score_fn, timeout)
+        if memoize_score:
+            from score_cache import MemoizedScore
+            self.score = MemoizedScore(score_fn)
+        self.stats_callback = stats_callback
+        self.stats = None
+
+    @reports_stats
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -312,6 +565,7 @@ class MinimaxPlayer(IsolationPlayer):
             (-1, -1) if there are no available legal moves.
         """
         self.time_left = time_left
+        self.deadline = Deadline(time_left, self.TIMER_THRESHOLD)
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
@@ -320,11 +574,21 @@ class MinimaxPlayer(IsolationPlayer):
         try:
             # The try/except block will automatically catch the exception
             # raised when the timer is about to expire.
-            return self.minimax(game, self.search_depth)
+            started = timeit.default_timer()
+            best_move = self.minimax(game, self.search_depth)
+            if self.stats is not None:
+                self.stats.depth_completed = self.search_depth
+                self.stats.iteration_times.append(1000 * (timeit.default_timer() - started))
+            return best_move
 
         except SearchTimeout:
             pass  # Handle any actions required after timeout as needed
 
+        finally:
+            #Drop the clock of the move, so the player can still be pickled
+            self.time_left = None
+            self.deadline = None
+
         # Return the best move from the last completed search iteration
         return best_move
 
@@ -357,8 +621,7 @@ class MinimaxPlayer(IsolationPlayer):
             print('Running min_value at depth', depth,'for',game.active_player)
         
         #Abandon search if timeout breached
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.deadline.check()
 
         #If we reached our depth limit then return a score for this player
         if depth <=0:
@@ -436,8 +699,7 @@ class MinimaxPlayer(IsolationPlayer):
         if debug is True: print('Running max_value at depth', depth,'for',game.active_player)
 
         #Abandon search if timeout breached
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.deadline.check()
 
         #If we reached our depth limit then return a score for this player
         if depth <=0:
@@ -479,6 +741,7 @@ class MinimaxPlayer(IsolationPlayer):
 
         return max_score
 
+    @uses_deadline
     def minimax(self, game, depth):
         """Implement depth-limited minimax search algorithm as described in
         the lectures.
@@ -546,8 +809,7 @@ class MinimaxPlayer(IsolationPlayer):
                 testing.
         """
         debug = False
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.deadline.check()
 
         # TODO: finish this function!
         
@@ -622,9 +884,84 @@ class AlphaBetaPlayer(IsolationPlayer):
     of the game tree that are searched. Branches that do not contribute to the result are
     ignored or "pruned".
 
-    
+    Parameters
+    ----------
+    in_place : bool (optional)
+        If True the search walks the game tree on the single board passed to
+        get_move() using apply_move()/undo_move() instead of creating a copy
+        of the board with forecast_move() for every node.
+
+    transposition_table : `transposition.TranspositionTable` (optional)
+        A table in which search results are stored by position hash, so that
+        successive iterative deepening passes (and later moves) can reuse them
+        to answer positions outright or to try the best move found first.
+
+    move_ordering : `move_ordering.MoveOrderer` (optional)
+        Orders the legal moves at each node (principal variation move, killer
+        moves, history heuristic...) so that alpha-beta cutoffs happen sooner.
+        Without it moves are searched in the order the board returns them.
+
+    opening_book : `opening_book.OpeningBook` (optional)
+        Book moves for the first plies of the game. Positions found in the
+        book are answered immediately, without a search.
+
+    endgame_solver : `endgame.EndgameSolver` (optional)
+        Once the players have been separated into disjoint regions of the
+        board, moves are chosen by the exact longest-path solver instead of
+        the heuristic search (when the regions are small enough to solve in
+        time).
+
+    stats_callback : callable (optional)
+        Called with a `search_stats.SearchStats` record describing each call
+        to get_move(); see search_stats.py.
+
+    pvs : bool (optional)
+        If True every child after the first is searched with a null window
+        (principal variation search), which only proves that the move is no
+        better than the best one so far; the rare moves that turn out to be
+        better are searched again with the full window.
+
+    aspiration_window : float (optional)
+        If set, each iterative deepening pass after the first starts with the
+        window (score - aspiration_window, score + aspiration_window) around
+        the score of the previous pass instead of (-inf, inf). A search that
+        fails outside the window is repeated with that side opened up.
+
+    memoize_score : bool (optional)
+        If True score_fn is wrapped in a `score_cache.MemoizedScore`, so the
+        leaves already scored by the search for an earlier move are looked up
+        instead of being scored again.
+
+    The counters in `cutoff_stats` (a `CutoffStats`) describe
+    the tree searched by the most recent call to get_move().
     """
 
+    # The Deadline of the search in progress
+    deadline = None
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10., in_place=False,
+                 transposition_table=None, move_ordering=None, opening_book=None,
+                 endgame_solver=None, stats_callback=None, pvs=False, aspiration_window=None,
+                 memoize_score=False):
+        super().__init__(search_depth, score_fn, timeout)
+        if memoize_score:
+            from score_cache import MemoizedScore
+            self.score = MemoizedScore(score_fn)
+        self.stats_callback = stats_callback
+        self.stats = None
+        self.root_depth = 0
+        self.root_score = None
+        self.pvs = pvs
+        self.aspiration_window = aspiration_window
+        self.opening_book = opening_book
+        self.endgame_solver = endgame_solver
+        self.in_place = in_place
+        self.transposition_table = transposition_table
+        self.tt_salt = 0
+        self.move_ordering = move_ordering
+        self.cutoff_stats = CutoffStats()
+
+    @reports_stats
     def get_move(self, game, time_left):
         """Search for the best move from the available legal moves and return a
         result before the time limit expires.
@@ -655,15 +992,50 @@ class AlphaBetaPlayer(IsolationPlayer):
             Board coordinates corresponding to a legal move; may return
             (-1, -1) if there are no available legal moves.
         """
-        debug = False
-
         #Set time left to number of ms left in current turn
         self.time_left = time_left
+        self.deadline = Deadline(time_left, self.TIMER_THRESHOLD)
+        try:
+            return self.iterative_deepening(game)
+        finally:
+            #Drop the clock of the move, so the player can still be pickled
+            self.time_left = None
+            self.deadline = None
+
+    def iterative_deepening(self, game):
+        """Search deeper and deeper until the deadline of the move passes,
+        returning the best move of the last completed pass (see get_move()).
+        """
+        debug = False
 
         # Initialize the best move so that this function returns something
         # in case the search fails due to timeout
         best_move = (-1, -1)
 
+        #Remember the move count so an in-place search interrupted by a timeout
+        #can take back the moves it left on the board
+        start_move_count = game.move_count
+
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        if self.move_ordering is not None:
+            self.move_ordering.new_search()
+        self.cutoff_stats = CutoffStats()
+        self.root_score = None
+
+        #Play straight from the opening book when the position is in it
+        if self.opening_book is not None:
+            book_move = self.opening_book.lookup(game)
+            if book_move is not None:
+                return book_move
+
+        #Once the players are walled off from each other the game is decided by
+        #who has the longer path through their own region, which can be solved exactly
+        if self.endgame_solver is not None:
+            solution = self.endgame_solver.solve(game, self.time_left, self.TIMER_THRESHOLD)
+            if solution is not None:
+                return solution[0]
+
         try:
             #Implement Iterative Deepening strategy. This means that we generate our
             #game tree to a specified depth and if we still have time we generate another
@@ -672,7 +1044,13 @@ class AlphaBetaPlayer(IsolationPlayer):
             if debug is True:print('Get best move using iterative deepening')
             to_depth=1
             while True:              
-                best_move = self.alphabeta(game, to_depth)
+                children = self.cutoff_stats.children
+                started = timeit.default_timer()
+                best_move = self.aspiration_search(game, to_depth)
+                self.cutoff_stats.iteration_nodes.append(self.cutoff_stats.children - children)
+                if self.stats is not None:
+                    self.stats.depth_completed = to_depth
+                    self.stats.iteration_times.append(1000 * (timeit.default_timer() - started))
                 to_depth+=1
                 
                 
@@ -680,6 +1058,8 @@ class AlphaBetaPlayer(IsolationPlayer):
             #When timeout encountered we break here 
             pass
 
+        while game.move_count > start_move_count:
+            game.undo_move()
 
         # Return the best move from the last completed search iteration. If no best move
         #then use first legal move.
@@ -691,6 +1071,110 @@ class AlphaBetaPlayer(IsolationPlayer):
         
         return best_move
 
+    def aspiration_search(self, game, depth):
+        """Run one iterative deepening pass, in an aspiration window around
+        the score of the previous pass when aspiration_window is set.
+
+        A pass whose score falls on or outside the window only bounds the true
+        score, so it is repeated with the failing side of the window opened up
+        to infinity.
+
+        Returns
+        -------
+        (int, int)
+            The best move found by the pass, as returned by alphabeta()
+        """
+        guess = self.root_score
+        if not self.aspiration_window or guess is None or math.isinf(guess):
+            return self.alphabeta(game, depth)
+
+        alpha = guess - self.aspiration_window
+        beta = guess + self.aspiration_window
+        while True:
+            best_move = self.alphabeta(game, depth, alpha, beta)
+            score = self.root_score
+            if (score is None or score <= alpha) and alpha > float("-inf"):
+                alpha = float("-inf")
+            elif score is not None and score >= beta and beta < float("inf"):
+                beta = float("inf")
+            else:
+                return best_move
+            self.cutoff_stats.aspiration_researches += 1
+
+    def make_move(self, game, move):
+        """Return the game state reached by applying move to game.
+
+        In in-place mode the move is applied to game itself and the caller must
+        take it back with unmake_move() once the child has been searched,
+        otherwise a new board is created with forecast_move().
+        """
+        if self.in_place:
+            game.apply_move(move)
+            return game
+        return game.forecast_move(move)
+
+    def unmake_move(self, game):
+        """Take back the move applied by make_move() in in-place mode."""
+        if self.in_place:
+            game.undo_move()
+
+    def tt_probe(self, game, depth, alpha, beta, legal_moves):
+        """Look the current position up in the transposition table.
+
+        If the stored result comes from a search at least as deep and its bound
+        settles the node for the window (alpha, beta) the stored value is
+        returned. Otherwise the stored best move (if legal) is moved to the
+        front of legal_moves so that it is searched first.
+
+        Returns
+        -------
+        (int, float)
+            The table key of the position (None if there is no table) and the
+            value answering the node (None if the node must be searched)
+        """
+        if self.transposition_table is None:
+            return None, None
+        key = game.hash() ^ self.tt_salt
+        entry = self.transposition_table.probe(key)
+        if entry is None:
+            return key, None
+        _, entry_depth, bound, value, move, _ = entry
+        if entry_depth >= depth:
+            if (bound == EXACT or (bound == LOWER_BOUND and value >= beta) or
+                    (bound == UPPER_BOUND and value <= alpha)):
+                return key, value
+        if move in legal_moves:
+            legal_moves.remove(move)
+            legal_moves.insert(0, move)
+        return key, None
+
+    def tt_store(self, key, depth, value, alpha, beta, move):
+        """Store the result of searching a node with the window (alpha, beta)
+        in the transposition table, recording whether value is exact or only
+        a bound on the true value.
+        """
+        if key is None:
+            return
+        if value <= alpha:
+            bound = UPPER_BOUND
+        elif value >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        self.transposition_table.store(key, depth, bound, value, move)
+
+    def record_cutoff(self, move, depth, index, maximizing):
+        """Count a cutoff caused by the index'th move searched at a node and
+        tell the move ordering about it.
+        """
+        self.cutoff_stats.cutoffs += 1
+        if index == 0:
+            self.cutoff_stats.first_move_cutoffs += 1
+        if self.move_ordering is not None:
+            self.move_ordering.cutoff(move, depth, maximizing)
+        if self.stats is not None:
+            self.stats.cutoff(self.root_depth - depth)
+
     def min_value (self, game, depth, alpha, beta):
         """
         This function is called alternately with the max_value function. It is called
@@ -727,8 +1211,11 @@ class AlphaBetaPlayer(IsolationPlayer):
         if debug is True: print('Running alfabeta min_value at depth', depth,'for',game.active_player)
         
         #Abandon search if timeout breached
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.deadline.check()
+
+        ordering = self.move_ordering
+        if ordering is not None:
+            ordering.start_node(depth)
 
         #Get list of legal moves
         legal_moves = game.get_legal_moves()
@@ -742,28 +1229,57 @@ class AlphaBetaPlayer(IsolationPlayer):
         #of the board to the level above 
         if depth ==0:
             return self.score(game, self)
+
+        #Put the most promising moves first so that cutoffs come early
+        if ordering is not None:
+            ordering.order(game, legal_moves, depth, False, self)
+
+        #Reuse a previous search of this position if the transposition table has one
+        key, value = self.tt_probe(game, depth, alpha, beta, legal_moves)
+        if value is not None:
+            return value
+        beta_orig = beta
+        self.cutoff_stats.nodes += 1
                
         #Generate a new game state for each move possible in legal_moves list. For each
         #legal move apply the move to the current game to create a possible game state and
         #call the scoring functions for each possible state returning a score
         value=float('+inf')
-        for move in legal_moves:
+        best_move = legal_moves[0]
+        for index, move in enumerate(legal_moves):
             if debug is True: print('Next Action at level',depth,'=',move)
-            next_state = game.forecast_move(move)
+            next_state = self.make_move(game, move)
             self.numberofnodesvisited +=1
+            self.cutoff_stats.children += 1
             if debug is True:
                 print('Testing next game state using max_value for',game.active_player,'at level',depth)
                 print(next_state.to_string())
            
             #calculate the score for the children of this node (next level is down is a max level) passing the game board (proposed),
             #the depth and the values of alpha and beta from this level
-            value =  min(value, self.max_value(next_state, depth -1,alpha,beta))
+            if self.pvs and index > 0:
+                #Only prove the move is no better for MIN than the best so far, and
+                #search it properly if it turns out to be
+                score = self.max_value(next_state, depth -1, next_float(beta, float('-inf')), beta)
+                if alpha < score < beta:
+                    self.cutoff_stats.pvs_researches += 1
+                    score = self.max_value(next_state, depth -1, alpha, beta)
+            else:
+                score = self.max_value(next_state, depth -1,alpha,beta)
+            self.unmake_move(game)
+            if score < value:
+                value = score
+                best_move = move
+                if ordering is not None:
+                    ordering.best_move(game, depth, move)
 
 
             #If score returned from next level down (max level) is less than the current lower bound (alpha)
             #then stop processing nodes at this level as they will never be used. Return the current min score
             #from this level to the calling level.
             if   value <= alpha:
+                self.record_cutoff(move, depth, index, False)
+                self.tt_store(key, depth, value, alpha, beta_orig, best_move)
                 return value
                 
             #If score is < Beta (upper bound) then set Beta to equal the score. New Beta will be used on subsequent scoring of game states
@@ -771,6 +1287,7 @@ class AlphaBetaPlayer(IsolationPlayer):
             beta = min(beta, value)
             
          #If we do get through processing all nodes at this level then return the minimum score accrued at this level 
+        self.tt_store(key, depth, value, alpha, beta_orig, best_move)
         return value
                                             
                                          
@@ -823,8 +1340,11 @@ class AlphaBetaPlayer(IsolationPlayer):
         if debug is True: print('Running alfabeta max_value at depth', depth,'for',game.active_player)
 
         #Abandon search if timeout breached
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.deadline.check()
+
+        ordering = self.move_ordering
+        if ordering is not None:
+            ordering.start_node(depth)
 
         #Get list of legal moves
         legal_moves = game.get_legal_moves()
@@ -837,32 +1357,63 @@ class AlphaBetaPlayer(IsolationPlayer):
         if depth ==0:
             return self.score(game, self)
 
+        #Put the most promising moves first so that cutoffs come early
+        if ordering is not None:
+            ordering.order(game, legal_moves, depth, True, self)
+
+        #Reuse a previous search of this position if the transposition table has one
+        key, value = self.tt_probe(game, depth, alpha, beta, legal_moves)
+        if value is not None:
+            return value
+        alpha_orig = alpha
+        self.cutoff_stats.nodes += 1
+
         
         #Generate a new game state for each move possible in legal_moves list. For each
         #legal move apply the move to the current game to create a possible game state and
         #call the max_value/ min_value methods for each possible state returning a score
         value = float('-inf')
-        for move in legal_moves:
-            next_state = game.forecast_move(move)
+        best_move = legal_moves[0]
+        for index, move in enumerate(legal_moves):
+            next_state = self.make_move(game, move)
             self.numberofnodesvisited +=1
+            self.cutoff_stats.children += 1
 
 
             #calculate the score for the children of this node (next level is down is a min) passing the game board (proposed),
             #the depth and the values of alpha and beta 
-            value = max(value, self.min_value(next_state, depth -1,alpha,beta))
+            if self.pvs and index > 0:
+                #Only prove the move is no better than the best so far, and search
+                #it properly if it turns out to be
+                score = self.min_value(next_state, depth -1, alpha, next_float(alpha, float('inf')))
+                if alpha < score < beta:
+                    self.cutoff_stats.pvs_researches += 1
+                    score = self.min_value(next_state, depth -1, alpha, beta)
+            else:
+                score = self.min_value(next_state, depth -1,alpha,beta)
+            self.unmake_move(game)
+            if score > value:
+                value = score
+                best_move = move
+                if ordering is not None:
+                    ordering.best_move(game, depth, move)
 
             #If score returned from next level down (min level) is >= the current upper bound (beta)
             #then stop processing nodes at this level as they will never be used. Return the max score
             #at this level to the calling level.
             if   value >= beta:
+                self.record_cutoff(move, depth, index, True)
+                self.tt_store(key, depth, value, alpha_orig, beta, best_move)
                 return value
                 
             #If score is > Alpha then set Alpha to equal score (new Alpha will be used on subsequent iterations of game states)
             alpha = max(alpha, value)
 
         #If we do get through processing all nodes at this level then return the maximum score at this level 
+        self.tt_store(key, depth, value, alpha_orig, beta, best_move)
         return value
 
+    @uses_deadline
     def alphabeta(self, game, depth, alpha=float("-inf"), beta=float("inf")):
         """Implement depth-limited minimax search with alpha-beta pruning as
         described in the lectures.
@@ -915,8 +1466,7 @@ class AlphaBetaPlayer(IsolationPlayer):
         debug = False
         
         #Abandon search if timeout breached
-        if self.time_left() < self.TIMER_THRESHOLD:
-            raise SearchTimeout()
+        self.deadline.check()
 
         #Get list of legal moves
         legal_moves = game.get_legal_moves()
@@ -930,6 +1480,24 @@ class AlphaBetaPlayer(IsolationPlayer):
         if debug is True:
             print(game.to_string())
             print('Legal moves...',legal_moves)
+
+        #The values in the transposition table are scored for this player, so keep
+        #positions searched as player 1 and as player 2 apart
+        self.tt_salt = SIDE_SALT if game.move_count % 2 else 0
+        self.root_depth = depth
+
+        ordering = self.move_ordering
+        if ordering is not None:
+            ordering.new_iteration(depth)
+            ordering.start_node(depth)
+            ordering.order(game, legal_moves, depth, True, self)
+
+        #Search the best move from the transposition table (i.e. from the previous
+        #iterative deepening pass) first
+        key, _ = self.tt_probe(game, depth, alpha, beta, legal_moves)
+        alpha_orig = alpha
+        best_score = None
+        self.cutoff_stats.nodes += 1
                
        
         best_move=legal_moves[random.randint(0,len(legal_moves))-1] #assign random move as default best move
@@ -937,27 +1505,49 @@ class AlphaBetaPlayer(IsolationPlayer):
         #Generate a new game state for each move possible move in legal_moves list and for each game state
         #call the scoring functions iteratively to generate the game tree and return scores
         #back up the tree.  
-        for move in legal_moves:
+        for index, move in enumerate(legal_moves):
             if debug is True: print('Next Action at level',depth,'=',move)
-            next_state = game.forecast_move(move)
+            next_state = self.make_move(game, move)
             self.numberofnodesvisited +=1
+            self.cutoff_stats.children += 1
 
         #Calculate score for this node by calling alphabeta min function (next level down is min)
-            score = self.min_value(next_state, depth -1, alpha, beta)
+            if self.pvs and index > 0:
+                score = self.min_value(next_state, depth -1, alpha, next_float(alpha, float('inf')))
+                if alpha < score < beta:
+                    self.cutoff_stats.pvs_researches += 1
+                    score = self.min_value(next_state, depth -1, alpha, beta)
+            else:
+                score = self.min_value(next_state, depth -1, alpha, beta)
+            self.unmake_move(game)
+
+            #A null-window score that is no higher than alpha is only an upper bound,
+            #so the move cannot replace the best one (even if it ties with it)
+            if self.pvs and index > 0 and score <= alpha:
+                continue
 
             #If score is >= Alpha (lower bound) then set Alpha to equal score and store this as best move
             #New Alpha will be used on subsequent calls to the scoring functions at this level
             if   score >= alpha:
                 alpha = score
                 best_move = move
+                best_score = score
+                if ordering is not None:
+                    ordering.best_move(game, depth, move)
                 
             #If score is >=beta (upper bound) then return stored best move as the best move and stop searching
             if score >=beta:
+                self.record_cutoff(move, depth, index, True)
+                self.tt_store(key, depth, score, alpha_orig, beta, best_move)
+                self.root_score = score
                 return best_move
 
             #alpha = max(alpha, score)
             
-        #return the stored best move
+        #return the stored best move (root_score is None when every move failed low)
+        self.root_score = best_score
+        if best_score is not None:
+            self.tt_store(key, depth, best_score, alpha_orig, beta, best_move)
         return best_move
 
        
@@ -0,0 +1,228 @@
+"""Write and read logs of Isolation games.
+
+A game log is a newline-delimited JSON (NDJSON) file holding one compact
+object per game, so a log can be written one game at a time while a
+tournament runs and scanned one line at a time afterwards.  Logs whose name
+ends in ".gz" are gzip-compressed.  Each game is stored as
+
+    {"agent": "AB_Custom", "opponent": "AB_Open", "agent_slot": 1,
+     "players": ["AB_Open", "AB_Custom"], "width": 7, "height": 7,
+     "winner": 1, "termination": "illegal move",
+     "moves": [24, 10, ...], "times": [0.0, 0.0, 148.21, ...],
+     "stats": [null, null, [7, 5123, 3011, 402, 10.3], ...]}
+
+where agent is the agent whose search statistics are logged and agent_slot
+its slot (0 for player 1, 1 for player 2), players lists the names of
+player 1 and player 2 (both may be the same), winner is the slot of the
+winner, moves holds the cell index (row + column * height) of every move,
+times the milliseconds each move took (0 for the opening moves) and stats
+the search statistics of each move of the logged agent as [STATS_FIELDS]
+(null for the other moves).
+
+`read_games()` yields `GameRecord` objects, and `GameRecord.positions()`
+replays a game move by move on a single `Board`.  Running this file prints
+the games of a log, e.g. the losses of one agent, with the move list to paste
+into isoviz/display.html:
+
+    python game_log.py games.ndjson --agent AB_Custom --losses
+"""
+import argparse
+import gzip
+import json
+
+from isolation import Board
+
+# The search statistics stored for each move, in order
+STATS_FIELDS = ("depth", "nodes", "leaf_evaluations", "cutoffs", "timeout_margin")
+
+
+def stats_entry(stats):
+    """Return the compact log entry of a `search_stats.SearchStats` record. """
+    margin = stats.timeout_margin
+    return [stats.depth_completed, stats.nodes, stats.leaf_evaluations, sum(stats.cutoffs),
+            None if margin is None else round(margin, 2)]
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class GameLogWriter:
+    """Append games to a log file as they finish.
+
+    Every record is written as one line and flushed, so the log can be read
+    while the tournament is still running and survives an interrupted run.
+
+    Parameters
+    ----------
+    path : str
+        The log file; games are appended if it already exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = _open(path, "a")
+
+    def write(self, record):
+        """Append one game (a dict in the format described above). """
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameRecord:
+    """One logged game.
+
+    Attributes
+    ----------
+    data : dict
+        The record as stored in the log.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def players(self):
+        """The names of player 1 and player 2. """
+        return tuple(self.data["players"])
+
+    @property
+    def winner(self):
+        """The name of the winner. """
+        return self.data["players"][self.data["winner"]]
+
+    @property
+    def loser(self):
+        """The name of the loser. """
+        return self.data["players"][1 - self.data["winner"]]
+
+    @property
+    def agent_won(self):
+        """Whether the logged agent won the game. """
+        return self.data["winner"] == self.data["agent_slot"]
+
+    @property
+    def termination(self):
+        return self.data["termination"]
+
+    @property
+    def moves(self):
+        """The moves of the game as (row, column) pairs. """
+        height = self.data["height"]
+        return [(cell % height, cell // height) for cell in self.data["moves"]]
+
+    @property
+    def times(self):
+        """The milliseconds spent on each move. """
+        return self.data["times"]
+
+    @property
+    def stats(self):
+        """The search statistics of each move of the logged agent as a dict
+        keyed by STATS_FIELDS (None for the other moves).
+        """
+        return [None if entry is None else dict(zip(STATS_FIELDS, entry))
+                for entry in self.data.get("stats") or [None] * len(self.data["moves"])]
+
+    def positions(self, board_class=Board):
+        """Replay the game, yielding the position after each move.
+
+        The same board object is updated and yielded every time, so only one
+        position exists at once; copy() a position to keep it.
+
+        Yields
+        ------
+        (int, (int, int), `isolation.Board`)
+            The number of moves played, the last move and the board.
+        """
+        board = self._board(board_class)
+        for ply, move in enumerate(self.moves, 1):
+            board.apply_move(move)
+            yield ply, move, board
+
+    def position(self, ply, board_class=Board):
+        """Return the board after the first ply moves of the game. """
+        board = self._board(board_class)
+        for move in self.moves[:ply]:
+            board.apply_move(move)
+        return board
+
+    def _board(self, board_class):
+        """Return an empty board for the game.  Each slot gets its own
+        placeholder player, as both players may have the same name.
+        """
+        return board_class(object(), object(), self.data["width"], self.data["height"])
+
+    def isoviz(self):
+        """Return the move history in the format of isoviz/display.html. """
+        return json.dumps([list(move) for move in self.moves])
+
+    def __repr__(self):
+        return "GameRecord({} vs {}: player {} won after {} moves ({}))".format(
+            self.players[0], self.players[1], self.data["winner"] + 1,
+            len(self.data["moves"]), self.termination)
+
+
+def read_games(path, agent=None, lost=None):
+    """Read the games of a log one at a time.
+
+    Parameters
+    ----------
+    path : str
+        The log file.
+
+    agent : str (optional)
+        Only return the games the agent with this name played in.
+
+    lost : bool (optional)
+        With agent, only return the games the agent lost (True) or won
+        (False).
+
+    Yields
+    ------
+    `GameRecord`
+    """
+    needle = None if agent is None else json.dumps(agent)
+    with _open(path, "r") as f:
+        for line in f:
+            #Skip lines that cannot mention the agent without parsing them
+            if needle is not None and needle not in line:
+                continue
+            data = json.loads(line)
+            if agent is not None:
+                if agent == data["agent"]:
+                    slot = data["agent_slot"]
+                elif agent == data["opponent"]:
+                    slot = 1 - data["agent_slot"]
+                else:
+                    continue
+                if lost is not None and (data["winner"] != slot) != lost:
+                    continue
+            yield GameRecord(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the games of a game log.")
+    parser.add_argument("path", help="the NDJSON game log (may be gzip-compressed)")
+    parser.add_argument("--agent", help="only show games played by this agent")
+    parser.add_argument("--losses", action="store_true", help="only show the agent's losses")
+    args = parser.parse_args(argv)
+
+    for record in read_games(args.path, args.agent, True if args.losses else None):
+        print(record)
+        print(record.isoviz())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+This file contains vectorized (NumPy) versions of the board features used by
+the heuristics in game_agent.py and sample_players.py, computed for a whole
+batch of positions at once.
+
+A batch of boards that share a geometry is encoded as
+
+    occupied : bool array (N, cells), True where a cell is blocked
+    own, opp : int arrays (N,), the cell index of the scoring player and of
+               their opponent (-1 before the player has moved)
+    active   : bool array (N,), True where the scoring player is to move
+
+using the same cell numbering as `Board` (idx = row + column * height).  The
+legal moves of every player are then a single gather from a precomputed
+reachability matrix, and the features are reductions over those masks.
+
+NumPy is only needed by this module; `import isolation` does not load it.
+"""
+import numpy as np
+
+from .isolation import Board, knight_neighbours
+from .bitboard import BitBoard
+
+# Per-geometry tables keyed by (width, height); see geometry_tables()
+_TABLES = {}
+
+
+def geometry_tables(width, height):
+    """Return the lookup tables for a board geometry, built on first use.
+
+    Returns
+    -------
+    (ndarray, ndarray, ndarray)
+        The (cells + 1, cells) boolean reachability matrix whose row idx marks
+        the cells a knight can reach from cell idx -- the extra last row is
+        all True, so indexing it with -1 (a player who has not moved yet)
+        yields every cell -- and the distance and squared distance of every
+        cell from the centre of the board, (height / 2, width / 2).
+    """
+    tables = _TABLES.get((width, height))
+    if tables is None:
+        cells = width * height
+        reach = np.zeros((cells + 1, cells), dtype=bool)
+        _, neighbours = knight_neighbours(width, height)
+        for idx, cell in enumerate(neighbours):
+            reach[idx, [n for _, n in cell]] = True
+        reach[cells, :] = True
+        idx = np.arange(cells)
+        distance_sq = (height / 2. - idx % height) ** 2 + (width / 2. - idx // height) ** 2
+        tables = (reach, np.sqrt(distance_sq), distance_sq)
+        _TABLES[(width, height)] = tables
+    return tables
+
+
+def encode_boards(boards, player):
+    """Encode a sequence of boards as arrays.
+
+    Parameters
+    ----------
+    boards : sequence of `isolation.Board` (or `isolation.BitBoard`)
+        The positions to encode. All must be of the same class and geometry
+        and have the same players in the same order (e.g., the children of
+        one node of a search).
+
+    player : object
+        The player the positions are scored for.
+
+    Returns
+    -------
+    (ndarray, ndarray, ndarray, ndarray)
+        The occupied, own, opp and active arrays described above.
+    """
+    first = boards[0]
+    cells = first.width * first.height
+    if player == first._player_1:
+        own_slot = 0
+    elif player == first._player_2:
+        own_slot = 1
+    else:
+        raise RuntimeError("`player` must be an object registered as a player in the current game.")
+
+    if isinstance(first, BitBoard):
+        nbytes = (cells + 7) // 8
+        raw = b"".join(board._blocked.to_bytes(nbytes, "little") for board in boards)
+        #unpackbits only takes bitorder from numpy 1.17: unpack most significant
+        #bit first and reverse the bits of each byte
+        bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8)).reshape(-1, 8)[:, ::-1].ravel()
+        occupied = bits.reshape(len(boards), nbytes * 8)[:, :cells].astype(bool)
+        # (player 1 cell, player 2 cell, initiative)
+        state = np.array([(board._p1_pos, board._p2_pos, board._initiative)
+                          for board in boards], dtype=np.intp)
+    else:
+        occupied = np.array([board._board_state[:cells] for board in boards], dtype=bool)
+        # The last 3 entries of the board state are initiative, player 2 and
+        # player 1 last move; NOT_MOVED (None) becomes -1
+        state = np.array([[-1 if v is Board.NOT_MOVED else v for v in board._board_state[:-4:-1]]
+                          for board in boards], dtype=np.intp)
+
+    own, opp = state[:, own_slot], state[:, 1 - own_slot]
+    active = state[:, 2] == own_slot
+    return occupied, own, opp, active
+
+
+def board_features(boards, player):
+    """Compute the heuristic features of a batch of positions.
+
+    Parameters
+    ----------
+    boards : sequence of `isolation.Board`
+        The positions to evaluate (same geometry).
+
+    player : object
+        The player the features are computed for.
+
+    Returns
+    -------
+    dict<str, ndarray>
+        The features described in `position_features()`.
+    """
+    first = boards[0]
+    occupied, own, opp, active = encode_boards(boards, player)
+    return position_features(occupied, own, opp, active, first.width, first.height)
+
+
+def position_features(occupied, own, opp, active, width, height):
+    """Compute the heuristic features of a batch of encoded positions (see
+    `encode_boards()`).
+
+    Returns
+    -------
+    dict<str, ndarray>
+        Arrays of shape (N,):
+
+        own_moves, opp_moves : number of legal moves of each player
+        own_distance, opp_distance : mean Euclidean distance of each
+            player's legal moves from the centre of the board (0 with no
+            moves)
+        opp_distance_sq : mean squared distance of the opponent's legal moves
+            from the centre of the board (0 with no moves)
+        blocking_moves : number of cells both players can move to
+        lost, won : whether the player has lost or won the game
+    """
+    reach, distance, distance_sq = geometry_tables(width, height)
+    open_cells = ~occupied
+    own_mask = reach[own] & open_cells
+    opp_mask = reach[opp] & open_cells
+
+    own_moves = own_mask.sum(axis=1)
+    opp_moves = opp_mask.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        own_distance = np.nan_to_num((own_mask @ distance) / own_moves)
+        opp_distance = np.nan_to_num((opp_mask @ distance) / opp_moves)
+        opp_distance_sq = np.nan_to_num((opp_mask @ distance_sq) / opp_moves)
+
+    # Only the player to move can be out of moves and lose
+    active_moves = np.where(active, own_moves, opp_moves)
+    return {
+        "own_moves": own_moves,
+        "opp_moves": opp_moves,
+        "own_distance": own_distance,
+        "opp_distance": opp_distance,
+        "opp_distance_sq": opp_distance_sq,
+        "blocking_moves": (own_mask & opp_mask).sum(axis=1),
+        "lost": active & (active_moves == 0),
+        "won": ~active & (active_moves == 0),
+    }
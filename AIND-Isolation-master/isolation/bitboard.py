@@ -0,0 +1,256 @@
+"""
+This file contains the `BitBoard` class, a drop-in replacement for
+`isolation.Board` that keeps the game state in a handful of integers rather
+than a Python list.
+
+Cells are numbered exactly as they are in `Board` (column-major, i.e.,
+idx = row + column * height) and bit `idx` of the `_blocked` integer is set
+once that cell has been occupied.  The knight moves available from each
+cell are precomputed once per board geometry as a tuple of bit masks, so
+move generation is a mask lookup followed by an AND with the complement of
+the blocked cells, and copying a board only copies a few integers.
+"""
+from .indexed import NO_POSITION, IndexedBoard
+from .isolation import knight_neighbours
+
+# Knight move masks keyed by (width, height); each value is a tuple holding
+# one bit mask per cell of the board
+_KNIGHT_MASKS = {}
+
+
+def knight_masks(width, height):
+    """Return the tuple of knight move bit masks for a board geometry.
+
+    The masks are built from the `knight_neighbours()` tables on first use
+    of a (width, height) pair and then shared by every `BitBoard` with the
+    same geometry.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    -------
+    tuple<int>
+        Element idx is a bit mask of the cells a knight can reach from cell
+        idx (ignoring blocked cells).
+    """
+    masks = _KNIGHT_MASKS.get((width, height))
+    if masks is None:
+        _, neighbours = knight_neighbours(width, height)
+        masks = tuple(sum(1 << n for _, n in cell) for cell in neighbours)
+        _KNIGHT_MASKS[(width, height)] = masks
+    return masks
+
+
+class BitBoard(IndexedBoard):
+    """Implement the Isolation `Board` API on top of integer bitboards.
+
+    The public interface (and the `play()` loop inherited from `Board`) is
+    unchanged, so any agent written against `Board` can be handed a
+    `BitBoard` instead.  Unlike `Board`, legal moves are returned in
+    ascending cell order rather than shuffled.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+
+    track_features : bool (optional)
+        Accepted for compatibility with `Board`; the move, open cell and open
+        neighbour counts of a bitboard are single popcounts, so there is
+        nothing to maintain incrementally.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7, track_features=False):
+        super().__init__(player_1, player_2, width, height)
+
+        # Blocked cells (the player positions are kept by IndexedBoard)
+        self._blocked = 0
+
+        # Undo log kept as a linked list of (cell index, previous position,
+        # rest of log) tuples; it is immutable, so copies can share it
+        self._undo_log = None
+
+        self._masks = knight_masks(width, height)
+        self._full = (1 << (width * height)) - 1
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = BitBoard.__new__(BitBoard)
+        new_board.__dict__.update(self.__dict__)
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        r, c = move
+        return (0 <= r < self.height and 0 <= c < self.width and
+                not self._blocked >> (r + c * self.height) & 1)
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        return self._to_moves(self._full & ~self._blocked)
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        return self._to_moves(self._open_moves(self._position(player)))
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves for the specified player; the same
+        as len(get_legal_moves(player)) without building the list.
+        """
+        if player is None:
+            player = self._active_player
+        return bin(self._open_moves(self._position(player))).count("1")
+
+    def count_open_cells(self):
+        """Return the number of cells that are still open. """
+        return bin(self._full & ~self._blocked).count("1")
+
+    def count_open_neighbours(self, move):
+        """Return the number of open cells a knight could move to from the
+        cell move (whether or not move itself is open).
+        """
+        return bin(self._masks[move[0] + move[1] * self.height] & ~self._blocked).count("1")
+
+    def get_region(self, player):
+        """Return the open cells the specified player can still reach by a
+        sequence of knight moves over open cells (every open cell if the
+        player has not moved).
+        """
+        return self._to_moves(self._region(self._position(player)))
+
+    def is_partitioned(self):
+        """Test whether both players have moved and no open cell can be
+        reached by both of them.
+        """
+        if self._p1_pos == NO_POSITION or self._p2_pos == NO_POSITION:
+            return False
+        return not self._region(self._p1_pos) & self._region(self._p2_pos)
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        self._undo_log = (idx, self._place(idx), self._undo_log)
+        self._blocked |= 1 << idx
+
+    def undo_move(self):
+        """Take back the most recent move made with apply_move(). """
+        idx, last_pos, self._undo_log = self._undo_log
+        self._unplace(idx, last_pos)
+        self._blocked &= ~(1 << idx)
+
+    def is_winner(self, player):
+        """ Test whether the specified player has won the game. """
+        return player == self._inactive_player and not self._open_moves(self._active_position())
+
+    def is_loser(self, player):
+        """ Test whether the specified player has lost the game. """
+        return player == self._active_player and not self._open_moves(self._active_position())
+
+    def utility(self, player):
+        """Returns the utility of the current game state from the perspective
+        of the specified player (+inf if the player has won, -inf if the
+        player has lost and 0 otherwise).
+        """
+        if not self._open_moves(self._active_position()):
+
+            if player == self._inactive_player:
+                return float("inf")
+
+            if player == self._active_player:
+                return float("-inf")
+
+        return 0.
+
+    def _is_open(self, idx):
+        return not self._blocked >> idx & 1
+
+    def _open_moves(self, idx):
+        """Return the bit mask of open cells reachable from cell idx; every
+        open cell is reachable before the player has been placed.
+        """
+        if idx == NO_POSITION:
+            return self._full & ~self._blocked
+        return self._masks[idx] & ~self._blocked
+
+    def _region(self, idx):
+        """Return the bit mask of open cells reachable from cell idx by a
+        sequence of knight moves over open cells.
+        """
+        open_cells = self._full & ~self._blocked
+        if idx == NO_POSITION:
+            return open_cells
+        masks = self._masks
+        region = 0
+        frontier = masks[idx] & open_cells
+        while frontier:
+            region |= frontier
+            reached = 0
+            while frontier:
+                low = frontier & -frontier
+                reached |= masks[low.bit_length() - 1]
+                frontier ^= low
+            frontier = reached & open_cells & ~region
+        return region
+
+    def _to_moves(self, mask):
+        """Convert a bit mask of cells to a list of (row, column) pairs."""
+        height = self.height
+        moves = []
+        while mask:
+            low = mask & -mask
+            idx = low.bit_length() - 1
+            moves.append((idx % height, idx // height))
+            mask ^= low
+        return moves
@@ -0,0 +1,202 @@
+"""
+This file contains `IndexedBoard`, the base class of the `Board`
+replacements that store each player's position as a cell index
+(`BitBoard` and `SparseBoard`).
+
+The subclasses differ in how they store the blocked cells, and implement
+_is_open(), copy(), apply_move() and undo_move() for their storage (the
+last two by calling _place() and _unplace()).  Everything that only depends
+on the player positions (player locations, the Zobrist hash, the text
+rendering, regions and partition tests) lives here; get_region() walks the
+knight move table _neighbours, which `BitBoard` replaces with bit masks.
+"""
+import abc
+
+from .isolation import Board, zobrist_keys
+
+# Sentinel stored in the integer position slots before a player has moved
+NO_POSITION = -1
+
+
+class IndexedBoard(Board, metaclass=abc.ABCMeta):
+    """Base class of the boards that keep the position of each player as a
+    cell index (idx = row + column * height) in _p1_pos and _p2_pos, or
+    NO_POSITION before the player has moved, and the initiative as a bit
+    (0 for player 1, 1 for player 2).
+
+    Subclasses must implement _is_open() for their storage of the blocked
+    cells; the class cannot be instantiated without it.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7):
+        self.width = width
+        self.height = height
+        self.move_count = 0
+        self._player_1 = player_1
+        self._player_2 = player_2
+        self._active_player = player_1
+        self._inactive_player = player_2
+
+        self._p1_pos = NO_POSITION
+        self._p2_pos = NO_POSITION
+        self._initiative = 0
+
+        # Zobrist hash of the position (shared with Board, so every board
+        # class hashes the same position to the same value)
+        self._zobrist = zobrist_keys(width, height)
+        self._hash = 0
+
+    def hash(self):
+        return self._hash
+
+    def get_player_location(self, player):
+        """Find the current location of the specified player on the board.
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        (int, int) or None
+            The coordinate pair (row, column) of the input player, or None
+            if the player has not moved.
+        """
+        idx = self._position(player)
+        if idx == NO_POSITION:
+            return Board.NOT_MOVED
+        return (idx % self.height, idx // self.height)
+
+    def get_region(self, player):
+        """Return the open cells the specified player can still reach by a
+        sequence of knight moves over open cells (every open cell if the
+        player has not moved).
+        """
+        start = self._position(player)
+        if start == NO_POSITION:
+            return self.get_blank_spaces()
+        is_open = self._is_open
+        seen = {start}
+        region = []
+        frontier = [start]
+        while frontier:
+            idx = frontier.pop()
+            for move, n in self._neighbours[idx]:
+                if n not in seen and is_open(n):
+                    seen.add(n)
+                    region.append(move)
+                    frontier.append(n)
+        return region
+
+    def is_partitioned(self):
+        """Test whether both players have moved and no open cell can be
+        reached by both of them.
+        """
+        if self._p1_pos == NO_POSITION or self._p2_pos == NO_POSITION:
+            return False
+        region = set(self.get_region(self._player_1))
+        return region.isdisjoint(self.get_region(self._player_2))
+
+    def to_string(self, symbols=['1', '2']):
+        """Generate a string representation of the current game state, marking
+        the location of each player and indicating which cells have been
+        blocked, and which remain open.
+        """
+        col_margin = len(str(self.height - 1)) + 1
+        prefix = "{:<" + "{}".format(col_margin) + "}"
+        offset = " " * (col_margin + 3)
+        out = offset + '   '.join(map(str, range(self.width))) + '\n\r'
+        for i in range(self.height):
+            out += prefix.format(i) + ' | '
+            for j in range(self.width):
+                idx = i + j * self.height
+                if self._is_open(idx):
+                    out += ' '
+                elif self._p1_pos == idx:
+                    out += symbols[0]
+                elif self._p2_pos == idx:
+                    out += symbols[1]
+                else:
+                    out += '-'
+                out += ' | '
+            out += '\n\r'
+
+        return out
+
+    @abc.abstractmethod
+    def _is_open(self, idx):
+        """Test whether cell idx is open. """
+
+    def _place(self, idx):
+        """Move the active player to cell idx and pass the initiative,
+        updating the positions, the hash and the move count (but not the
+        blocked cells).
+
+        Returns
+        -------
+        int
+            The previous position of the player (or NO_POSITION), for
+            _unplace().
+        """
+        if self._initiative:
+            last_pos = self._p2_pos
+            self._p2_pos = idx
+        else:
+            last_pos = self._p1_pos
+            self._p1_pos = idx
+        self._hash ^= self._move_hash(idx, last_pos, self._initiative + 1)
+        self._initiative ^= 1
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count += 1
+        return last_pos
+
+    def _unplace(self, idx, last_pos):
+        """Take back the _place(idx) call that returned last_pos. """
+        self._initiative ^= 1
+        if self._initiative:
+            self._p2_pos = last_pos
+        else:
+            self._p1_pos = last_pos
+        self._hash ^= self._move_hash(idx, last_pos, self._initiative + 1)
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        self.move_count -= 1
+
+    def _move_hash(self, idx, last_pos, slot):
+        """Return the Zobrist keys toggled when the player in slot (1 or 2)
+        moves from cell last_pos to cell idx.
+        """
+        blocked_keys, p1_keys, p2_keys, initiative_key = self._zobrist
+        player_keys = p1_keys if slot == 1 else p2_keys
+        keys = blocked_keys[idx] ^ player_keys[idx] ^ initiative_key
+        if last_pos != NO_POSITION:
+            keys ^= player_keys[last_pos]
+        return keys
+
+    def _position(self, player):
+        """Return the cell index of a registered player (or NO_POSITION)."""
+        if player == self._player_1:
+            return self._p1_pos
+        elif player == self._player_2:
+            return self._p2_pos
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def _active_position(self):
+        return self._p2_pos if self._initiative else self._p1_pos
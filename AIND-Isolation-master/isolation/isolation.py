@@ -8,11 +8,156 @@ remain compatible with the defaults provided, and none of your changes will
 be available to project reviewers.
 """
 import random
+import time
 import timeit
 from copy import copy
 
 TIME_LIMIT_MILLIS = 150
 
+# Zobrist keys keyed by (width, height); see zobrist_keys()
+_ZOBRIST_KEYS = {}
+
+# Knight move tables keyed by (width, height); see knight_neighbours()
+_KNIGHT_NEIGHBOURS = {}
+
+
+def zobrist_keys(width, height):
+    """Return the Zobrist hashing keys for a board geometry.
+
+    The keys are drawn from a generator seeded with the board size, so every
+    process (and every run) assigns the same hash to the same position.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    -------
+    (tuple<int>, tuple<int>, tuple<int>, int)
+        64-bit keys for each blocked cell, for player 1 standing on each
+        cell, for player 2 standing on each cell, and the key toggled when
+        the initiative passes to player 2.
+    """
+    keys = _ZOBRIST_KEYS.get((width, height))
+    if keys is None:
+        rng = random.Random("zobrist-{}x{}".format(width, height))
+        size = width * height
+        keys = (tuple(rng.getrandbits(64) for _ in range(size)),
+                tuple(rng.getrandbits(64) for _ in range(size)),
+                tuple(rng.getrandbits(64) for _ in range(size)),
+                rng.getrandbits(64))
+        _ZOBRIST_KEYS[(width, height)] = keys
+    return keys
+
+
+def knight_neighbours(width, height):
+    """Return the knight move tables for a board geometry.
+
+    The tables are built on first use of a (width, height) pair and then
+    shared by every board with the same geometry, so move generation never
+    has to enumerate and bounds-check the eight knight directions.
+
+    Parameters
+    ----------
+    width : int
+        The number of columns on the board.
+
+    height : int
+        The number of rows on the board.
+
+    Returns
+    -------
+    (dict<(int, int), int>, tuple<tuple<((int, int), int)>>)
+        A mapping from every on-board coordinate pair (row, column) to its
+        cell index, and for each cell index the (move, cell index) pairs a
+        knight can reach from that cell.
+    """
+    tables = _KNIGHT_NEIGHBOURS.get((width, height))
+    if tables is None:
+        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                      (1, -2), (1, 2), (2, -1), (2, 1)]
+        cell_index = {}
+        neighbours = []
+        for idx in range(width * height):
+            r, c = idx % height, idx // height
+            cell_index[(r, c)] = idx
+            neighbours.append(tuple(((r + dr, c + dc), (r + dr) + (c + dc) * height)
+                                    for dr, dc in directions
+                                    if 0 <= r + dr < height and 0 <= c + dc < width))
+        tables = (cell_index, tuple(neighbours))
+        _KNIGHT_NEIGHBOURS[(width, height)] = tables
+    return tables
+
+
+class TimeControl(object):
+    """Describe how the moves of a game are timed by `Board.play()`.
+
+    Parameters
+    ----------
+    move_time : numeric (optional)
+        The number of milliseconds each player may spend on every move; used
+        when there is no time bank.
+
+    clock : str (optional)
+        The clock used to time the players: "wall" (timeit.default_timer),
+        "process" (time.process_time, the CPU time of this process only, so
+        other processes competing for the machine do not eat into a player's
+        time) or "perf_ns" (time.perf_counter_ns, with the elapsed time taken
+        in integer nanoseconds; only offered where the clock exists, i.e.,
+        from Python 3.7).
+
+    bank : numeric (optional)
+        If given, each player starts the game with this many milliseconds and
+        may spend as much of what is left as they like on any move.
+
+    increment : numeric (optional)
+        Milliseconds added to a player's bank after each of their moves.
+    """
+    CLOCKS = {
+        "wall": (timeit.default_timer, 1000.),
+        "process": (time.process_time, 1000.),
+    }
+    if getattr(time, "perf_counter_ns", None) is not None:
+        CLOCKS["perf_ns"] = (time.perf_counter_ns, 1e-6)
+
+    def __init__(self, move_time=TIME_LIMIT_MILLIS, clock="wall", bank=None, increment=0.):
+        if clock not in TimeControl.CLOCKS:
+            raise ValueError("Unknown clock {!r}; choose one of {}".format(
+                clock, ", ".join(sorted(TimeControl.CLOCKS))))
+        self.move_time = move_time
+        self.clock = clock
+        self.bank = bank
+        self.increment = increment
+
+    def timer(self):
+        """Return (ticks, scale): a function reading the clock and the factor
+        converting a difference of two readings to milliseconds.
+        """
+        return TimeControl.CLOCKS[self.clock]
+
+    def start_game(self, players):
+        """Return the time remaining to each player at the start of a game, as
+        a dict keyed by player (None values when there is no time bank).
+        """
+        return {player: self.bank for player in players}
+
+    def allowed(self, remaining, player):
+        """Return the milliseconds the player may use for their next move. """
+        if remaining[player] is None:
+            return self.move_time
+        return remaining[player]
+
+    def charge(self, remaining, player, elapsed):
+        """Deduct the time a move took from the player's bank and add the
+        increment.
+        """
+        if remaining[player] is not None:
+            remaining[player] += self.increment - elapsed
+
 
 class Board(object):
     """Implement a model for the game Isolation assuming each player moves like
@@ -33,11 +178,19 @@ class Board(object):
 
     height : int (optional)
         The number of rows that the board should have.
+
+    track_features : bool (optional)
+        If True the board keeps the number of open cells and, for every cell,
+        the number of open cells a knight can reach from it, updating them in
+        apply_move() and undo_move().  count_legal_moves() (and so is_winner(),
+        is_loser() and mobility heuristics) then costs O(1) instead of a scan
+        of the player's knight moves, at the price of eight counter updates
+        per move and a slightly larger copy().
     """
     BLANK = 0
     NOT_MOVED = None
 
-    def __init__(self, player_1, player_2, width=7, height=7):
+    def __init__(self, player_1, player_2, width=7, height=7, track_features=False):
         self.width = width
         self.height = height
         self.move_count = 0
@@ -52,8 +205,29 @@ class Board(object):
         self._board_state[-1] = Board.NOT_MOVED
         self._board_state[-2] = Board.NOT_MOVED
 
+        # Stack of (cell index, previous last move) pairs, one per move made
+        # with apply_move(), used by undo_move() to restore the prior state
+        self._undo_log = []
+
+        # Zobrist hash of the position, updated incrementally by apply_move()
+        # and undo_move(); the empty board with player 1 to move hashes to 0
+        self._zobrist = zobrist_keys(width, height)
+        self._hash = 0
+
+        # Coordinate to cell index map and knight moves from every cell,
+        # shared by all boards of this size
+        self._cell_index, self._neighbours = knight_neighbours(width, height)
+
+        # Incrementally maintained features (None unless track_features): the
+        # number of open knight neighbours of every cell and of open cells
+        self._open_neighbours = None
+        self._open_cells = None
+        if track_features:
+            self._open_neighbours = [len(n) for n in self._neighbours]
+            self._open_cells = width * height
+
     def hash(self):
-        return str(self._board_state).__hash__()
+        return self._hash
 
     @property
     def active_player(self):
@@ -97,6 +271,10 @@ class Board(object):
         new_board._active_player = self._active_player
         new_board._inactive_player = self._inactive_player
         new_board._board_state = copy(self._board_state)
+        new_board._hash = self._hash
+        if self._open_neighbours is not None:
+            new_board._open_neighbours = self._open_neighbours[:]
+            new_board._open_cells = self._open_cells
         return new_board
 
     def forecast_move(self, move):
@@ -132,9 +310,8 @@ class Board(object):
         bool
             Returns True if the move is legal, False otherwise
         """
-        idx = move[0] + move[1] * self.height
-        return (0 <= move[0] < self.height and 0 <= move[1] < self.width and
-                self._board_state[idx] == Board.BLANK)
+        idx = self._cell_index.get(tuple(move))
+        return idx is not None and self._board_state[idx] == Board.BLANK
 
     def get_blank_spaces(self):
         """Return a list of the locations that are still available on the board.
@@ -188,7 +365,105 @@ class Board(object):
         """
         if player is None:
             player = self.active_player
-        return self.__get_moves(self.get_player_location(player))
+        return self.__get_moves(self.__last_move(player))
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves for the specified player; the same
+        as len(get_legal_moves(player)) without building the list.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            count the legal moves for the active player on the board.
+
+        Returns
+        -------
+        int
+            The number of legal moves for the player.
+        """
+        if player is None:
+            player = self.active_player
+        idx = self.__last_move(player)
+        if idx is Board.NOT_MOVED:
+            return self.count_open_cells()
+        if self._open_neighbours is not None:
+            return self._open_neighbours[idx]
+        board_state = self._board_state
+        return sum(1 for _, n in self._neighbours[idx] if board_state[n] == Board.BLANK)
+
+    def count_open_cells(self):
+        """Return the number of cells that are still open, i.e., the same as
+        len(get_blank_spaces()).
+        """
+        if self._open_cells is not None:
+            return self._open_cells
+        return self._board_state[:-3].count(Board.BLANK)
+
+    def count_open_neighbours(self, move):
+        """Return the number of open cells a knight could move to from the
+        cell move (whether or not move itself is open).
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) on the board.
+
+        Returns
+        -------
+        int
+            The number of open cells one knight move away from move.
+        """
+        idx = move[0] + move[1] * self.height
+        if self._open_neighbours is not None:
+            return self._open_neighbours[idx]
+        board_state = self._board_state
+        return sum(1 for _, n in self._neighbours[idx] if board_state[n] == Board.BLANK)
+
+    def get_region(self, player):
+        """Return the open cells the specified player can still reach by a
+        sequence of knight moves over open cells (every open cell if the
+        player has not moved).
+
+        Parameters
+        ----------
+        player : object
+            An object registered as a player in the current game.
+
+        Returns
+        -------
+        list<(int, int)>
+            The coordinate pairs (row, column) of the reachable cells.
+        """
+        start = self.__last_move(player)
+        if start is Board.NOT_MOVED:
+            return self.get_blank_spaces()
+        board_state = self._board_state
+        neighbours = self._neighbours
+        seen = {start}
+        region = []
+        frontier = [start]
+        while frontier:
+            idx = frontier.pop()
+            for move, n in neighbours[idx]:
+                if n not in seen and board_state[n] == Board.BLANK:
+                    seen.add(n)
+                    region.append(move)
+                    frontier.append(n)
+        return region
+
+    def is_partitioned(self):
+        """Test whether the players have been separated, i.e., both have moved
+        and no open cell can be reached by both of them.  From then on the
+        players cannot interfere with each other, and the game is decided by
+        which of them can make the longer sequence of moves in their own
+        region.
+        """
+        if (self._board_state[-1] is Board.NOT_MOVED or
+                self._board_state[-2] is Board.NOT_MOVED):
+            return False
+        region = set(self.get_region(self._player_1))
+        return region.isdisjoint(self.get_region(self._player_2))
 
     def apply_move(self, move):
         """Move the active player to a specified location.
@@ -201,19 +476,64 @@ class Board(object):
         """
         idx = move[0] + move[1] * self.height
         last_move_idx = int(self.active_player == self._player_2) + 1
+        last_move = self._board_state[-last_move_idx]
+        self._undo_log.append((idx, last_move))
+        self._hash ^= self._move_hash(idx, last_move, last_move_idx)
         self._board_state[-last_move_idx] = idx
         self._board_state[idx] = 1
         self._board_state[-3] ^= 1
         self._active_player, self._inactive_player = self._inactive_player, self._active_player
         self.move_count += 1
+        counts = self._open_neighbours
+        if counts is not None:
+            for _, n in self._neighbours[idx]:
+                counts[n] -= 1
+            self._open_cells -= 1
+
+    def undo_move(self):
+        """Take back the most recent move made with apply_move(), restoring
+        the blocked cell, the last move of the player who made it, the
+        initiative and the move count.
+
+        Together with apply_move() this lets a search walk the game tree on a
+        single board instead of allocating a copy for every node.  Only moves
+        applied to this object can be undone (a copy starts with an empty
+        undo log).
+        """
+        idx, last_move = self._undo_log.pop()
+        self._active_player, self._inactive_player = self._inactive_player, self._active_player
+        last_move_idx = int(self.active_player == self._player_2) + 1
+        self._hash ^= self._move_hash(idx, last_move, last_move_idx)
+        self._board_state[-last_move_idx] = last_move
+        self._board_state[idx] = Board.BLANK
+        self._board_state[-3] ^= 1
+        self.move_count -= 1
+        counts = self._open_neighbours
+        if counts is not None:
+            for _, n in self._neighbours[idx]:
+                counts[n] += 1
+            self._open_cells += 1
+
+    def _move_hash(self, idx, last_move, last_move_idx):
+        """Return the Zobrist keys toggled when the player whose last-move
+        slot is last_move_idx (1 for player 1, 2 for player 2) moves from
+        last_move to cell idx.  XOR-ing them in applies the move and XOR-ing
+        them again takes it back.
+        """
+        blocked_keys, p1_keys, p2_keys, initiative_key = self._zobrist
+        player_keys = p1_keys if last_move_idx == 1 else p2_keys
+        keys = blocked_keys[idx] ^ player_keys[idx] ^ initiative_key
+        if last_move is not Board.NOT_MOVED:
+            keys ^= player_keys[last_move]
+        return keys
 
     def is_winner(self, player):
         """ Test whether the specified player has won the game. """
-        return player == self._inactive_player and not self.get_legal_moves(self._active_player)
+        return player == self._inactive_player and not self.count_legal_moves(self._active_player)
 
     def is_loser(self, player):
         """ Test whether the specified player has lost the game. """
-        return player == self._active_player and not self.get_legal_moves(self._active_player)
+        return player == self._active_player and not self.count_legal_moves(self._active_player)
 
     def utility(self, player):
         """Returns the utility of the current game state from the perspective
@@ -237,7 +557,7 @@ class Board(object):
             a value of -inf if the player has lost, and a value of 0
             otherwise.
         """
-        if not self.get_legal_moves(self._active_player):
+        if not self.count_legal_moves(self._active_player):
 
             if player == self._inactive_player:
                 return float("inf")
@@ -247,18 +567,26 @@ class Board(object):
 
         return 0.
 
-    def __get_moves(self, loc):
+    def __last_move(self, player):
+        """Return the cell index of a registered player (or NOT_MOVED). """
+        if player == self._player_1:
+            return self._board_state[-1]
+        elif player == self._player_2:
+            return self._board_state[-2]
+        raise RuntimeError(
+            "Invalid player in get_player_location: {}".format(player))
+
+    def __get_moves(self, idx):
         """Generate the list of possible moves for an L-shaped motion (like a
-        knight in chess).
+        knight in chess) from cell idx, using the precomputed knight move
+        table of the board geometry.
         """
-        if loc == Board.NOT_MOVED:
+        if idx is Board.NOT_MOVED:
             return self.get_blank_spaces()
 
-        r, c = loc
-        directions = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                      (1, -2), (1, 2), (2, -1), (2, 1)]
-        valid_moves = [(r + dr, c + dc) for dr, dc in directions
-                       if self.move_is_legal((r + dr, c + dc))]
+        board_state = self._board_state
+        valid_moves = [move for move, n in self._neighbours[idx]
+                       if board_state[n] == Board.BLANK]
         random.shuffle(valid_moves)
         return valid_moves
 
@@ -295,7 +623,7 @@ class Board(object):
 
         return out
 
-    def play(self, time_limit=TIME_LIMIT_MILLIS):
+    def play(self, time_limit=TIME_LIMIT_MILLIS, time_control=None, record_times=False):
         """Execute a match between the players by alternately soliciting them
         to select a move and applying it in the game.
 
@@ -305,6 +633,15 @@ class Board(object):
             The maximum number of milliseconds to allow before timeout
             during each turn.
 
+        time_control : `TimeControl` (optional)
+            The clock, time bank and increment used to time the players;
+            replaces time_limit when given.
+
+        record_times : bool (optional)
+            If True each move history entry is [row, column, milliseconds],
+            where the last item is the time the player took to choose the
+            move.
+
         Returns
         ----------
         (player, list<[(int, int),]>, str)
@@ -316,20 +653,25 @@ class Board(object):
         move_history = []
         if debug is True:print('START NEW GAME#########################')
 
-        time_millis = lambda: 1000 * timeit.default_timer()
+        if time_control is None:
+            time_control = TimeControl(time_limit)
+        ticks, scale = time_control.timer()
+        remaining = time_control.start_game([self._player_1, self._player_2])
 
         while True:
 
             legal_player_moves = self.get_legal_moves()
             game_copy = self.copy()
 
-            move_start = time_millis()
-            time_left = lambda : time_limit - (time_millis() - move_start)
+            allowed = time_control.allowed(remaining, self._active_player)
+            move_start = ticks()
+            time_left = lambda : allowed - (ticks() - move_start) * scale
 
             #Call player's get_move function
             curr_move = self._active_player.get_move(game_copy, time_left)
             if debug is True:print('curr_move returned=',curr_move)
-            move_end = time_left()
+            elapsed = (ticks() - move_start) * scale
+            move_end = allowed - elapsed
 
             if curr_move is None:
                 if debug is True:print('Board not moved')
@@ -346,6 +688,10 @@ class Board(object):
                 if debug is True:print('illegal move')
                 return self._inactive_player, move_history, "illegal move"
 
-            move_history.append(list(curr_move))
+            time_control.charge(remaining, self._active_player, elapsed)
+            if record_times:
+                move_history.append([curr_move[0], curr_move[1], elapsed])
+            else:
+                move_history.append(list(curr_move))
 
             self.apply_move(curr_move)
@@ -0,0 +1,187 @@
+"""
+This file contains the `SparseBoard` class, a drop-in replacement for
+`isolation.Board` meant for large boards (15x15, 25x25, ...).
+
+`Board` finds the open cells by scanning every cell of the board, so
+get_blank_spaces(), count_open_cells() and the legal moves of a player who
+has not been placed yet cost O(width * height) however few cells are open.
+`SparseBoard` keeps the open cells in an indexed free-list instead:
+
+    _free   the cell indices of the open cells, in no particular order
+    _slot   for every cell, its position in _free, or BLOCKED
+
+A cell is blocked by moving the last entry of _free into its place (O(1)),
+and undo_move() reverses exactly that swap, so the free-list (and with it the
+order of get_blank_spaces()) only depends on the position, not on how the
+search reached it.  Enumerating the open cells is O(open cells), and legal
+moves come from the shared knight move tables of `knight_neighbours()`, so
+move generation does not depend on the size of the board.
+"""
+from .indexed import NO_POSITION, IndexedBoard
+from .isolation import knight_neighbours
+
+# _slot value of a blocked cell
+BLOCKED = -1
+
+
+class SparseBoard(IndexedBoard):
+    """Implement the Isolation `Board` API with an indexed free-list of open
+    cells.
+
+    The public interface (and the `play()` loop inherited from `Board`) is
+    unchanged, so any agent written against `Board` can be handed a
+    `SparseBoard` instead.  Unlike `Board`, legal moves are returned in the
+    order of the knight move table rather than shuffled.
+
+    Parameters
+    ----------
+    player_1 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    player_2 : object
+        An object with a get_move() function. This is the only function
+        directly called by the Board class for each player.
+
+    width : int (optional)
+        The number of columns that the board should have.
+
+    height : int (optional)
+        The number of rows that the board should have.
+
+    track_features : bool (optional)
+        Accepted for compatibility with `Board`; the number of open cells is
+        the length of the free-list, so there is nothing to maintain.
+    """
+
+    def __init__(self, player_1, player_2, width=7, height=7, track_features=False):
+        super().__init__(player_1, player_2, width, height)
+
+        # The free-list of open cells and the position of each cell in it
+        self._free = list(range(width * height))
+        self._slot = list(range(width * height))
+
+        # Stack of (cell index, previous position, free-list position) tuples,
+        # one per move made with apply_move()
+        self._undo_log = []
+
+        self._cell_index, self._neighbours = knight_neighbours(width, height)
+
+    def copy(self):
+        """ Return a deep copy of the current board. """
+        new_board = SparseBoard.__new__(SparseBoard)
+        new_board.__dict__.update(self.__dict__)
+        new_board._free = self._free[:]
+        new_board._slot = self._slot[:]
+        new_board._undo_log = []
+        return new_board
+
+    def move_is_legal(self, move):
+        """Test whether a move is legal in the current game state.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+
+        Returns
+        -------
+        bool
+            Returns True if the move is legal, False otherwise
+        """
+        idx = self._cell_index.get(tuple(move))
+        return idx is not None and self._slot[idx] != BLOCKED
+
+    def get_blank_spaces(self):
+        """Return a list of the locations that are still available on the board.
+        """
+        height = self.height
+        return [(idx % height, idx // height) for idx in self._free]
+
+    def get_legal_moves(self, player=None):
+        """Return the list of all legal moves for the specified player.
+
+        Parameters
+        ----------
+        player : object (optional)
+            An object registered as a player in the current game. If None,
+            return the legal moves for the active player on the board.
+
+        Returns
+        -------
+        list<(int, int)>
+            The list of coordinate pairs (row, column) of all legal moves
+            for the player constrained by the current game state.
+        """
+        if player is None:
+            player = self._active_player
+        idx = self._position(player)
+        if idx == NO_POSITION:
+            return self.get_blank_spaces()
+        slot = self._slot
+        return [move for move, n in self._neighbours[idx] if slot[n] != BLOCKED]
+
+    def count_legal_moves(self, player=None):
+        """Return the number of legal moves for the specified player; the same
+        as len(get_legal_moves(player)) without building the list.
+        """
+        if player is None:
+            player = self._active_player
+        idx = self._position(player)
+        if idx == NO_POSITION:
+            return len(self._free)
+        slot = self._slot
+        return sum(1 for _, n in self._neighbours[idx] if slot[n] != BLOCKED)
+
+    def count_open_cells(self):
+        """Return the number of cells that are still open. """
+        return len(self._free)
+
+    def count_open_neighbours(self, move):
+        """Return the number of open cells a knight could move to from the
+        cell move (whether or not move itself is open).
+        """
+        slot = self._slot
+        return sum(1 for _, n in self._neighbours[move[0] + move[1] * self.height]
+                   if slot[n] != BLOCKED)
+
+    def apply_move(self, move):
+        """Move the active player to a specified location.
+
+        Parameters
+        ----------
+        move : (int, int)
+            A coordinate pair (row, column) indicating the next position for
+            the active player on the board.
+        """
+        idx = move[0] + move[1] * self.height
+        free = self._free
+        slot = self._slot
+        #Fill the hole left in the free-list with its last entry
+        pos = slot[idx]
+        last = free.pop()
+        if last != idx:
+            free[pos] = last
+            slot[last] = pos
+        slot[idx] = BLOCKED
+        self._undo_log.append((idx, self._place(idx), pos))
+
+    def undo_move(self):
+        """Take back the most recent move made with apply_move(). """
+        idx, last_pos, pos = self._undo_log.pop()
+        free = self._free
+        slot = self._slot
+        #Undo the swap: the entry moved into the hole goes back to the end
+        if pos < len(free):
+            last = free[pos]
+            slot[last] = len(free)
+            free.append(last)
+            free[pos] = idx
+        else:
+            free.append(idx)
+        slot[idx] = pos
+        self._unplace(idx, last_pos)
+
+    def _is_open(self, idx):
+        return self._slot[idx] != BLOCKED
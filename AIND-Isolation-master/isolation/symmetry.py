@@ -0,0 +1,147 @@
+"""
+This file contains the symmetries of the Isolation board and the canonical
+form of a position built from them.
+
+Knight moves are preserved by reflecting or rotating the board, so a
+position and its images play identically: the 7x7 board has the eight
+symmetries of a square, and a non-square board the four of a rectangle.
+The canonical hash of a position is the smallest Zobrist hash among its
+images, and the symmetry producing it maps moves between the position and
+its canonical image.  Tables keyed on canonical hashes (opening books,
+endgame caches...) store one entry per symmetry class instead of up to
+eight.
+"""
+from .isolation import Board, zobrist_keys
+
+# Symmetries keyed by (width, height); see symmetries()
+_SYMMETRIES = {}
+
+
+class Symmetry(object):
+    """A reflection or rotation of a width x height board.
+
+    Attributes
+    ----------
+    name : str
+        The name of the transform, e.g. "rotate_90".
+
+    perm : tuple<int>
+        perm[idx] is the cell index of the image of cell idx.
+
+    inverse : tuple<int>
+        The inverse permutation; inverse[perm[idx]] == idx.
+
+    keys : (tuple<int>, tuple<int>, tuple<int>)
+        The Zobrist keys of the blocked cells and player 1 and player 2
+        positions, permuted so that XOR-ing keys[i][idx] hashes the image of
+        a feature on cell idx.
+    """
+
+    def __init__(self, name, perm, width, height):
+        self.name = name
+        self.height = height
+        self.perm = tuple(perm)
+        inverse = [0] * len(perm)
+        for idx, image in enumerate(perm):
+            inverse[image] = idx
+        self.inverse = tuple(inverse)
+        self.keys = tuple(tuple(keys[image] for image in self.perm)
+                          for keys in zobrist_keys(width, height)[:3])
+
+    def map_move(self, move):
+        """Return the image of move (row, column) under the symmetry. """
+        idx = self.perm[move[0] + move[1] * self.height]
+        return (idx % self.height, idx // self.height)
+
+    def unmap_move(self, move):
+        """Return the move whose image under the symmetry is move; i.e., map
+        a move on the canonical board back to the original orientation.
+        """
+        idx = self.inverse[move[0] + move[1] * self.height]
+        return (idx % self.height, idx // self.height)
+
+    def __repr__(self):
+        return "Symmetry({!r})".format(self.name)
+
+
+def symmetries(width, height):
+    """Return the symmetries of a board geometry, identity first.
+
+    The list is built on first use of a (width, height) pair and then shared
+    by every board with the same geometry.
+
+    Returns
+    -------
+    list<`Symmetry`>
+        The four symmetries of a rectangular board, or the eight of a square
+        one.
+    """
+    result = _SYMMETRIES.get((width, height))
+    if result is None:
+        transforms = [("identity", lambda r, c: (r, c)),
+                      ("flip_rows", lambda r, c: (height - 1 - r, c)),
+                      ("flip_columns", lambda r, c: (r, width - 1 - c)),
+                      ("rotate_180", lambda r, c: (height - 1 - r, width - 1 - c))]
+        if width == height:
+            transforms += [("transpose", lambda r, c: (c, r)),
+                           ("rotate_90", lambda r, c: (c, height - 1 - r)),
+                           ("rotate_270", lambda r, c: (width - 1 - c, r)),
+                           ("anti_transpose", lambda r, c: (width - 1 - c, height - 1 - r))]
+        result = []
+        for name, transform in transforms:
+            perm = []
+            for idx in range(width * height):
+                r, c = transform(idx % height, idx // height)
+                perm.append(r + c * height)
+            result.append(Symmetry(name, perm, width, height))
+        _SYMMETRIES[(width, height)] = result
+    return result
+
+
+def canonical_hash(game):
+    """Return the canonical hash of a position and the symmetry producing it.
+
+    The hash of an image is the Zobrist hash that the transformed position
+    would have, so for the identity it equals game.hash(), and all the
+    images of a position share its canonical hash.  A move m for game
+    corresponds to symmetry.map_move(m) on the canonical board, and a move
+    c on the canonical board to symmetry.unmap_move(c) for game.
+
+    Parameters
+    ----------
+    game : `isolation.Board`
+        The position (any object with the `Board` interface).
+
+    Returns
+    -------
+    (int, `Symmetry`)
+        The smallest hash among the images of the position and the first
+        symmetry producing it.
+    """
+    height = game.height
+    blanks = set(r + c * height for r, c in game.get_blank_spaces())
+    blocked = [idx for idx in range(game.width * height) if idx not in blanks]
+    if game.move_count % 2:
+        player_1, player_2 = game.inactive_player, game.active_player
+        initiative = zobrist_keys(game.width, height)[3]
+    else:
+        player_1, player_2 = game.active_player, game.inactive_player
+        initiative = 0
+    positions = []
+    for slot, player in ((1, player_1), (2, player_2)):
+        location = game.get_player_location(player)
+        if location is not Board.NOT_MOVED:
+            positions.append((slot, location[0] + location[1] * height))
+
+    best_hash, best_symmetry = None, None
+    for symmetry in symmetries(game.width, height):
+        keys = symmetry.keys
+        value = initiative
+        blocked_keys = keys[0]
+        for idx in blocked:
+            value ^= blocked_keys[idx]
+        for slot, idx in positions:
+            value ^= keys[slot][idx]
+        if best_hash is None or value < best_hash:
+            best_hash, best_symmetry = value, symmetry
+    return best_hash, best_symmetry
@@ -0,0 +1,143 @@
+"""This file contains the move ordering heuristics used by `AlphaBetaPlayer`
+in game_agent.py.  The cutoff statistics used to measure how well they
+work (`CutoffStats`) are kept by every agent, so they live in game_agent.py
+and are re-exported here.
+
+Alpha-beta search prunes the most when the best move at each node is tried
+first.  `MoveOrderer` combines the usual cheap ordering heuristics:
+
+- the principal variation (PV) move: the move played at this position in
+  the best line found by the previous iterative deepening pass,
+- killer moves: moves that recently caused a cutoff at the same ply,
+- the history heuristic: moves that have caused cutoffs anywhere in the
+  tree, weighted by the depth of the cutoff,
+- (optionally) the improved_score mobility difference of the child, which
+  costs a board copy per move.
+
+Any object with the same methods can be passed to `AlphaBetaPlayer` as its
+move_ordering argument.
+"""
+from game_agent import CutoffStats
+from sample_players import improved_score
+
+
+class MoveOrderer:
+    """Order the legal moves at each node of an iterative deepening
+    alpha-beta search.
+
+    Parameters
+    ----------
+    pv : bool (optional)
+        Search the previous iteration's principal variation move first.
+
+    killers : int (optional)
+        The number of killer moves remembered per ply (0 disables them).
+
+    history : bool (optional)
+        Order the remaining moves by their history heuristic score.
+
+    mobility : bool (optional)
+        Break the remaining ties using the improved_score of each child
+        position (best first for the player to move).
+    """
+
+    def __init__(self, pv=True, killers=2, history=True, mobility=False):
+        self.use_pv = pv
+        self.num_killers = killers
+        self.use_history = history
+        self.use_mobility = mobility
+
+        self.root_depth = 0
+        self.pv = ()
+        self._lines = []
+        self._killers = []
+        self._history = [{}, {}]
+
+    def new_search(self):
+        """Prepare for a new call to get_move(). Killer moves are forgotten
+        and the history scores are aged so that recent cutoffs dominate.
+        """
+        self.pv = ()
+        self._lines = []
+        self._killers = []
+        for table in self._history:
+            for move in table:
+                table[move] //= 2
+
+    def new_iteration(self, depth):
+        """Start an iterative deepening pass to the given depth, keeping the
+        principal variation found by the previous pass.
+        """
+        if self._lines and self._lines[0]:
+            self.pv = self._lines[0]
+        self.root_depth = depth
+        while len(self._lines) <= depth:
+            self._lines.append(())
+            self._killers.append([])
+
+    def start_node(self, depth):
+        """Forget the principal variation below a node that is about to be
+        searched (depth is the number of plies left to search).
+        """
+        self._lines[self.root_depth - depth] = ()
+
+    def order(self, game, legal_moves, depth, maximizing, player):
+        """Sort legal_moves in place, most promising first.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            The position being searched.
+
+        legal_moves : list<(int, int)>
+            The legal moves for the active player in game.
+
+        depth : int
+            The number of plies left to search below game.
+
+        maximizing : bool
+            True if the searching player is to move at this node.
+
+        player : object
+            The searching player (used for the mobility score).
+        """
+        ply = self.root_depth - depth
+        pv_move = None
+        if self.use_pv and ply < len(self.pv) and self.pv[ply][0] == game.hash():
+            pv_move = self.pv[ply][1]
+        killers = self._killers[ply] if self.num_killers else ()
+        history = self._history[maximizing]
+
+        def key(move):
+            if move == pv_move:
+                return (2, 0, 0)
+            if move in killers:
+                return (1, -killers.index(move), 0)
+            mobility = 0.
+            if self.use_mobility:
+                mobility = improved_score(game.forecast_move(move), player)
+                if not maximizing:
+                    mobility = -mobility
+            return (0, history.get(move, 0) if self.use_history else 0, mobility)
+
+        legal_moves.sort(key=key, reverse=True)
+
+    def best_move(self, game, depth, move):
+        """Record move as the best move found so far at a node; the node's
+        principal variation becomes move followed by the child's.
+        """
+        ply = self.root_depth - depth
+        child_line = self._lines[ply + 1] if ply + 1 < len(self._lines) else ()
+        self._lines[ply] = ((game.hash(), move),) + child_line
+
+    def cutoff(self, move, depth, maximizing):
+        """Record that move caused a cutoff with depth plies left to search. """
+        ply = self.root_depth - depth
+        if self.num_killers:
+            killers = self._killers[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.num_killers:]
+        if self.use_history:
+            history = self._history[maximizing]
+            history[move] = history.get(move, 0) + depth * depth
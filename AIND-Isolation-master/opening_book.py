@@ -0,0 +1,222 @@
+"""Build and use opening books for the Isolation agents.
+
+The first moves of a game are the most expensive to search (49 choices for
+the first player on an empty 7x7 board) and the least informative for a
+heuristic, yet they are the same in every game.  This script searches every
+position of the first few plies once, offline and with a long time budget,
+and saves the best move found for each of them.  Agents given the book then
+answer those positions with a dictionary lookup instead of a search.
+
+Positions that are reflections or rotations of each other are stored once:
+each position is keyed by its canonical hash (see `isolation.symmetry`), and
+the book move is stored in the canonical orientation and mapped back to the
+position being played when it is looked up.
+
+Tournament games start with FIRST_PLY random moves, so by default the book
+covers the plies after those.  Running this file builds a book with the
+settings below and writes it to BOOK_FILE, and (as the json data of
+`competition_agent.CustomPlayer`, with one entry per position rather than
+per symmetry class) to DATA_FILE.
+"""
+import json
+import struct
+import timeit
+
+from competition_agent import book_key
+from isolation import Board, canonical_hash
+from sample_players import improved_score
+from game_agent import AlphaBetaPlayer
+from move_ordering import MoveOrderer
+from transposition import TranspositionTable
+
+BOOK_FILE = "opening_book.bin"  # where the book is written
+DATA_FILE = "data.json"  # where the book is written for competition_agent.py
+FIRST_PLY = 2  # random plies at the start of tournament games, not in the book
+BOOK_PLIES = 4  # the book covers positions with FIRST_PLY to BOOK_PLIES - 1 moves
+SEARCH_TIME = 1000  # number of milliseconds spent searching each position
+WIDTH, HEIGHT = 7, 7  # board size
+MAX_CELLS = 256  # most cells on the board of a book (moves are stored in a byte)
+
+# File header (magic, version, width, height, plies, number of entries)
+# followed by one (position key, cell index of the book move) record per entry
+_MAGIC = b"ISOB"
+_VERSION = 2
+_HEADER = struct.Struct("<4sBBBBI")
+_ENTRY = struct.Struct("<QB")
+
+
+class OpeningBook:
+    """A table of book moves keyed by canonical position.
+
+    Parameters
+    ----------
+    width : int (optional)
+        The number of columns of the boards the book applies to.
+
+    height : int (optional)
+        The number of rows of the boards the book applies to.
+
+    entries : dict<int, int> (optional)
+        Book moves as cell indices (in canonical orientation) keyed by the
+        canonical position key.
+
+    plies : int (optional)
+        The book only holds positions with fewer than plies moves played;
+        later positions are not looked up.
+    """
+
+    def __init__(self, width=7, height=7, entries=None, plies=BOOK_PLIES):
+        if width * height > MAX_CELLS:
+            raise ValueError("An opening book holds boards of at most {} cells, not {}x{}".format(
+                MAX_CELLS, width, height))
+        self.width = width
+        self.height = height
+        self.entries = {} if entries is None else entries
+        self.plies = plies
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, game, move):
+        """Record move as the book move of the position game. """
+        if game.move_count >= self.plies:
+            raise ValueError("The book holds positions of the first {} plies".format(self.plies))
+        key, symmetry = canonical_hash(game)
+        row, col = symmetry.map_move(move)
+        self.entries[key] = row + col * self.height
+
+    def lookup(self, game):
+        """Return the book move for game, or None if the position is not in
+        the book (or the board has a different size).
+        """
+        if game.move_count >= self.plies or (game.width, game.height) != (self.width, self.height):
+            return None
+        key, symmetry = canonical_hash(game)
+        cell = self.entries.get(key)
+        if cell is None:
+            return None
+        move = symmetry.unmap_move((cell % self.height, cell // self.height))
+        return move if game.move_is_legal(move) else None
+
+    def save(self, path):
+        """Write the book to path in the compact binary book format. """
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, self.width, self.height, self.plies,
+                                 len(self.entries)))
+            for key in sorted(self.entries):
+                f.write(_ENTRY.pack(key, self.entries[key]))
+
+    @classmethod
+    def load(cls, path):
+        """Read a book written by save(). """
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, width, height, plies, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("{} is not an opening book file".format(path))
+        entries = dict(_ENTRY.iter_unpack(data[_HEADER.size:_HEADER.size + count * _ENTRY.size]))
+        return cls(width, height, entries, plies)
+
+    def to_json(self):
+        """Return the book as the json data of `competition_agent.CustomPlayer`.
+
+        That agent cannot import the symmetry code, so every position of the
+        book's plies is enumerated and the book move of each is stored under
+        its `competition_agent.book_key()`.
+        """
+        moves = {}
+        level = [Board("Player1", "Player2", self.width, self.height)]
+        for ply in range(self.plies):
+            next_level = {}
+            for game in level:
+                move = self.lookup(game)
+                if move is not None:
+                    moves[book_key(game)] = list(move)
+                if ply + 1 < self.plies:
+                    for child in map(game.forecast_move, game.get_legal_moves()):
+                        next_level.setdefault(book_key(child), child)
+            level = list(next_level.values())
+        return {"width": self.width, "height": self.height, "plies": self.plies, "moves": moves}
+
+    def save_json(self, path):
+        """Write to_json() to path (the data.json of a pvp submission). """
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f, separators=(",", ":"))
+
+
+def default_agent():
+    """The agent used to search book positions: alpha-beta with the improved
+    score, a transposition table and move ordering.
+    """
+    return AlphaBetaPlayer(score_fn=improved_score, in_place=True,
+                           transposition_table=TranspositionTable(2**18),
+                           move_ordering=MoveOrderer())
+
+
+def build_book(plies=BOOK_PLIES, search_time=SEARCH_TIME, width=WIDTH, height=HEIGHT,
+               agent_factory=default_agent, verbose=False, first_ply=FIRST_PLY):
+    """Search every position from ply first_ply to the last ply before plies
+    and return the resulting book.
+
+    Positions are enumerated breadth first, one symmetry class at a time,
+    and each is searched for search_time milliseconds by the agent whose
+    turn it is.
+
+    Parameters
+    ----------
+    plies : int
+        Positions with fewer than plies moves played are added to the book.
+
+    search_time : numeric
+        The number of milliseconds spent searching each position.
+
+    width, height : int
+        The board size.
+
+    agent_factory : callable
+        Returns a new agent; two are created, one for each side.
+
+    verbose : bool
+        Print each book move as it is found.
+
+    first_ply : int
+        Positions with fewer than first_ply moves played (the random opening
+        moves of a tournament game) are not searched.
+
+    Returns
+    -------
+    `OpeningBook`
+    """
+    book = OpeningBook(width, height, plies=plies)
+    players = (agent_factory(), agent_factory())
+    level = [()]
+    for ply in range(plies):
+        next_level = {}
+        for moves in level:
+            game = Board(players[0], players[1], width, height)
+            for move in moves:
+                game.apply_move(move)
+
+            if ply >= first_ply:
+                deadline = timeit.default_timer() + search_time / 1000.
+                time_left = lambda: 1000 * (deadline - timeit.default_timer())
+                best_move = game.active_player.get_move(game, time_left)
+                if best_move in game.get_legal_moves():
+                    book.add(game, best_move)
+                    if verbose:
+                        print("{} -> {}".format(list(moves), best_move))
+
+            if ply + 1 < plies:
+                for move in game.get_legal_moves():
+                    key, _ = canonical_hash(game.forecast_move(move))
+                    next_level.setdefault(key, moves + (move,))
+        level = [next_level[key] for key in sorted(next_level)]
+    return book
+
+
+if __name__ == "__main__":
+    book = build_book(verbose=True)
+    book.save(BOOK_FILE)
+    print("Wrote {} positions to {}".format(len(book), BOOK_FILE))
+    book.save_json(DATA_FILE)
+    print("Wrote the book for competition_agent.py to {}".format(DATA_FILE))
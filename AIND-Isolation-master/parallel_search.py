@@ -0,0 +1,299 @@
+"""This file contains a root-splitting parallel version of `AlphaBetaPlayer`.
+
+Each iterative deepening pass hands the root moves out to a pool of worker
+processes, dealt round-robin in the order of the previous pass's scores so
+that every worker starts with a promising move.  The workers search their
+moves with the alpha-beta of `AlphaBetaPlayer`, each with its own move
+orderer and either its own transposition table or one table in shared
+memory (see shared_transposition.py), all persisting between passes, and share
+the best root score found so far through a shared-memory array: a worker
+raises it as soon as one of its moves improves on it, and reads it back as
+the alpha bound of every root move it starts, so good moves found by one
+worker prune the others' searches.
+
+All processes work to the same absolute deadline (`timeit.default_timer` is
+the system-wide monotonic clock), and a pass that is not complete by then
+is discarded, exactly as a timed-out pass is by the serial player.
+"""
+import multiprocessing
+import os
+import timeit
+
+import game_agent
+from game_agent import AlphaBetaPlayer, custom_score, reports_stats
+from move_ordering import MoveOrderer
+from transposition import SIDE_SALT, TranspositionTable
+
+# Deepest iterative deepening pass with a slot in the shared alpha array
+MAX_DEPTH = 128
+
+# Placeholders for the player objects of a board sent to a worker
+_SELF = "<searching player>"
+_OPPONENT = "<opponent>"
+
+# Per-process state of the pool workers, set up by _init_worker()
+_worker = {}
+
+
+def _detach(game, player):
+    """Return a copy of game with the player objects replaced by picklable
+    placeholders (player becomes _SELF).
+    """
+    board = game.copy()
+    swap = {player: _SELF, game.get_opponent(player): _OPPONENT}
+    board._player_1 = swap[board._player_1]
+    board._player_2 = swap[board._player_2]
+    board._active_player = swap[board._active_player]
+    board._inactive_player = swap[board._inactive_player]
+    return board
+
+
+def _attach(board, agent):
+    """Replace the _SELF placeholder of a detached board with agent. """
+    for name in ("_player_1", "_player_2", "_active_player", "_inactive_player"):
+        if getattr(board, name) == _SELF:
+            setattr(board, name, agent)
+    return board
+
+
+def _init_worker(shared_alpha, score_fn, timeout, table, count_leaves=False):
+    """Create the search agent of a pool worker.
+
+    table is either the size of the worker's own transposition table or a
+    `shared_transposition.SharedTranspositionTable` used by every worker.
+    If count_leaves is True the worker counts its calls to score_fn, for the
+    search statistics of the player.
+    """
+    _worker["alpha"] = shared_alpha
+    _worker["leaves"] = 0
+    if count_leaves:
+        base_score = score_fn
+
+        def score_fn(game, player):
+            _worker["leaves"] += 1
+            return base_score(game, player)
+
+    _worker["shared_table"] = not isinstance(table, int)
+    if not _worker["shared_table"]:
+        table = TranspositionTable(table)
+    _worker["agent"] = AlphaBetaPlayer(score_fn=score_fn, timeout=timeout, in_place=True,
+                                       transposition_table=table,
+                                       move_ordering=MoveOrderer())
+    _worker["search"] = None
+
+
+def _search_root_moves(search_id, board, moves, depth, deadline):
+    """Search a share of the root moves of one iterative deepening pass.
+
+    Runs in a pool worker.  The shared alpha of the pass is read before each
+    move and raised whenever a move beats it.
+
+    A move that does not beat the alpha it was searched with only gets an
+    upper bound for its score, which may equal the best score of another
+    worker, so the best result says whether its score is exact.
+
+    Returns
+    -------
+    (float, bool, (int, int), int, int) or None
+        The best score, whether it is exact, its move, the number of nodes
+        searched and the number of leaves scored (0 unless the worker counts
+        them), or None if the deadline passed first.
+    """
+    agent = _worker["agent"]
+    shared_alpha = _worker["alpha"]
+    if _worker["search"] != search_id:
+        #A new get_move() call: age the table and the history heuristic (a
+        #shared table is aged once, by the player)
+        _worker["search"] = search_id
+        if not _worker["shared_table"]:
+            agent.transposition_table.new_search()
+        agent.move_ordering.new_search()
+
+    game = _attach(board, agent)
+    agent.time_left = lambda: 1000 * (deadline - timeit.default_timer())
+    agent.deadline = game_agent.Deadline(agent.time_left, agent.TIMER_THRESHOLD)
+    agent.tt_salt = SIDE_SALT if game.move_count % 2 else 0
+    agent.root_depth = depth
+    agent.move_ordering.new_iteration(depth)
+    agent.cutoff_stats = game_agent.CutoffStats()
+    leaves = _worker["leaves"]
+    best_score, best_exact, best_move = float("-inf"), False, None
+    try:
+        for move in moves:
+            alpha = max(best_score, shared_alpha[depth])
+            agent.make_move(game, move)
+            score = agent.min_value(game, depth - 1, alpha, float("inf"))
+            agent.unmake_move(game)
+            if best_move is None or score > best_score:
+                best_score, best_exact, best_move = score, score > alpha, move
+            with shared_alpha.get_lock():
+                if score > shared_alpha[depth]:
+                    shared_alpha[depth] = score
+    except game_agent.SearchTimeout:
+        return None
+    return (best_score, best_exact, best_move, agent.cutoff_stats.children,
+            _worker["leaves"] - leaves)
+
+
+class ParallelAlphaBetaPlayer(AlphaBetaPlayer):
+    """Iterative deepening alpha-beta agent that splits the root moves of
+    every pass across a pool of worker processes.
+
+    The pool is started on the first call to get_move() and kept until
+    close() is called; the player is also a context manager that closes it
+    on exit.
+
+    Parameters
+    ----------
+    num_workers : int (optional)
+        The number of worker processes (defaults to the number of CPUs).
+
+    table_size : int (optional)
+        The number of slots in the transposition table of each worker (or in
+        the shared table).
+
+    shared_table : bool (optional)
+        If True the workers share one lockless transposition table in shared
+        memory, so each can reuse the positions the others have searched,
+        instead of keeping a table each (needs Python 3.8 or later).
+
+    The other parameters are those of `game_agent.AlphaBetaPlayer`; the
+    score function must be picklable (i.e., defined at module level).
+
+    Attributes
+    ----------
+    depth_reached : int
+        The deepest pass completed by the most recent call to get_move().
+    """
+
+    def __init__(self, search_depth=3, score_fn=custom_score, timeout=10.,
+                 num_workers=None, table_size=2**16, shared_table=False, stats_callback=None):
+        super().__init__(search_depth, score_fn, timeout, stats_callback=stats_callback)
+        #The workers get the score function itself: while a move with stats is
+        #searched self.score is a local counting wrapper, which cannot be
+        #pickled (and would count in the worker's copy of the stats)
+        self._score_fn = self.score
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.table_size = table_size
+        self.shared_table = shared_table
+        self._table = None
+        self.depth_reached = 0
+        self._pool = None
+        self._shared_alpha = None
+        self._searches = 0
+
+    def __getstate__(self):
+        #The pool cannot be pickled; a copy starts its own
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_shared_alpha"] = None
+        state["_table"] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shut the worker pool down (a later get_move() starts a new one). """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+
+    def _start_pool(self):
+        self._shared_alpha = multiprocessing.Array("d", MAX_DEPTH + 1)
+        table = self.table_size
+        if self.shared_table:
+            #multiprocessing.shared_memory needs Python 3.8
+            from shared_transposition import SharedTranspositionTable
+            self._table = table = SharedTranspositionTable(self.table_size)
+        self._pool = multiprocessing.Pool(
+            self.num_workers, _init_worker,
+            (self._shared_alpha, self._score_fn, self.TIMER_THRESHOLD, table,
+             self.stats_callback is not None))
+
+    @reports_stats
+    def get_move(self, game, time_left):
+        """Search for the best move from the available legal moves and return a
+        result before the time limit expires.
+
+        Parameters
+        ----------
+        game : `isolation.Board`
+            An instance of `isolation.Board` encoding the current state of the
+            game (e.g., player locations and blocked cells).
+
+        time_left : callable
+            A function that returns the number of milliseconds left in the
+            current turn. Returning with any less than 0 ms remaining forfeits
+            the game.
+
+        Returns
+        -------
+        (int, int)
+            Board coordinates corresponding to a legal move; may return
+            (-1, -1) if there are no available legal moves.
+        """
+        self.depth_reached = 0
+        self.cutoff_stats = game_agent.CutoffStats()
+        legal_moves = game.get_legal_moves()
+        if not legal_moves:
+            return (-1, -1)
+        if self._pool is None:
+            self._start_pool()
+
+        #Workers stop at the same threshold the serial search uses, and the
+        #results must be back before it
+        deadline = timeit.default_timer() + (time_left() - self.TIMER_THRESHOLD) / 1000.
+        self._searches += 1
+        search_id = (os.getpid(), id(self), self._searches)
+        if self._table is not None:
+            self._table.new_search()
+        board = _detach(game, self)
+        for depth in range(MAX_DEPTH + 1):
+            self._shared_alpha[depth] = float("-inf")
+
+        best_move = legal_moves[0]
+        scores = {}
+        for depth in range(1, MAX_DEPTH + 1):
+            #Deal the moves out best first, so every worker starts on a good one
+            legal_moves.sort(key=lambda move: scores.get(move, float("-inf")), reverse=True)
+            shares = [legal_moves[i::self.num_workers] for i in range(self.num_workers)]
+            started = timeit.default_timer()
+            pending = [self._pool.apply_async(_search_root_moves,
+                                              (search_id, board, share, depth, deadline))
+                       for share in shares if share]
+            results = []
+            for result in pending:
+                remaining = deadline - timeit.default_timer()
+                try:
+                    results.append(result.get(max(remaining, 0.)))
+                except multiprocessing.TimeoutError:
+                    results.append(None)
+            if any(result is None for result in results):
+                break
+
+            #An exact score wins a tie with a bound, which may hide a worse move
+            score, _, best_move = max((result[:3] for result in results),
+                                      key=lambda result: result[:2])
+            nodes = sum(result[3] for result in results)
+            self.numberofnodesvisited += nodes
+            self.cutoff_stats.children += nodes
+            self.cutoff_stats.iteration_nodes.append(nodes)
+            self.depth_reached = depth
+            if self.stats is not None:
+                self.stats.leaf_evaluations += sum(result[4] for result in results)
+                self.stats.depth_completed = depth
+                self.stats.iteration_times.append(1000 * (timeit.default_timer() - started))
+            scores = {move: s for s, _, move, _, _ in results}
+            scores[best_move] = score
+            #A decided game cannot change with a deeper search
+            if score in (float("inf"), float("-inf")):
+                break
+        return best_move
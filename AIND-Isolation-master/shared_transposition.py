@@ -0,0 +1,201 @@
+"""This file contains a transposition table that lives in shared memory, so
+that several processes searching the same game (e.g., the workers of
+`parallel_search.ParallelAlphaBetaPlayer`) can reuse each other's results.
+
+The table is a `multiprocessing.shared_memory` block holding a NumPy
+structured array with one ENTRY_DTYPE record per slot:
+
+    check       the position key XORed with the other two words of the entry
+    depth       the number of plies searched below the position (at most 255)
+    bound       EXACT, LOWER_BOUND or UPPER_BOUND, plus the STORED bit
+    move_row    the best move found (NO_MOVE if there is none)
+    move_col
+    generation  the search generation the entry was stored in
+    score       the search score
+
+Processes read and write the entries without a lock.  Two writers storing
+into one slot at the same time, or a reader looking at a slot while it is
+being written, may see an entry whose words come from different stores; the
+XOR check word makes such a torn entry fail verification (the stored check
+does not give back the probed key), so it is treated as a miss instead of
+being trusted.  The same trick is used by lockless hash tables in parallel
+chess programs.
+"""
+import struct
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from transposition import REPLACEMENT_POLICIES
+
+# Row/column stored for an entry without a best move
+NO_MOVE = 0xFF
+
+# Bit set in the bound of every stored entry, so that no entry is all zeros
+# (the value of an empty slot), whatever its key, move and score
+STORED = 0x80
+
+# One table slot: three 64-bit words (check; depth, bound, move and
+# generation; score)
+ENTRY_DTYPE = np.dtype([("check", "<u8"), ("depth", "u1"), ("bound", "u1"),
+                        ("move_row", "u1"), ("move_col", "u1"), ("generation", "<u4"),
+                        ("score", "<f8")])
+
+# The block starts with a header of two 64-bit words: the number of slots
+# and the current search generation
+_HEADER_WORDS = 2
+_WORDS = ENTRY_DTYPE.itemsize // 8
+
+_BITS = struct.Struct("<Q")
+_FLOAT = struct.Struct("<d")
+
+
+class SharedTranspositionTable:
+    """Fixed-size transposition table shared between processes.
+
+    It offers the interface of `transposition.TranspositionTable`, so it can
+    be passed to `game_agent.AlphaBetaPlayer` as its transposition_table.
+    The process that creates the table owns the shared memory block; a table
+    sent to another process (it is pickled by name) attaches to the same
+    block.  The block is released when the owner is closed (or garbage
+    collected); the other processes keep their mapping of it until they
+    close their own copies.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots in the table; rounded up to a power of two.
+
+    replacement : str or callable (optional)
+        The replacement policy, as for `transposition.TranspositionTable`.
+
+    name : str (optional)
+        Attach to the existing table with this shared memory name instead of
+        creating a new one (size is then ignored).
+
+    Attributes
+    ----------
+    entries : numpy.ndarray
+        The slots as an ENTRY_DTYPE array (a view of the shared memory).
+    """
+
+    def __init__(self, size=2**16, replacement="depth", name=None):
+        self._replacement = replacement
+        if callable(replacement):
+            self._replace = replacement
+        else:
+            self._replace = REPLACEMENT_POLICIES[replacement]
+        self._owner = name is None
+        if self._owner:
+            self.size = 1
+            while self.size < size:
+                self.size *= 2
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=8 * _HEADER_WORDS + self.size * ENTRY_DTYPE.itemsize)
+            self._words = self._shm.buf.cast("Q")
+            self._words[0] = self.size
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._words = self._shm.buf.cast("Q")
+            self.size = self._words[0]
+        self._mask = self.size - 1
+        self.entries = np.ndarray((self.size,), dtype=ENTRY_DTYPE, buffer=self._shm.buf,
+                                  offset=8 * _HEADER_WORDS)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def name(self):
+        """The name of the shared memory block. """
+        return self._shm.name
+
+    @property
+    def generation(self):
+        return self._words[1]
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "replacement": self._replacement}
+
+    def __setstate__(self, state):
+        self.__init__(replacement=state["replacement"], name=state["name"])
+
+    def new_search(self):
+        """Start a new search generation (for every process sharing the
+        table); entries stored by earlier searches remain valid but become
+        candidates for replacement.
+        """
+        self._words[1] = (self._words[1] + 1) & 0xFFFFFFFF
+
+    def clear(self):
+        """Remove every entry from the table. """
+        self.entries[:] = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _slot(self, key):
+        """Return the entry in the slot of key as a tuple
+
+            (key, depth, bound, value, move, generation)
+
+        where key is the key the entry verifies against (that of the position
+        stored, or garbage if the entry is torn), or None if the slot is empty.
+        """
+        words = self._words
+        idx = _HEADER_WORDS + (key & self._mask) * _WORDS
+        check = words[idx]
+        data = words[idx + 1]
+        bits = words[idx + 2]
+        if not data >> 8 & STORED:
+            return None
+        row = data >> 16 & 0xFF
+        move = None if row == NO_MOVE else (row, data >> 24 & 0xFF)
+        return (check ^ data ^ bits, data & 0xFF, data >> 8 & ~STORED & 0xFF,
+                _FLOAT.unpack(_BITS.pack(bits))[0], move, data >> 32)
+
+    def probe(self, key):
+        """Return the entry stored for key, or None if the position is not
+        in the table (or its slot holds an entry torn by concurrent writes).
+        """
+        entry = self._slot(key)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        """Record the result of searching the position key to depth plies,
+        subject to the replacement policy.
+        """
+        entry = self._slot(key)
+        generation = self._words[1]
+        if entry is not None and not self._replace(entry, depth, generation):
+            return
+        row, col = (NO_MOVE, NO_MOVE) if move is None else move
+        data = min(depth, 0xFF) | (bound | STORED) << 8 | row << 16 | col << 24 | generation << 32
+        bits = _BITS.unpack(_FLOAT.pack(value))[0]
+        idx = _HEADER_WORDS + (key & self._mask) * _WORDS
+        words = self._words
+        words[idx] = key ^ data ^ bits
+        words[idx + 1] = data
+        words[idx + 2] = bits
+
+    def close(self):
+        """Detach from the shared memory block, and release it if this is the
+        table that created it.
+        """
+        if getattr(self, "_shm", None) is None:
+            return
+        self.entries = None
+        self._words.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self):
+        return int(np.count_nonzero(self.entries["bound"] & STORED))
@@ -0,0 +1,78 @@
+"""This file contains the statistics tournament.py uses to stop a pairing
+early and to report how certain its win rates are.
+
+Each game between a test agent and an opponent is treated as a Bernoulli
+trial with unknown win probability p.  The sequential probability ratio test
+(SPRT) compares the hypotheses p = p0 (the test agent is weaker) and p = p1
+(it is stronger) after every batch of games, and stops as soon as the log
+likelihood ratio of the results crosses one of the bounds set by the error
+rates alpha (deciding "stronger" when p = p0) and beta (deciding "weaker"
+when p = p1).  Lopsided pairings, such as any search agent against
+`RandomPlayer`, are decided after a handful of games, while close ones keep
+being played.  The default hypotheses are far apart because a tournament
+only has a few dozen games per pairing: a test between 45% and 55% would
+rarely finish within them.
+
+The two games of a fair match share their opening, so they are not quite
+independent; the error rates are therefore approximate.
+"""
+import math
+
+SPRT_P0 = 0.35  # win rate of the "weaker" hypothesis
+SPRT_P1 = 0.65  # win rate of the "stronger" hypothesis
+SPRT_ALPHA = 0.05  # probability of deciding "stronger" when p = SPRT_P0
+SPRT_BETA = 0.05  # probability of deciding "weaker" when p = SPRT_P1
+CONFIDENCE_Z = 1.96  # normal quantile of the reported intervals (95%)
+
+# Results of sprt_decision()
+WEAKER = -1
+UNDECIDED = 0
+STRONGER = 1
+
+
+def log_likelihood_ratio(wins, games, p0=SPRT_P0, p1=SPRT_P1):
+    """Return the log likelihood ratio of p = p1 against p = p0 after wins
+    wins in games games.
+    """
+    losses = games - wins
+    return wins * math.log(p1 / p0) + losses * math.log((1. - p1) / (1. - p0))
+
+
+def sprt_decision(wins, games, p0=SPRT_P0, p1=SPRT_P1, alpha=SPRT_ALPHA, beta=SPRT_BETA):
+    """Return STRONGER, WEAKER or UNDECIDED for the results so far. """
+    llr = log_likelihood_ratio(wins, games, p0, p1)
+    if llr >= math.log((1. - beta) / alpha):
+        return STRONGER
+    if llr <= math.log(beta / (1. - alpha)):
+        return WEAKER
+    return UNDECIDED
+
+
+def win_rate_interval(results, z=CONFIDENCE_Z):
+    """Return the win rate of an agent over several opponents, weighting every
+    opponent equally, with a confidence interval.
+
+    The interval is the normal approximation around the rate with each
+    opponent's win rate estimated as (wins + 1) / (games + 2) for its
+    variance, so opponents that were won (or lost) every time still add
+    some uncertainty.
+
+    Parameters
+    ----------
+    results : list<(int, int)>
+        The wins and games against each opponent.
+
+    Returns
+    -------
+    (float, float, float)
+        The win rate and the low and high ends of the interval, clipped to
+        [0, 1].
+    """
+    results = [(wins, games) for wins, games in results if games]
+    if not results:
+        return 0., 0., 1.
+    rate = sum(wins / games for wins, games in results) / len(results)
+    variance = sum((wins + 1.) * (games - wins + 1.) / (games + 2.) ** 3
+                   for wins, games in results) / len(results) ** 2
+    margin = z * math.sqrt(variance)
+    return rate, max(0., rate - margin), min(1., rate + margin)
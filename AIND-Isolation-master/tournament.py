@@ -10,14 +10,41 @@ The matches are fair because the board is initialized randomly for both
 players, and the players play each match twice -- once as the first player and
 once as the second player.  Randomizing the openings and switching the player
 order corrects for imbalances due to both starting position and initiative.
+
+The fair matches are independent of each other, so they can be spread over a
+pool of worker processes by setting NUM_PROCESSES above 1.  Every match is
+given its own random seed, drawn from RANDOM_SEED, so a tournament with a
+fixed seed uses the same openings and per-game seeds in serial and in
+parallel.
+
+With SEARCH_STATS set, every move of the test agents is recorded as a
+`search_stats.SearchStats` record, and their median search depth and
+average nodes, leaf evaluations, cutoffs and timeout margin per move are
+printed after the results, to tell a weaker heuristic from a slower one.
+
+With GAME_LOG set to a file name, every game is appended to that file as it
+is tallied, with the time and (for the test agents) the search statistics of
+each move, in the NDJSON format of game_log.py; `game_log.read_games()`
+reads it back, e.g. to replay the games a test agent lost.
+
+With EARLY_STOPPING set, a pairing of a test agent and an opponent stops as
+soon as a sequential probability ratio test (see sprt.py) decides whether
+the test agent is stronger or weaker, and the matches saved are spent on the
+pairings that are still close.  The win rates weight every opponent equally
+and are printed with 95% confidence intervals.  Both SEARCH_STATS and
+EARLY_STOPPING are off by default.
 """
 import itertools
 import random
 import warnings
 
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-from isolation import Board
+from isolation import Board, TimeControl
+from game_log import GameLogWriter, stats_entry
+from search_stats import StatsRecorder, summarize
+from sprt import UNDECIDED, sprt_decision, win_rate_interval
 from sample_players import (RandomPlayer, open_move_score,
                             improved_score, center_score)
 from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
@@ -25,6 +52,14 @@ from game_agent import (MinimaxPlayer, AlphaBetaPlayer, custom_score,
 
 NUM_MATCHES = 20  # number of matches against each opponent
 TIME_LIMIT = 150  # number of milliseconds before timeout
+CLOCK = "wall"  # clock timing each move: "wall", "process" (CPU time) or "perf_ns" (Python 3.7+)
+NUM_PROCESSES = 1  # number of worker processes (1 plays every game in this process)
+RANDOM_SEED = None  # seed for the openings and games (None for a random tournament)
+SEARCH_STATS = False  # collect and print search statistics for the test agents
+GAME_LOG = None  # file the games are logged to, e.g. "games.ndjson" (None for no log)
+EARLY_STOPPING = False  # stop each pairing once the SPRT of sprt.py decides it
+BATCH_MATCHES = 2  # matches played in a pairing between SPRT checks
+MAX_MATCHES = 3 * NUM_MATCHES  # most matches played in one pairing with EARLY_STOPPING
 
 DESCRIPTION = """
 This script evaluates the performance of the custom_score evaluation
@@ -37,52 +72,206 @@ game_agent.py.
 Agent = namedtuple("Agent", ["player", "name"])
 
 
-def play_round(cpu_agent, test_agents, win_counts, num_matches):
+def play_fair_match(cpu_player, test_player, opening, seed, collect_stats=False,
+                    log_games=False, close_players=False):
+    """Play a "fair" match: one game with each player moving first, both
+    starting from the same opening moves.
+
+    This is the unit of work handed to the worker processes, so it only
+    returns plain values; the random module is seeded first so that the
+    games are reproducible wherever they are played.
+
+    Returns
+    -------
+    (list<(bool, str)>, list<`search_stats.SearchStats`>, list<dict>)
+        For each game, whether test_player won and how the game ended; the
+        search statistics of every move of test_player if collect_stats is
+        set (and the agent supports them); and if log_games is set, the
+        game log record of each game (see game_log.py) without the names of
+        the agents.
+
+    With close_players the players are closed afterwards (see
+    close_agents()); a worker process sets it, as its copies of the
+    players are not used again.
+    """
+    random.seed(seed)
+    recorder = StatsRecorder()
+    record_stats = (collect_stats or log_games) and hasattr(test_player, "stats_callback")
+    if record_stats:
+        callback, test_player.stats_callback = test_player.stats_callback, recorder
+    results = []
+    logs = []
+    try:
+        for test_slot, players in [(1, (cpu_player, test_player)), (0, (test_player, cpu_player))]:
+            game = Board(*players)
+            for move in opening:
+                game.apply_move(move)
+            first_record = len(recorder.records)
+            winner, history, termination = game.play(
+                time_control=TimeControl(TIME_LIMIT, CLOCK), record_times=log_games)
+            results.append((winner is test_player, termination))
+            if log_games:
+                logs.append(game_record(game, opening, history, recorder.records[first_record:],
+                                        test_slot, int(winner is players[1]), termination))
+    finally:
+        if record_stats:
+            test_player.stats_callback = callback
+        if close_players:
+            close_agents([cpu_player, test_player])
+    return results, recorder.records if collect_stats else [], logs
+
+
+def close_agents(players):
+    """Shut down the resources of the players that hold any, e.g., the
+    worker pool of a `parallel_search.ParallelAlphaBetaPlayer`, by calling
+    their close() method.
+    """
+    for player in players:
+        close = getattr(player, "close", None)
+        if close is not None:
+            close()
+
+
+def game_record(game, opening, history, stats, test_slot, winner, termination):
+    """Build the game log record of a game played from opening.
+
+    history is the timed move history returned by Board.play() and stats
+    the search statistics of the test agent's moves, in order.
+    """
+    moves = [r + c * game.height for r, c in opening]
+    times = [0.] * len(opening)
+    entries = [None] * len(opening)
+    stats = iter(stats)
+    for ply, (r, c, millis) in enumerate(history, len(opening)):
+        moves.append(r + c * game.height)
+        times.append(round(millis, 2))
+        entry = next(stats, None) if ply % 2 == test_slot else None
+        entries.append(None if entry is None else stats_entry(entry))
+    return {"agent_slot": test_slot, "width": game.width, "height": game.height,
+            "winner": winner, "termination": termination,
+            "moves": moves, "times": times, "stats": entries}
+
+
+def play_round(cpu_agent, test_agents, win_counts, num_matches, rng=random, executor=None,
+               search_stats=None, game_log=None):
     """Compare the test agents to the cpu agent in "fair" matches.
 
     "Fair" matches use random starting locations and force the agents to
     play as both first and second player to control for advantages resulting
     from choosing better opening moves or having first initiative to move.
+
+    The openings and a seed for every match are drawn from rng up front. If an
+    executor (e.g., a `concurrent.futures.ProcessPoolExecutor`) is given the
+    matches are played by its workers, otherwise they are played in order in
+    this process; the results are tallied in the same order either way.
+
+    If a search_stats dict is given, the search statistics of each test
+    agent are appended to search_stats[agent.name], and if a game_log (a
+    `game_log.GameLogWriter`) is given every game is written to it.
     """
     timeout_count = 0
     forfeit_count = 0
-    for _ in range(num_matches):
-
-        games = sum([[Board(cpu_agent.player, agent.player),
-                      Board(agent.player, cpu_agent.player)]
-                    for agent in test_agents], [])
 
-        # initialize all games with a random move and response
+    # initialize all games of each match with a random move and response
+    openings = []
+    for _ in range(num_matches):
+        game = Board(cpu_agent.player, test_agents[0].player)
+        opening = []
         for _ in range(2):
-            move = random.choice(games[0].get_legal_moves())
-            for game in games:
-                game.apply_move(move)
+            move = rng.choice(game.get_blank_spaces())
+            game.apply_move(move)
+            opening.append(move)
+        openings.append(opening)
+
+    tasks = [(cpu_agent.player, agent.player, opening, rng.getrandbits(32),
+              search_stats is not None, game_log is not None, executor is not None)
+             for opening in openings for agent in test_agents]
+    play = map if executor is None else executor.map
+    results = iter(play(play_fair_match, *zip(*tasks)))
 
-        # play all games and tally the results
-        for game in games:
-            winner, _, termination = game.play(time_limit=TIME_LIMIT)
-            win_counts[winner] += 1
+    for _ in range(num_matches):
 
-        if termination == "timeout":
-            timeout_count += 1
-        elif winner not in test_agents and termination == "forfeit":
-            forfeit_count += 1
+        # tally the results of the games in the order they would be played
+        for agent in test_agents:
+            games, records, logs = next(results)
+            for test_won, termination in games:
+                winner = agent.player if test_won else cpu_agent.player
+                win_counts[winner] += 1
+                if termination == "timeout":
+                    timeout_count += 1
+                elif winner is not agent.player and termination == "forfeit":
+                    forfeit_count += 1
+            if search_stats is not None:
+                search_stats.setdefault(agent.name, []).extend(records)
+            for log in logs:
+                names = [cpu_agent.name, agent.name]
+                if log["agent_slot"] == 0:
+                    names.reverse()
+                game_log.write(dict({"agent": agent.name, "opponent": cpu_agent.name,
+                                     "players": names}, **log))
 
     return timeout_count, forfeit_count
 
 
-def update(total_wins, wins):
-    for player in total_wins:
-        total_wins[player] += wins[player]
-    return total_wins
+def play_matches(cpu_agents, test_agents, num_matches, num_processes=1, seed=None,
+                 collect_stats=False, game_log=None, early_stopping=False):
+    """Play matches between the test agent and each cpu_agent individually.
 
+    With num_processes > 1 the matches of each round are shared out over a
+    pool of that many worker processes. The seed fixes the openings and the
+    random choices made by the players in every game. With collect_stats
+    the search statistics of the test agents are printed at the end, and
+    with a game_log file name every game is appended to that file.
 
-def play_matches(cpu_agents, test_agents, num_matches):
-    """Play matches between the test agent and each cpu_agent individually. """
-    total_wins = {agent.player: 0 for agent in test_agents}
+    With early_stopping, each pairing of a test agent and a cpu agent is
+    played BATCH_MATCHES matches at a time and stopped as soon as the SPRT
+    of sprt.py decides it, and the matches saved (up to num_matches per
+    opponent for each test agent) are then spent on the pairings that are
+    still undecided, up to MAX_MATCHES per pairing.
+
+    Returns
+    -------
+    dict
+        The wins and games of every pairing, keyed by the names of the test
+        agent and the cpu agent.
+    """
+    rng = random.Random(seed)
+    search_stats = {} if collect_stats else None
+    log_writer = GameLogWriter(game_log) if game_log else None
+    executor = ProcessPoolExecutor(num_processes) if num_processes > 1 else None
     total_timeouts = 0.
     total_forfeits = 0.
-    total_matches = 2 * num_matches * len(cpu_agents)
+    # wins and games of each pairing, keyed by (test agent index, cpu agent index)
+    results = {(t, c): [0, 0] for t in range(len(test_agents)) for c in range(len(cpu_agents))}
+
+    def play(c, test_indices, matches):
+        cpu_agent = cpu_agents[c]
+        agents = [test_agents[t] for t in test_indices]
+        wins = {agent.player: 0 for agent in agents}
+        wins[cpu_agent.player] = 0
+        counts = play_round(cpu_agent, agents, wins, matches, rng, executor, search_stats,
+                            log_writer)
+        for t, agent in zip(test_indices, agents):
+            results[t, c][0] += wins[agent.player]
+            results[t, c][1] += 2 * matches
+        return counts
+
+    def undecided(c, max_matches):
+        return [t for t in range(len(test_agents))
+                if results[t, c][1] < 2 * max_matches and
+                sprt_decision(*results[t, c]) == UNDECIDED]
+
+    def print_label(label, c):
+        print("{!s:^9}{:^13}".format(label, cpu_agents[c].name), end="", flush=True)
+
+    def print_counts(c, previous=None):
+        row = []
+        for t in range(len(test_agents)):
+            wins, games = results[t, c]
+            if previous is not None:
+                wins, games = wins - previous[t][0], games - previous[t][1]
+            row += [wins, games - wins]
+        print(" {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5}".format(*row))
 
     print("\n{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}".format(
         "Match #", "Opponent", test_agents[0].name, test_agents[1].name,
@@ -90,31 +279,74 @@ def play_matches(cpu_agents, test_agents, num_matches):
     print("{:^9}{:^13} {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5}"
           .format("", "", *(["Won", "Lost"] * 4)))
 
-    for idx, agent in enumerate(cpu_agents):
-        wins = {test_agents[0].player: 0,
-                test_agents[1].player: 0,
-                test_agents[2].player: 0,
-                test_agents[3].player: 0,
-                agent.player: 0}
-
-        print("{!s:^9}{:^13}".format(idx + 1, agent.name), end="", flush=True)
-
-        counts = play_round(agent, test_agents, wins, num_matches)
-        total_timeouts += counts[0]
-        total_forfeits += counts[1]
-        total_wins = update(total_wins, wins)
-        _total = 2 * num_matches
-        round_totals = sum([[wins[agent.player], _total - wins[agent.player]]
-                            for agent in test_agents], [])
-        print(" {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5} {:^5}| {:^5}"
-              .format(*round_totals))
-
+    for c in range(len(cpu_agents)):
+        print_label(c + 1, c)
+        if early_stopping:
+            test_indices = undecided(c, num_matches)
+            while test_indices:
+                played = results[test_indices[0], c][1] // 2
+                counts = play(c, test_indices, min(BATCH_MATCHES, num_matches - played))
+                total_timeouts += counts[0]
+                total_forfeits += counts[1]
+                test_indices = undecided(c, num_matches)
+        else:
+            counts = play(c, range(len(test_agents)), num_matches)
+            total_timeouts += counts[0]
+            total_forfeits += counts[1]
+        print_counts(c)
+
+    if early_stopping:
+        #Spend the matches saved on decided pairings on the close ones
+        budget = [num_matches * len(cpu_agents) -
+                  sum(results[t, c][1] for c in range(len(cpu_agents))) // 2
+                  for t in range(len(test_agents))]
+        before = {c: [list(results[t, c]) for t in range(len(test_agents))]
+                  for c in range(len(cpu_agents))}
+        extended = set()
+        playing = True
+        while playing:
+            playing = False
+            for c in range(len(cpu_agents)):
+                test_indices = [t for t in undecided(c, MAX_MATCHES) if budget[t] > 0]
+                if not test_indices:
+                    continue
+                matches = min([BATCH_MATCHES] + [budget[t] for t in test_indices] +
+                              [MAX_MATCHES - results[t, c][1] // 2 for t in test_indices])
+                counts = play(c, test_indices, matches)
+                total_timeouts += counts[0]
+                total_forfeits += counts[1]
+                for t in test_indices:
+                    budget[t] -= matches
+                extended.add(c)
+                playing = True
+        if extended:
+            print("{:^74}".format("Extra matches for undecided pairings"))
+            for c in sorted(extended):
+                print_label("+{}".format(c + 1), c)
+                print_counts(c, before[c])
+
+    if executor is not None:
+        executor.shutdown()
+    close_agents([agent.player for agent in test_agents + cpu_agents])
+    if log_writer is not None:
+        log_writer.close()
+
+    rates = [win_rate_interval([results[t, c] for c in range(len(cpu_agents))])
+             for t in range(len(test_agents))]
     print("-" * 74)
-    print("{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}\n".format(
-        "", "Win Rate:",
-        *["{:.1f}%".format(100 * total_wins[a.player] / total_matches)
-          for a in test_agents]
-    ))
+    print("{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}".format(
+        "", "Win Rate:", *["{:.1f}%".format(100 * rate) for rate, _, _ in rates]))
+    if early_stopping:
+        print("{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}".format(
+            "", "95% CI:", *["{:.0f}-{:.0f}%".format(100 * low, 100 * high)
+                             for _, low, high in rates]))
+        print("{:^9}{:^13}{:^13}{:^13}{:^13}{:^13}".format(
+            "", "Games:", *[sum(results[t, c][1] for c in range(len(cpu_agents)))
+                            for t in range(len(test_agents))]))
+    print()
+
+    if search_stats:
+        print_search_stats(test_agents, search_stats)
 
     if total_timeouts:
         print(("\nThere were {} timeouts during the tournament -- make sure " +
@@ -125,6 +357,24 @@ def play_matches(cpu_agents, test_agents, num_matches):
         print(("\nYour ID search forfeited {} games while there were still " +
                "legal moves available to play.\n").format(total_forfeits))
 
+    return {(test_agents[t].name, cpu_agents[c].name): tuple(record)
+            for (t, c), record in results.items()}
+
+
+def print_search_stats(test_agents, search_stats):
+    """Print the search statistics per move of each test agent. """
+    print("{:^74}".format("Search statistics per move"))
+    print("{:^13}{:>7}{:>10}{:>10}{:>9}{:>12}{:>13}".format(
+        "Agent", "Depth", "Nodes", "Leaves", "Cutoffs", "Margin ms", "Min margin"))
+    for agent in test_agents:
+        summary = summarize(search_stats.get(agent.name, []))
+        if not summary:
+            continue
+        print("{:^13}{:>7}{:>10.0f}{:>10.0f}{:>9.0f}{:>12.1f}{:>13.1f}".format(
+            agent.name, summary["depth"], summary["nodes"], summary["leaf_evaluations"],
+            summary["cutoffs"], summary["margin"], summary["min_margin"]))
+    print()
+
 
 def main():
 
@@ -152,7 +402,8 @@ def main():
     print("{:^74}".format("*************************"))
     print("{:^74}".format("Playing Matches"))
     print("{:^74}".format("*************************"))
-    play_matches(cpu_agents, test_agents, NUM_MATCHES)
+    play_matches(cpu_agents, test_agents, NUM_MATCHES, NUM_PROCESSES, RANDOM_SEED, SEARCH_STATS,
+                 GAME_LOG, EARLY_STOPPING)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+"""This file contains a bounded transposition table for the search agents in
+game_agent.py.  Positions are identified by the Zobrist hash returned by
+`isolation.Board.hash()`, and each table slot remembers the result of the
+deepest (or most recent) search of a position so that iterative deepening
+and later moves can reuse it.
+"""
+
+# Bound types stored with each entry
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Mixed into the position hash by agents when their own piece is player 2,
+# so one table can hold values seen from either side of the board
+SIDE_SALT = 0x9E3779B97F4A7C15
+
+
+def depth_preferred(entry, depth, generation):
+    """Replace an entry only with a search at least as deep, unless the entry
+    was stored during an earlier search (an older generation).
+    """
+    return entry[5] != generation or depth >= entry[1]
+
+
+def always_replace(entry, depth, generation):
+    """Always replace an entry with the most recent search. """
+    return True
+
+
+REPLACEMENT_POLICIES = {
+    "depth": depth_preferred,
+    "always": always_replace,
+}
+
+
+class TranspositionTable:
+    """Fixed-size table of search results indexed by position hash.
+
+    Each slot holds a single entry tuple
+
+        (key, depth, bound, value, move, generation)
+
+    where depth is the number of plies searched below the position, bound is
+    one of EXACT, LOWER_BOUND or UPPER_BOUND, value is the search score and
+    move is the best move found (or None).  When two positions map to the
+    same slot the replacement policy decides which one is kept.
+
+    Parameters
+    ----------
+    size : int (optional)
+        The number of slots in the table; rounded up to a power of two.
+
+    replacement : str or callable (optional)
+        "depth" keeps the deeper search in a slot (entries left over from
+        earlier searches are always replaceable) and "always" keeps the most
+        recent one.  A callable policy(entry, depth, generation) returning
+        True when entry should be overwritten may be given instead.
+    """
+
+    def __init__(self, size=2**16, replacement="depth"):
+        self.size = 1
+        while self.size < size:
+            self.size *= 2
+        self._mask = self.size - 1
+        self._slots = [None] * self.size
+        if callable(replacement):
+            self._replace = replacement
+        else:
+            self._replace = REPLACEMENT_POLICIES[replacement]
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def new_search(self):
+        """Start a new search generation; entries stored by earlier searches
+        remain valid but become candidates for replacement.
+        """
+        self.generation += 1
+
+    def clear(self):
+        """Remove every entry from the table. """
+        self._slots = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        """Return the entry stored for key, or None if the position is not
+        in the table.
+        """
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        """Record the result of searching the position key to depth plies,
+        subject to the replacement policy.
+        """
+        idx = key & self._mask
+        entry = self._slots[idx]
+        if entry is None or self._replace(entry, depth, self.generation):
+            self._slots[idx] = (key, depth, bound, value, move, self.generation)
+
+    def __len__(self):
+        return sum(1 for entry in self._slots if entry is not None)